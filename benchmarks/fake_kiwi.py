@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+
+'''
+    Local stand-in of the Kiwi API for the benchmarks. Serves /flights,
+    /check_flights and /booking with configurable latency, payload size and
+    number of polls before flights_checked flips to true.
+
+    Usage: python3 benchmarks/fake_kiwi.py [--port N] [OPTIONS]
+
+    File name: fake_kiwi.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import argparse
+import json
+import socketserver
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class FakeKiwiConfig(object):
+   """ Behaviour of the fake server """
+
+   def __init__(
+      self,
+      _latency      = 0.0,
+      _results      = 50,
+      _token_size   = 1000,
+      _polls        = 2,
+      _invalid_rate = 0.0,
+      _rate_limit   = 0.0,
+   ):
+      """ Arguments:
+            _latency      (float): Delay of every response in seconds
+            _results      (int):   Max. flight records of the search response
+            _token_size   (int):   Length of the booking_token
+            _polls        (int):   Unsuccessful checks before flights_checked
+            _invalid_rate (float): Part of tokens reported as flights_invalid
+            _rate_limit   (float): Requests per second of every path, more
+                                   are answered by 429, 0 = no limit
+      """
+      self.latency      = _latency
+      self.results      = _results
+      self.token_size   = _token_size
+      self.polls        = _polls
+      self.invalid_rate = _invalid_rate
+      self.rate_limit   = _rate_limit
+
+
+
+
+class FakeKiwiHandler(BaseHTTPRequestHandler):
+   """ Request handler, the state is in self.server """
+
+   protocol_version = 'HTTP/1.1'
+   # Headers and body are separate writes: without TCP_NODELAY the body
+   # of a keep-alive response waits for the delayed ACK (~40 ms)
+   disable_nagle_algorithm = True
+
+   def do_GET(self):
+      config = self.server.config
+      time.sleep(config.latency)
+      url   = urlsplit(self.path)
+      query = dict( (k, v[0]) for k, v in parse_qs(url.query).items() )
+
+      if not self.server.allow(url.path):
+         self._reply(429, b'{"message": "Too many requests"}')
+      elif url.path == '/flights':
+         self._reply(200, self.server.search_body(query))
+      elif url.path == '/check_flights':
+         self._reply(200, self.server.check_body(query))
+      else:
+         self._reply(404, b'{}')
+
+   def do_POST(self):
+      config = self.server.config
+      time.sleep(config.latency)
+      length = int(self.headers.get('Content-Length', 0))
+      data   = json.loads(self.rfile.read(length).decode('utf-8'))
+
+      if not self.server.allow(urlsplit(self.path).path):
+         self._reply(429, b'{"message": "Too many requests"}')
+      elif urlsplit(self.path).path == '/booking':
+         pnr  = 'PNR%06d' % self.server.next_pnr()
+         body = { 'status': 'confirmed', 'pnr': pnr,
+                  'passengers': len(data.get('passengers', [])) }
+         self._reply(200, json.dumps(body).encode('utf-8'))
+      else:
+         self._reply(404, b'{}')
+
+   def _reply(self, _status, _body):
+      self.send_response(_status)
+      self.send_header('Content-Type', 'application/json')
+      self.send_header('Content-Length', str(len(_body)))
+      self.end_headers()
+      self.wfile.write(_body)
+
+   def log_message(self, *_args):
+      pass
+
+
+
+
+class FakeKiwiServer(socketserver.ThreadingMixIn, HTTPServer):
+   """ Threaded fake Kiwi API server """
+
+   daemon_threads = True
+
+   def __init__(self, _address, _config):
+      HTTPServer.__init__(self, _address, FakeKiwiHandler)
+      self.config = _config
+      self.lock   = threading.Lock()
+      self.polls  = {}               # booking_token -> check requests
+      self.pnr    = 0
+      self.buckets = {}              # path -> (tokens, time)
+      self.throttled = 0             # 429 responses
+
+   @property
+   def url(self):
+      return 'http://%s:%d' % self.server_address[:2]
+
+   def allow(self, _path):
+      """ Token bucket of the path, False = answer by 429 """
+      rate = self.config.rate_limit
+      if not rate:
+         return True
+      with self.lock:
+         now = time.monotonic()
+         tokens, updated = self.buckets.get(_path, (rate, now))
+         tokens = min(rate, tokens + (now - updated) * rate)
+         allowed = tokens >= 1
+         if allowed:
+            tokens -= 1
+         else:
+            self.throttled += 1
+         self.buckets[_path] = (tokens, now)
+         return allowed
+
+   def next_pnr(self):
+      with self.lock:
+         self.pnr += 1
+         return self.pnr
+
+   def search_body(self, _query):
+      """ Search response with min(limit, results) flight records """
+      limit = min(int(_query.get('limit', 1)), self.config.results)
+      fly_from = _query.get('flyFrom', 'XXX')
+      fly_to   = _query.get('to', 'YYY')
+      search   = _query.get('dateFrom', '') + fly_from + fly_to
+      padding  = 'x' * max(self.config.token_size - len(search) - 8, 0)
+
+      data = []
+      for i in range(limit):
+         data.append({
+            'booking_token': '%s-%06d-%s' % (search, i, padding),
+            'price':         100 + i,
+            'fly_duration':  '%dh %02dm' % (2 + i % 5, i % 60),
+            'duration':      { 'total': 7200 + (i % 5) * 3600 + (i % 60) * 60 },
+            'flyFrom':       fly_from,
+            'flyTo':         fly_to,
+            'route':         [ { 'flyFrom': fly_from, 'flyTo': fly_to } ],
+            'bags_price':    { '1': 20 + i % 7, '2': 50 + i % 11 },
+         })
+      body = { 'search_id': 'fake', 'data': data, '_results': limit,
+               'currency': _query.get('curr', 'EUR') }
+      return json.dumps(body).encode('utf-8')
+
+   def check_body(self, _query):
+      """ Check response, flights_checked after config.polls requests """
+      token = _query.get('booking_token', '')
+      with self.lock:
+         polls = self.polls.get(token, 0) + 1
+         self.polls[token] = polls
+
+      invalid = (zlib.crc32(token.encode('utf-8')) % 1000) < self.config.invalid_rate * 1000
+      body = {
+         'flights_checked': polls > self.config.polls,
+         'flights_invalid': invalid,
+         'conversion': { 'currency': _query.get('currency', 'EUR'),
+                         'amount': 1000 + int(_query.get('bnum', 0)) * 20 },
+      }
+      return json.dumps(body).encode('utf-8')
+
+
+
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def configure(_bf, _url):
+   """ Redirect the booking object API endpoints to the fake server
+
+       Arguments:
+         _bf  (BookFlight): Booking object
+         _url (str):        URL of the fake server
+   """
+   _bf.c_EP_FLIGHTS = _url + '/flights?'
+   _bf.c_EP_CHECK   = _url + '/check_flights?'
+   _bf.c_EP_BOOK    = _url + '/booking'
+# End of configure
+
+
+
+
+def start_server(_config, _port=0):
+   """ Start the fake server in a background thread
+
+       Arguments:
+         _config (FakeKiwiConfig): Behaviour of the server
+         _port   (int):            Port, 0 = any free port
+
+       Return:
+         (FakeKiwiServer): Running server, stop it by shutdown()
+   """
+   server = FakeKiwiServer(('127.0.0.1', _port), _config)
+   thread = threading.Thread( target = server.serve_forever )
+   thread.daemon = True
+   thread.start()
+   return server
+# End of start_server
+
+
+
+
+def serve_process(_config, _queue):
+   """ Run the fake server in a child process, its URL is put to the queue """
+   server = FakeKiwiServer(('127.0.0.1', 0), _config)
+   _queue.put(server.url)
+   server.serve_forever()
+# End of serve_process
+
+
+
+
+def main():
+   parser = argparse.ArgumentParser(description="Fake Kiwi API server")
+   parser.add_argument('--port', type=int, default=8765)
+   parser.add_argument('--latency', type=float, default=0.0,
+                       help='delay of every response in seconds')
+   parser.add_argument('--results', type=int, default=50,
+                       help='max. flight records of the search response')
+   parser.add_argument('--token-size', type=int, default=1000,
+                       help='length of the booking_token')
+   parser.add_argument('--polls', type=int, default=2,
+                       help='unsuccessful checks before flights_checked')
+   parser.add_argument('--invalid-rate', type=float, default=0.0,
+                       help='part of tokens reported as flights_invalid')
+   parser.add_argument('--rate-limit', type=float, default=0.0,
+                       help='requests per second of every path (429 above)')
+   args = parser.parse_args()
+
+   config = FakeKiwiConfig(args.latency, args.results, args.token_size,
+                           args.polls, args.invalid_rate, args.rate_limit)
+   server = FakeKiwiServer(('127.0.0.1', args.port), config)
+   print('Fake Kiwi API on', server.url)
+   try:
+      server.serve_forever()
+   except KeyboardInterrupt:
+      pass
+# End of main
+
+
+
+
+# Run the script
+if __name__ == '__main__':
+   main()
+
+
+
+# End of file
+
+
+
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+'''
+    Offline benchmark of search_flight, check_flight, book_flight and of the
+    whole pipeline against the local fake Kiwi API (benchmarks/fake_kiwi.py)
+    at different concurrency levels. Reports latency percentiles, throughput
+    and peak memory, saves the results and compares them with a baseline.
+
+    Usage: python3 benchmarks/pipeline.py [OPTIONS]
+           python3 benchmarks/pipeline.py --save new.json --compare old.json
+
+    File name: pipeline.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bookflight import BookFlight, Passenger, Transport, Backoff
+from fake_kiwi import FakeKiwiConfig, configure, serve_process
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+c_PHASES     = ('search', 'check', 'book', 'pipeline')
+c_CURRENCY   = 'EUR'
+c_PASSENGER  = Passenger(
+   _id         = "001",
+   _last_name  = "2X4C",
+   _first_name = "Kryton",
+   _birthday   = "2980-04-06",
+   _title      = "Mr",
+   _email      = "kryton@reddwarf.space"
+)
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def main():
+   parser = argparse.ArgumentParser(description="Pipeline benchmark")
+   parser.add_argument('--concurrency', type=str, default='1,4,16',
+                       help='comma separated concurrency levels')
+   parser.add_argument('--requests', type=int, default=100,
+                       help='operations per phase and concurrency level')
+   parser.add_argument('--phases', type=str, default=','.join(c_PHASES))
+   parser.add_argument('--latency', type=float, default=0.005,
+                       help='fake server response delay in seconds')
+   parser.add_argument('--results', type=int, default=50,
+                       help='flight records of the search response')
+   parser.add_argument('--limit', type=int, default=1,
+                       help='_limit of search_flight')
+   parser.add_argument('--polls', type=int, default=2,
+                       help='unsuccessful checks before flights_checked')
+   parser.add_argument('--check-wait', type=float, default=0.01,
+                       help='first wait between check attempts in seconds')
+   parser.add_argument('--save', type=str, help='save results to the file')
+   parser.add_argument('--compare', type=str,
+                       help='compare with results saved by --save')
+   parser.add_argument('--threshold', type=float, default=0.2,
+                       help='relative change reported as regression')
+   args = parser.parse_args()
+
+   config = FakeKiwiConfig( _latency = args.latency, _results = args.results,
+                            _polls = args.polls )
+   queue  = multiprocessing.Queue()
+   server = multiprocessing.Process( target = serve_process,
+                                     args = (config, queue) )
+   server.daemon = True
+   server.start()
+   url = queue.get()
+
+   results = { 'config': vars(args), 'runs': {} }
+   try:
+      for concurrency in [ int(c) for c in args.concurrency.split(',') ]:
+         for phase in args.phases.split(','):
+            run = run_phase(url, phase, concurrency, args,
+                            len(results['runs']))
+            key = '%s/c%d' % (phase, concurrency)
+            results['runs'][key] = run
+            print_run(key, run)
+   finally:
+      server.terminate()
+
+   if args.save:
+      with open(args.save, 'w') as f:
+         json.dump(results, f, indent = 2, sort_keys = True)
+
+   if args.compare:
+      with open(args.compare) as f:
+         baseline = json.load(f)
+      regressions = compare(baseline['runs'], results['runs'], args.threshold)
+      sys.exit(1 if regressions else 0)
+# End of main
+
+
+
+
+def run_phase(_url, _phase, _concurrency, _args, _run=0):
+   """ Run the phase _args.requests times with _concurrency threads
+
+       Arguments:
+         _run (int): Number of the run, the server keeps the check polls of
+                     the earlier runs
+
+       Return:
+         (dict): Latency percentiles, throughput, peak memory, errors
+   """
+   transport = Transport( _pool_maxsize = _concurrency )
+   run_id    = '%s%d%d' % (_phase, _concurrency, int(time.time() * 1000))
+   # The booking token is made of the date and the route: a date per run
+   # and a route per operation => check_flights polling of a new token
+   date = (datetime.date(2018, 4, 13) +
+           datetime.timedelta( days = _run )).strftime('%Y-%m-%d')
+
+   def new_booking(_i):
+      bf = BookFlight( _transport = transport )
+      configure(bf, _url)
+      bf.check_iata = False         # Made-up airport codes
+      bf.set_args(date, 'A%02d' % (_i % 100), 'B%02d' % (_i // 100))
+      bf.check_backoff = Backoff( _base = _args.check_wait, _jitter = 0 )
+      return bf
+
+   def token(_i):
+      return '%s-%d' % (run_id, _i)
+
+   def operation(_i):
+      bf = new_booking(_i)
+      start = time.perf_counter()
+      if _phase == 'search':
+         bf.search_flight( _limit = _args.limit, _currency = c_CURRENCY )
+      elif _phase == 'check':
+         bf.check_flight( token(_i), _currency = c_CURRENCY )
+      elif _phase == 'book':
+         bf.book_flight( token(_i), c_CURRENCY, c_PASSENGER )
+      else:
+         t = bf.search_flight( _limit = _args.limit, _currency = c_CURRENCY )
+         if not bf.error:
+            bf.check_flight( t, _currency = c_CURRENCY )
+         if not bf.error:
+            bf.book_flight( t, c_CURRENCY, c_PASSENGER )
+      return time.perf_counter() - start, bf.error
+
+   tracemalloc.start()
+   start = time.perf_counter()
+   with ThreadPoolExecutor( max_workers = _concurrency ) as executor:
+      outcomes = list(executor.map(operation, range(_args.requests)))
+   elapsed = time.perf_counter() - start
+   peak = tracemalloc.get_traced_memory()[1]
+   tracemalloc.stop()
+   transport.close()
+
+   latencies = sorted( latency for latency, error in outcomes )
+   return {
+      'latency_p50':  percentile(latencies, 50),
+      'latency_p95':  percentile(latencies, 95),
+      'latency_p99':  percentile(latencies, 99),
+      'throughput':   len(outcomes) / elapsed,
+      'peak_memory':  peak,
+      'errors':       sum( 1 for latency, error in outcomes if error ),
+   }
+# End of run_phase
+
+
+
+
+def percentile(_sorted, _p):
+   """ Return: (float): The p-th percentile of the sorted values """
+   if not _sorted:
+      return 0.0
+   index = int(round((len(_sorted) - 1) * _p / 100.0))
+   return _sorted[index]
+# End of percentile
+
+
+
+
+def print_run(_key, _run):
+   print('%-14s p50 %7.1f ms  p95 %7.1f ms  %8.1f ops/s  peak %7.1f kB  '
+         'errors %d' % (_key, _run['latency_p50'] * 1000,
+                        _run['latency_p95'] * 1000, _run['throughput'],
+                        _run['peak_memory'] / 1024.0, _run['errors']))
+# End of print_run
+
+
+
+
+def compare(_baseline, _current, _threshold):
+   """ Print relative changes against the baseline
+
+       Return:
+         (int): Number of regressions (worse by more than _threshold)
+   """
+   # metric: True = higher is better
+   metrics = (('latency_p50', False), ('latency_p95', False),
+              ('throughput', True), ('peak_memory', False))
+   regressions = 0
+   for key in sorted(_current):
+      if key not in _baseline:
+         continue
+      changes = []
+      for metric, higher_better in metrics:
+         old, new = _baseline[key][metric], _current[key][metric]
+         if not old:
+            continue
+         change = (new - old) / float(old)
+         worse  = -change if higher_better else change
+         flag   = ''
+         if worse > _threshold:
+            flag = ' REGRESSION'
+            regressions += 1
+         changes.append('%s %+.1f%%%s' % (metric, change * 100, flag))
+      print('%-14s %s' % (key, ', '.join(changes)))
+   return regressions
+# End of compare
+
+
+
+
+# Run the script
+if __name__ == '__main__':
+   main()
+
+
+
+# End of file
+
+
+
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+
+'''
+    Replay load generator. Serves the HTTP responses recorded by --capture
+    (bookflight.capture archive) from a local server with their recorded
+    latency, and drives BookFlight pipelines against it at a given arrival
+    rate and concurrency. Reports latency percentiles, throughput and
+    errors of the pipelines.
+
+    Usage: python3 benchmarks/replay.py ARCHIVE [OPTIONS]
+           python3 benchmarks/replay.py ARCHIVE --serve --port 8766
+
+    File name: replay.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import argparse
+import datetime
+import multiprocessing
+import os
+import socketserver
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bookflight import BookFlight, Passenger, Transport, Backoff
+from bookflight import CaptureArchive
+from pipeline import percentile, print_run
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+c_CURRENCY   = 'EUR'
+c_PASSENGER  = Passenger(
+   _id         = "001",
+   _last_name  = "2X4C",
+   _first_name = "Kryton",
+   _birthday   = "2980-04-06",
+   _title      = "Mr",
+   _email      = "kryton@reddwarf.space"
+)
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class ReplayHandler(BaseHTTPRequestHandler):
+   """ Request handler, the archive is in self.server """
+
+   protocol_version = 'HTTP/1.1'
+   # No delayed ACK stall of the body, see fake_kiwi.FakeKiwiHandler
+   disable_nagle_algorithm = True
+
+   def do_GET(self):
+      self._replay(b'')
+
+   def do_POST(self):
+      length = int(self.headers.get('Content-Length', 0))
+      self._replay(self.rfile.read(length))
+
+   def _replay(self, _body):
+      server   = self.server
+      exchange = server.archive.lookup(self.command, self.path, None, _body,
+                                       _fallback = server.fallback)
+      if exchange is None:
+         with server.lock:
+            server.missed += 1
+         self._reply(404, b'{"message": "Not recorded"}', None)
+         return
+      with server.lock:
+         server.served += 1
+      time.sleep(exchange.latency * server.speed)
+      self._reply(exchange.status, exchange.content, exchange.content_type)
+
+   def _reply(self, _status, _body, _content_type):
+      self.send_response(_status)
+      self.send_header('Content-Type', _content_type or 'application/json')
+      self.send_header('Content-Length', str(len(_body)))
+      self.end_headers()
+      self.wfile.write(_body)
+
+   def log_message(self, *_args):
+      pass
+
+
+
+
+class ReplayServer(socketserver.ThreadingMixIn, HTTPServer):
+   """ Threaded server of the recorded responses """
+
+   daemon_threads = True
+
+   def __init__(self, _address, _archive, _speed=1.0, _fallback=True):
+      """ Arguments:
+            _address  (tuple):          (host, port)
+            _archive  (CaptureArchive): Recorded exchanges
+            _speed    (float):          Multiplier of the recorded latency,
+                                        0 = no delay
+            _fallback (bool):           Answer not recorded requests by
+                                        the responses of the same endpoint
+      """
+      HTTPServer.__init__(self, _address, ReplayHandler)
+      self.archive  = _archive
+      self.speed    = _speed
+      self.fallback = _fallback
+      self.lock     = threading.Lock()
+      self.served   = 0
+      self.missed   = 0              # 404 responses
+
+   @property
+   def url(self):
+      return 'http://%s:%d' % self.server_address[:2]
+
+
+
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def main():
+   parser = argparse.ArgumentParser(description="Replay load generator")
+   parser.add_argument('archive', type=str,
+                       help='archive recorded by --capture FILE')
+   parser.add_argument('--rate', type=float, default=0.0,
+                       help='started pipelines per second, 0 = as fast as '
+                       'the concurrency allows')
+   parser.add_argument('--concurrency', type=int, default=16,
+                       help='pipelines in flight')
+   parser.add_argument('--requests', type=int, default=100,
+                       help='number of pipelines')
+   parser.add_argument('--speed', type=float, default=1.0,
+                       help='multiplier of the recorded latency, 0 = none')
+   parser.add_argument('--exact', action='store_true',
+                       help='answer only the recorded requests (404 for '
+                       'the others)')
+   parser.add_argument('--check-wait', type=float, default=None,
+                       help='first wait between check attempts in seconds '
+                       '(default as BookFlight)')
+   parser.add_argument('--metrics', type=str,
+                       help='write the metrics of the pipelines to the file')
+   parser.add_argument('--serve', action='store_true',
+                       help='only run the replay server')
+   parser.add_argument('--port', type=int, default=0,
+                       help='port of the replay server, 0 = any free port')
+   args = parser.parse_args()
+
+   if args.serve:
+      server = ReplayServer(('127.0.0.1', args.port),
+                            CaptureArchive(args.archive), args.speed,
+                            not args.exact)
+      print('Replaying', len(server.archive), 'exchanges on', server.url)
+      try:
+         server.serve_forever()
+      except KeyboardInterrupt:
+         pass
+      return
+
+   # The server runs in another process, it doesn't share the GIL
+   queue  = multiprocessing.Queue()
+   server = multiprocessing.Process( target = serve_process,
+                                     args = (args.archive, args.speed,
+                                             not args.exact, queue) )
+   server.daemon = True
+   server.start()
+   url = queue.get()
+   try:
+      archive = CaptureArchive(args.archive)
+      jobs    = load_jobs(archive)
+      if not jobs:
+         sys.exit('No search requests in the archive: ' + args.archive)
+      run = run_load(url, recorded_paths(archive), jobs, args)
+   finally:
+      server.terminate()
+
+   print('Replayed %d pipelines of %d recorded searches' %
+         (args.requests, len(jobs)))
+   print_run('replay/c%d' % args.concurrency, run)
+# End of main
+
+
+
+
+def run_load(_url, _paths, _jobs, _args):
+   """ Run _args.requests pipelines of the jobs, started at _args.rate per
+       second, at most _args.concurrency at once. The latency is measured
+       from the planned start, so a saturated generator doesn't hide the
+       queueing delay.
+
+       Arguments:
+         _url   (str):       URL of the replay server
+         _paths (dict):      Recorded endpoint paths, see recorded_paths()
+         _jobs  (list):      Booking arguments, see load_jobs()
+         _args  (Namespace): Program arguments
+
+       Return:
+         (dict): Latency percentiles, throughput, peak memory, errors
+   """
+   transport = Transport( _pool_maxsize = _args.concurrency )
+
+   def operation(_i, _planned):
+      if _planned is None:
+         _planned = time.perf_counter()     # Closed loop, no queueing
+      job = _jobs[_i % len(_jobs)]
+      bf  = BookFlight( _transport = transport )
+      configure(bf, _url, _paths)
+      bf.check_iata = False         # Recorded codes are valid already
+      if _args.check_wait is not None:
+         bf.check_backoff = Backoff( _base = _args.check_wait )
+      bf.set_args(job['date'], job['from'], job['to'],
+                  _return_n = job['return_n'], _fastest = job['fastest'])
+      token = bf.search_flight( _currency = job['currency'] )
+      if not bf.error:
+         bf.check_flight( token, _currency = job['currency'] )
+      if not bf.error:
+         bf.book_flight( token, job['currency'], c_PASSENGER )
+      return time.perf_counter() - _planned, bf.error
+
+   tracemalloc.start()
+   start = time.perf_counter()
+   with ThreadPoolExecutor( max_workers = _args.concurrency ) as executor:
+      futures = []
+      for i in range(_args.requests):
+         planned = None
+         if _args.rate:
+            planned = start + i / _args.rate
+            time.sleep(max(planned - time.perf_counter(), 0))
+         futures.append(executor.submit(operation, i, planned))
+      outcomes = [ future.result() for future in futures ]
+   elapsed = time.perf_counter() - start
+   peak = tracemalloc.get_traced_memory()[1]
+   tracemalloc.stop()
+   transport.close()
+
+   if _args.metrics:
+      transport.metrics.write(_args.metrics)
+
+   latencies = sorted( latency for latency, error in outcomes )
+   return {
+      'latency_p50':  percentile(latencies, 50),
+      'latency_p95':  percentile(latencies, 95),
+      'latency_p99':  percentile(latencies, 99),
+      'throughput':   len(outcomes) / elapsed,
+      'peak_memory':  peak,
+      'errors':       sum( 1 for latency, error in outcomes if error ),
+   }
+# End of run_load
+
+
+
+
+def load_jobs(_archive):
+   """ Booking arguments of the recorded search requests
+
+       Arguments:
+         _archive (CaptureArchive): Recorded exchanges
+
+       Return:
+         (list): Dicts with date, from, to, return_n, fastest, currency
+   """
+   jobs = []
+   for i in range(len(_archive)):
+      exchange = _archive.read(i, _content = False)
+      if exchange.method != 'GET' or not exchange.path.endswith('/flights'):
+         continue
+      params = dict(exchange.params)
+      try:
+         date = datetime.datetime.strptime(params['dateFrom'], '%d/%m/%Y')
+         return_n = None
+         if params.get('returnFrom'):
+            back = datetime.datetime.strptime(params['returnFrom'],
+                                              '%d/%m/%Y')
+            return_n = (back - date).days
+         jobs.append({
+            'date':     date.strftime('%Y-%m-%d'),
+            'from':     params['flyFrom'],
+            'to':       params['to'],
+            'return_n': return_n,
+            'fastest':  params.get('sort') == 'duration',
+            'currency': params.get('curr', c_CURRENCY),
+         })
+      except (KeyError, ValueError):
+         continue                   # Not a search of the booking pipeline
+   return jobs
+# End of load_jobs
+
+
+
+
+def recorded_paths(_archive):
+   """ Paths of the search, check and book endpoints in the archive. The
+       archive may be recorded against another server (e.g. fake_kiwi.py)
+       than the Kiwi API.
+
+       Return:
+         (dict): 'search', 'check', 'book' -> path, the Kiwi API paths
+                 for the endpoints not in the archive
+   """
+   bf    = BookFlight()
+   paths = {
+      'search': urlsplit(bf.c_EP_FLIGHTS).path,
+      'check':  urlsplit(bf.c_EP_CHECK).path,
+      'book':   urlsplit(bf.c_EP_BOOK).path,
+   }
+   for i in range(len(_archive)):
+      exchange = _archive.read(i, _content = False)
+      if exchange.path.endswith('/flights'):
+         paths['search'] = exchange.path
+      elif exchange.path.endswith('/check_flights'):
+         paths['check'] = exchange.path
+      elif exchange.method == 'POST':
+         paths['book'] = exchange.path
+   return paths
+# End of recorded_paths
+
+
+
+
+def configure(_bf, _url, _paths):
+   """ Redirect the booking object API endpoints to the replay server
+
+       Arguments:
+         _bf    (BookFlight): Booking object
+         _url   (str):        URL of the replay server
+         _paths (dict):       Endpoint paths, see recorded_paths()
+   """
+   _bf.c_EP_FLIGHTS = _url + _paths['search'] + '?'
+   _bf.c_EP_CHECK   = _url + _paths['check'] + '?'
+   _bf.c_EP_BOOK    = _url + _paths['book']
+# End of configure
+
+
+
+
+def serve_process(_path, _speed, _fallback, _queue):
+   """ Run the replay server in a child process, its URL is put to the
+       queue
+   """
+   server = ReplayServer(('127.0.0.1', 0), CaptureArchive(_path), _speed,
+                         _fallback)
+   _queue.put(server.url)
+   server.serve_forever()
+# End of serve_process
+
+
+
+
+# Run the script
+if __name__ == '__main__':
+   main()
+
+
+
+# End of file
+
+
+
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+'''
+    Startup benchmark. Measures the import time of the bookflight package
+    and the time from the start of book_flight.py to its first HTTP request
+    (sent to a local stand-in server), with the fast and with the full
+    argparse argument path.
+
+    Usage: python3 benchmarks/startup.py [--runs N] [--json FILE]
+
+    File name: startup.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+c_ROOT   = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+c_SCRIPT = os.path.join(c_ROOT, 'book_flight.py')
+c_ARGS   = [ '--date', '2018-04-13', '--from', 'BCN', '--to', 'DUB' ]
+c_FULL_PARSER_ARGS = [ '--rank-limit', '1' ]  # Not known by the fast path
+
+# Runs book_flight.py with the API endpoints redirected to the local server
+c_BOOTSTRAP = '''
+import sys, runpy
+import bookflight
+_init = bookflight.BookFlight.__init__
+def init(self, *args, **kwargs):
+   _init(self, *args, **kwargs)
+   self.c_EP_FLIGHTS = sys.argv.pop(1) + '/flights?'
+bookflight.BookFlight.__init__ = init
+sys.argv[0] = %r
+runpy.run_path(%r, run_name = '__main__')
+''' % (c_SCRIPT, c_SCRIPT)
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def main():
+   parser = argparse.ArgumentParser(description="Startup benchmark")
+   parser.add_argument('--runs', type=int, default=10, help='runs per case')
+   parser.add_argument('--json', type=str, help='save results to the file')
+   args = parser.parse_args()
+
+   env = dict(os.environ)
+   env['PYTHONPATH'] = c_ROOT + os.pathsep + env.get('PYTHONPATH', '')
+
+   results = {}
+   results['interpreter'] = median_run([ sys.executable, '-c', 'pass' ],
+                                       args.runs, env)
+   results['import'] = median_run([ sys.executable, '-c', 'import bookflight' ],
+                                  args.runs, env)
+   results['import_net'] = results['import'] - results['interpreter']
+   results['importtime_us'] = import_time(env)
+
+   server = FirstRequestServer()
+   try:
+      for name, extra in (('fast_path', []), ('full_parser', c_FULL_PARSER_ARGS)):
+         ttfr, total = time_to_first_request(server, extra, args.runs, env)
+         results['ttfr_' + name]  = ttfr
+         results['total_' + name] = total
+   finally:
+      server.close()
+
+   for key in sorted(results):
+      unit = 'us' if key.endswith('_us') else 'ms'
+      value = results[key] if unit == 'us' else results[key] * 1000
+      print('%-20s %10.1f %s' % (key, value, unit))
+
+   if args.json:
+      with open(args.json, 'w') as f:
+         json.dump(results, f, indent = 2, sort_keys = True)
+# End of main
+
+
+
+
+def median_run(_cmd, _runs, _env):
+   """ Return: (float): Median wall time of the command in seconds """
+   times = []
+   for i in range(_runs):
+      start = time.perf_counter()
+      subprocess.check_call(_cmd, env = _env)
+      times.append(time.perf_counter() - start)
+   return statistics.median(times)
+# End of median_run
+
+
+
+
+def import_time(_env):
+   """ Return: (int): Cumulative import time of bookflight (-X importtime) """
+   proc = subprocess.run(
+      [ sys.executable, '-X', 'importtime', '-c', 'import bookflight' ],
+      env = _env, stderr = subprocess.PIPE, universal_newlines = True)
+   for line in proc.stderr.splitlines():
+      match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| bookflight$', line)
+      if match:
+         return int(match.group(1))
+   return 0
+# End of import_time
+
+
+
+
+def time_to_first_request(_server, _extra_args, _runs, _env):
+   """ Return: (float): Median seconds from the start to the first request,
+               (float): Median seconds of the whole run
+   """
+   ttfr   = []
+   totals = []
+   for i in range(_runs):
+      _server.first_request = None
+      cmd = [ sys.executable, '-c', c_BOOTSTRAP, _server.url ] + c_ARGS + \
+            _extra_args
+      start = time.time()
+      subprocess.check_call(cmd, env = _env, stdout = subprocess.DEVNULL)
+      totals.append(time.time() - start)
+      ttfr.append(_server.first_request - start)
+   return statistics.median(ttfr), statistics.median(totals)
+# End of time_to_first_request
+
+
+
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class FirstRequestServer(object):
+   """ Local server recording the time of the first request, it answers
+       with an empty search result (the script ends after the search).
+   """
+
+   def __init__(self):
+      owner = self
+
+      class Handler(BaseHTTPRequestHandler):
+         def do_GET(self):
+            if owner.first_request is None:
+               owner.first_request = time.time()
+            body = b'{"data": [], "currency": "EUR"}'
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+         def log_message(self, *_args):
+            pass
+
+      self.first_request = None
+      self.httpd = HTTPServer(('127.0.0.1', 0), Handler)
+      self.url = 'http://127.0.0.1:%d' % self.httpd.server_address[1]
+      self.thread = threading.Thread( target = self.httpd.serve_forever )
+      self.thread.daemon = True
+      self.thread.start()
+
+   def close(self):
+      self.httpd.shutdown()
+      self.httpd.server_close()
+
+
+
+
+# Run the script
+if __name__ == '__main__':
+   main()
+
+
+
+# End of file
+
+
+
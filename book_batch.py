@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+'''
+    Books the flights of all jobs in the JSONL file (or stdin). One result
+    line {"id": ..., "pnr": ..., "error": ...} is printed per job.
+
+    File name: book_batch.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+from bookflight.batch import main   # Batch booking implementation
+
+# ==============================================================================
+# Run the script
+# ==============================================================================
+
+main()
+
+
+
+# End of file
+
+
+
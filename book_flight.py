@@ -10,14 +10,19 @@
 # ==============================================================================
 # Libraries
 # ==============================================================================
+import atexit                       # Metrics are written at the exit
 from bookflight import BookFlight   # Book flight implementation
 from bookflight import Passenger    # Passenger class (data structure)
+from bookflight import Journal      # Crash-safe journal of the pipelines
+from bookflight import pipeline_id  # Journal id of the booking
+from bookflight import CaptureWriter   # Record/replay archive
 
 # ==============================================================================
 # Run the script
 # ==============================================================================
 
 c_ERROR_OUTPUT = 0          # Print in case of error 
+c_DEADLINE_EXIT = 124       # Exit status of the exhausted --deadline
 
 # Required booking informations
 c_CURRENCY  = 'CZK'
@@ -36,38 +41,66 @@ def main():
    # Booking object
    bf = BookFlight()
    
-   # Load arguments
-   bf.load_args()
-   check_error( bf.error )
+   # Load arguments, the full parser only for less common options
+   if not bf.load_args_fast():
+      bf.load_args()
+   check_error( bf.error, bf.deadline_exceeded )
+   if bf.args.metrics:
+      atexit.register( bf.metrics.write, bf.args.metrics[0] )
+   if bf.args.capture:
+      bf.transport.capture = CaptureWriter( bf.args.capture[0] )
+      atexit.register( bf.transport.capture.close )
+   
+   # Resume the interrupted booking
+   step = None
+   if bf.args.journal:
+      bf.journal    = Journal( bf.args.journal[0] )
+      bf.journal_id = pipeline_id( bf.args, c_CURRENCY )
+      atexit.register( bf.journal.close )
+      step = bf.resume()
+      check_error( bf.error, bf.deadline_exceeded )
 
    # Search the flight
-   bf.iprint( "Searching flight..." )
-   token = bf.search_flight( _currency = c_CURRENCY )
+   if step is None:
+      bf.iprint( "Searching flight..." )
+      bf.search_flight( _currency = c_CURRENCY )
+   token = bf.token
    bf.iprint( 'booking_token =', token )
    bf.iprint( 'Searched price =', bf.search_price, bf.search_currency )
    bf.iprint( 'Searched fly_duration =', bf.search_duration )
-   check_error( bf.error )
+   check_error( bf.error, bf.deadline_exceeded )
    
-   # Check the flight
-   bf.iprint( "Checking flight..." )
-   bf.check_flight( token, _currency = c_CURRENCY )
+   # Check the flight, more flights at once with --speculate
+   if step is None and bf.args.speculate:
+      bf.iprint( "Checking flights..." )
+      bf.check_candidates( bf.args.speculate[0], _currency = c_CURRENCY )
+      token = bf.token
+      bf.iprint( 'Chosen booking_token =', token )
+   elif step != 'checked':
+      bf.iprint( "Checking flight..." )
+      bf.check_flight( token, _currency = c_CURRENCY )
    bf.iprint( 'Checked price =', bf.check_price, bf.check_currency )
-   check_error( bf.error )
+   check_error( bf.error, bf.deadline_exceeded )
 
    # Book the flight
    bf.iprint( "Booking flight..." )
    pnr = bf.book_flight( token, c_CURRENCY, c_PASSENGER )
-   check_error( bf.error )
+   check_error( bf.error, bf.deadline_exceeded )
+   bf.iprint( 'Connections =', bf.transport.stats() )
+   if bf.search_cache:
+      bf.iprint( 'Search cache =', bf.search_cache.stats() )
    
    # Print PNR code
    print( pnr )
       
 
-def check_error( err ):
-   """ In case of error prints error value and exits script """
+def check_error( err, deadline = False ):
+   """ In case of error prints error value and exits script, with
+       c_DEADLINE_EXIT status if the deadline was exceeded
+   """
    if err:
       print ( str(c_ERROR_OUTPUT) )
-      exit()   
+      exit( c_DEADLINE_EXIT if deadline else None )   
 
 
 # Run the script
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+
+'''
+    Runs the booking service. The search, check and book pipeline is
+    available over a local HTTP (TCP or Unix socket) API.
+
+    File name: book_service.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+from bookflight.service import main # Booking service implementation
+
+# ==============================================================================
+# Run the script
+# ==============================================================================
+
+main()
+
+
+
+# End of file
+
+
+
@@ -9,13 +9,48 @@
 # ==============================================================================
 # Libraries
 # ==============================================================================
-import argparse                        # Script parameters parser
-import requests                        # HTTP requests, JSON
+# NOTE: argparse, requests and pprint are imported when needed, so that
+#       importing the package (and the script start) stays fast.
+import copy                            # Per-request booking objects
 import datetime
-import pprint                          # Debug only
-import json
-from time import sleep
+from time import sleep, monotonic
 import sys                             # sys.stderr
+import types                           # SimpleNamespace
+from .transport import Transport, DeadlineExceeded   # Pooled HTTP transport
+from .metrics import Metrics           # Per-phase counters and histograms
+from .ratelimit import RateLimiter, TokenBucket  # Per-phase rate limits
+from .hedge import HedgePolicy         # Hedged requests of slow phases
+from .breaker import CircuitBreakers, CircuitBreaker, CircuitOpen
+from .codec import JsonCodec, default_codec, decode_response  # JSON bodies
+from . import journal                  # Crash-safe journal of the pipelines
+from .journal import Journal, pipeline_id
+from .scheduler import Backoff, CheckScheduler   # check_flights polling
+from .cache import SearchCache         # Cache of search responses
+from .stream import iter_flights       # Streaming search response parser
+from .results import ResultSet, FlightRecord     # Compact search results
+from . import ranking                  # Local ranking of search results
+from .fanout import fan_out_search, date_range   # Multi-route search
+from .airports import AirportIndex, default_index   # IATA codes, nearby
+from .request import BookingRequest, SearchResult, CheckResult, BookResult
+from .capture import CaptureWriter, CaptureArchive   # Record/replay traffic
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+# Options of load_args_fast()
+c_FAST_VALUES = ('--date', '--from', '--to', '--bags', '--return')
+c_FAST_FLAGS  = ('--one-way', '--cheapest', '--fastest', '-v', '--verbose',
+                 '--debug')
+c_TITLES      = ('mr', 'ms', 'mrs', 'miss')    # Passenger titles
+
+# State of one booking, the other attributes are shared by the requests
+c_STATE = ( 'args', 'journal_id', 'search_result', 'search_set',
+            'search_order', 'search_candidates', 'check_result',
+            'book_result', 'passengers', 'token', 'search_price',
+            'check_price', 'search_currency', 'check_currency',
+            'search_duration', 'book_pnr', 'error', 'error_msg',
+            'check_latency', 'deadline', 'deadline_exceeded' )
 
 # ==============================================================================
 # Classes
@@ -24,11 +59,28 @@ import sys                             # sys.stderr
 class BookFlight(object):
    """ Main booking flight class """
 
-   def __init__(self):
+   def __init__(self, _transport=None):
+      """ Arguments:
+            _transport (Transport): Shared HTTP transport, None = new one
+      """
+      if _transport is None:
+         _transport = Transport()
+      self.transport = _transport   # Pooled HTTP transport (all phases)
+      self.metrics   = _transport.metrics   # Shared with the transport
+      self.codec     = None         # JsonCodec, None = default_codec()
+      self.journal    = None        # Journal, None = no journaling
+      self.journal_id = None        # Id of the pipeline in the journal
       self.args = []                # Parsed arguments
       self.search_result = {}       # Search result
+      self.search_cache  = None     # SearchCache, None = no caching
+      self.airports      = None     # AirportIndex, None = default_index()
+      self.check_iata    = True     # Reject unknown IATA codes
+      self.search_set    = None     # ResultSet ranked by --rank
+      self.search_order  = []       # Ranked row indices of search_set
+      self.search_candidates = []   # Best flights (token, price, duration)
       self.check_result  = {}       # Check result
       self.book_result   = {}       # Book result
+      self.passengers    = []       # Passengers of the group booking
       self.token = 0                # booking_token received from search_flight
       self.search_price  = 0        # Stored from search response
       self.check_price   = 0        # Stored from check response
@@ -37,8 +89,14 @@ class BookFlight(object):
       self.search_duration = 0      # Stored from search response
       self.book_pnr      = 0        # Booking PNR code
       self.error         = False
+      self.error_msg     = ''       # Message of the last error
+      self.deadline      = None     # monotonic() end of --deadline budget
+      self.deadline_exceeded = False   # The error is the exhausted budget
       self.check_attempts= 30      # How many attempts when checking the flight
-      self.check_wait    = 10       # Wait in seconds between attempts
+      self.check_wait    = 10       # Max. wait in seconds between attempts
+      self.check_deadline= 300      # Max. seconds of checking the flight
+      self.check_backoff = Backoff()   # Delays, capped by check_wait
+      self.check_latency = 0        # Seconds until flights_checked
       # API Endpoints
       self.c_EP_FLIGHTS = 'https://api.skypicker.com/flights?'
       self.c_EP_CHECK   = 'https://booking-api.skypicker.com/api/v0.1/check_flights?'
@@ -46,6 +104,13 @@ class BookFlight(object):
       self.c_EP_BOOK    = 'http://128.199.48.38:8080/booking'
       self.c_HEADERS    = { 'Content-Type': 'application/json' }
       self.c_BAGS_MAX   = 4
+      self.c_RANK_LIMIT = 200       # Search results ranked locally (--rank)
+      self.c_BAGS_LIMIT = 50        # Search results ranked by the bag prices
+      self.c_TOP_K      = 10        # Merged results of the fan-out search
+      self.c_WORKERS    = 8         # Parallel searches of the fan-out search
+      self.c_SPECULATE_MAX   = 10   # Flights checked at once (--speculate)
+      self.c_SPECULATE_GRACE = 2.0  # Seconds of waiting for a better flight
+      self.c_NEARBY_MAX = 5         # Airports of one code expanded by --nearby
 
    def load_args (self):
       """ Load program arguments 
@@ -53,6 +118,8 @@ class BookFlight(object):
       """
       self.error = False
 
+      import argparse                     # Script parameters parser
+
       # -- Parser configuration ------------------------------------------------
       parser = argparse.ArgumentParser(
          description="This program finds and books the flights.")
@@ -63,16 +130,37 @@ class BookFlight(object):
          nargs=1, required=True
       )
       
+      # DATE-TO: optional, 1 arg (date)
+      parser.add_argument(
+         '--date-to', help='search all departure dates from DATE to this date '
+         '(YYYY-MM-DD)', type=str, nargs=1, dest="date_to"
+      )
+      
       # FROM: mandatory, 1 arg (string)
       parser.add_argument(
-         '--from', help='IATA code of the departure airport', type=str, nargs=1,
-         required=True, dest="from_iata"
+         '--from', help='IATA code of the departure airport, more codes are '
+         'separated by comma', type=str, nargs=1, required=True,
+         dest="from_iata"
       )
       
       # TO: mandatory, 1 arg (string)
       parser.add_argument(
-         '--to', help='IATA code of the arrival airport', type=str, nargs=1,
-         required=True, dest="to_iata" 
+         '--to', help='IATA code of the arrival airport, more codes are '
+         'separated by comma', type=str, nargs=1, required=True,
+         dest="to_iata" 
+      )
+      
+      # NEARBY: optional, 1 arg (float)
+      parser.add_argument(
+         '--nearby', help='search also the airports within KM of FROM and '
+         'TO (max. ' + str(self.c_NEARBY_MAX) + ' per code)', type=float,
+         nargs=1, metavar='KM'
+      )
+      
+      # WORKERS: optional, 1 arg (int)
+      parser.add_argument(
+         '--workers', help='parallel searches of more airports/dates '
+         '(default ' + str(self.c_WORKERS) + ')', type=int, nargs=1
       )
       
       # BAGS: optional, 1 arg (int), default 0
@@ -89,6 +177,34 @@ class BookFlight(object):
          '--debug', help='prints debug info', action="store_true"
       )
       
+      # CACHE-TTL: optional, 1 arg (int)
+      parser.add_argument(
+         '--cache-ttl', help='cache search results for N seconds', type=int,
+         nargs=1, dest="cache_ttl"
+      )
+      # CACHE-DIR: optional, 1 arg (string)
+      parser.add_argument(
+         '--cache-dir', help='directory of the search cache shared between '
+         'runs (requires --cache-ttl)', type=str, nargs=1, dest="cache_dir"
+      )
+      # JOURNAL: optional, 1 arg (string)
+      parser.add_argument(
+         '--journal', help='journal file, an interrupted booking is resumed '
+         'from its last step', type=str, nargs=1
+      )
+      # CAPTURE: optional, 1 arg (string)
+      parser.add_argument(
+         '--capture', help='record the HTTP requests and responses into the '
+         'archive FILE (and FILE.idx) for replay', type=str, nargs=1,
+         metavar='FILE'
+      )
+      # METRICS: optional, 1 arg (string)
+      parser.add_argument(
+         '--metrics', help='write timing metrics of the phases to the file '
+         '(.json = JSON, otherwise Prometheus text, - = stderr)', type=str,
+         nargs=1
+      )
+      
       # Exclusive groups
       group_way = parser.add_mutually_exclusive_group()
       # ONE-WAY: optional, exclusive, 0 arg
@@ -113,10 +229,969 @@ class BookFlight(object):
       group_type.add_argument(
          '--fastest', help='choose the fastest flight', action="store_true"
       )
+      # RANK: optional, exclusive, 1 arg (string)
+      group_type.add_argument(
+         '--rank', help='fetch many results and choose the flight locally',
+         type=str, nargs=1, choices=ranking.c_RANK_METHODS
+      )
+      # RANK-LIMIT: optional, 1 arg (int)
+      parser.add_argument(
+         '--rank-limit', help='number of search results ranked by --rank '
+         '(default ' + str(self.c_RANK_LIMIT) + ')', type=int, nargs=1,
+         dest="rank_limit"
+      )
+      # PRICE-WEIGHT: optional, 1 arg (float)
+      parser.add_argument(
+         '--price-weight', help='weight of the price for --rank weighted '
+         '(0..1, default 0.5)', type=float, nargs=1, dest="price_weight"
+      )
+      # SPECULATE: optional, 1 arg (int)
+      parser.add_argument(
+         '--speculate', help='check the best K flights at once and book the '
+         'best bookable one (max. ' + str(self.c_SPECULATE_MAX) + ')',
+         type=int, nargs=1, metavar='K'
+      )
+      # DEADLINE: optional, 1 arg (float)
+      parser.add_argument(
+         '--deadline', help='time budget of the whole booking in seconds, '
+         'HTTP timeouts and check polling are cut to fit in', type=float,
+         nargs=1, metavar='SECONDS'
+      )
       
       # -- Save parsing result -------------------------------------------------
       self.args = parser.parse_args()
       
+      self._validate_args()
+      
+      # CACHE
+      if self.args.cache_ttl:
+         cache_dir = self.args.cache_dir[0] if self.args.cache_dir else None
+         self.search_cache = SearchCache( _ttl = self.args.cache_ttl[0],
+                                          _path = cache_dir )
+            
+   # End of load_args
+
+
+
+
+   def load_args_fast (self, _argv=None):
+      """ Load program arguments without the argparse parser. Only the basic
+          options (--date, --from, --to, --bags, --return, --one-way,
+          --cheapest, --fastest, --verbose, --debug) in their full form are
+          supported, use load_args() if it returns False.
+          
+          Arguments:
+            _argv (list): Arguments, None = sys.argv[1:]
+            
+          Return:
+            (bool): False if the arguments need the full parser (help, other
+                    options, syntax errors)
+      """
+      argv   = sys.argv[1:] if _argv is None else _argv
+      values = {}                         # option: value
+      flags  = set()
+      
+      i = 0
+      while i < len(argv):
+         name, value = argv[i], None
+         if name.startswith('--') and '=' in name:
+            name, value = name.split('=', 1)
+         
+         if name in c_FAST_FLAGS and value is None:
+            flags.add(name)
+         elif name in c_FAST_VALUES and name not in values:
+            if value is None:
+               i += 1
+               if i >= len(argv):
+                  return False
+               value = argv[i]
+               # Option instead of the value (negative numbers are values)
+               if value.startswith('-') and not value[1:].isdigit():
+                  return False
+            values[name] = value
+         else:
+            return False
+         i += 1
+      
+      # Mandatory and exclusive options
+      if not all( name in values for name in ('--date', '--from', '--to') ):
+         return False
+      if '--one-way' in flags and '--return' in values:
+         return False
+      if '--cheapest' in flags and '--fastest' in flags:
+         return False
+      
+      try:
+         bags = int(values.get('--bags', 0))
+         return_n = int(values['--return']) if '--return' in values else None
+      except ValueError:
+         return False
+      
+      self.set_args(
+         values['--date'],
+         values['--from'],
+         values['--to'],
+         _bags     = bags,
+         _return_n = return_n,
+         _fastest  = '--fastest' in flags,
+         _verbose  = '-v' in flags or '--verbose' in flags,
+         _debug    = '--debug' in flags,
+      )
+      return True
+   # End of load_args_fast
+
+
+
+
+   def set_args (
+      self,
+      _date,
+      _from_iata,
+      _to_iata,
+      _bags     = 0,
+      _return_n = None,
+      _fastest  = False,
+      _verbose  = False,
+      _debug    = False,
+      _rank     = None,
+      _rank_limit   = None,
+      _price_weight = None,
+      _date_to  = None,
+      _workers  = None,
+      _speculate = None,
+      _nearby   = None,
+      _deadline = None,
+   ):
+      """ Set the booking arguments without the command line parser.
+          The values are validated the same way as in load_args().
+
+          Arguments:
+            _date      (str):  Departure date in the format YYYY-MM-DD
+            _from_iata (str):  IATA code of the departure airport, more
+                               codes are separated by comma
+            _to_iata   (str):  IATA code of the arrival airport, more
+                               codes are separated by comma
+            _bags      (int):  Number of bags
+            _return_n  (int):  Nights in the destination, None = one-way
+            _fastest   (bool): Choose the fastest flight instead of cheapest
+            _verbose   (bool): Prints additional info
+            _debug     (bool): Prints debug info
+            _rank      (str):  Local ranking method, see ranking.rank()
+            _rank_limit   (int):   Number of ranked search results
+            _price_weight (float): Weight of the price for 'weighted' rank
+            _date_to   (str):  Search all dates from _date to this date
+            _workers   (int):  Parallel searches of more airports/dates
+            _speculate (int):  Number of the best flights checked at once
+            _nearby    (float): Search also the airports within this radius
+                                (km) of the FROM and TO airports
+            _deadline  (float): Time budget of the booking in seconds,
+                                starts now
+      """
+      self.error = False
+
+      # Same structure as the argparse result (nargs=1 => lists)
+      self.args = types.SimpleNamespace(
+         date      = [_date],
+         from_iata = [_from_iata],
+         to_iata   = [_to_iata],
+         bags      = [_bags] if _bags else None,
+         return_n  = [_return_n] if _return_n is not None else None,
+         one_way   = _return_n is None,
+         cheapest  = not _fastest,
+         fastest   = _fastest,
+         verbose   = _verbose,
+         debug     = _debug,
+         rank      = [_rank] if _rank else None,
+         rank_limit   = [_rank_limit] if _rank_limit else None,
+         price_weight = [_price_weight] if _price_weight is not None else None,
+         date_to   = [_date_to] if _date_to else None,
+         workers   = [_workers] if _workers else None,
+         speculate = [_speculate] if _speculate else None,
+         nearby    = [_nearby] if _nearby else None,
+         deadline  = [_deadline] if _deadline is not None else None,
+         metrics   = None,
+         journal   = None,
+         capture   = None,
+      )
+
+      self._validate_args()
+   # End of set_args
+
+
+
+
+   def set_passengers (self, _passengers):
+      """ Set the passengers of the group booking. One search, check and
+          booking serve all of them (check_flights pnum, bags per person).
+          All passengers are validated at once, sets self.error.
+          
+          Arguments:
+            _passengers (list): Passenger objects
+            
+          Return:
+            (bool): True if all passengers are valid
+      """
+      passengers = list(_passengers)
+      errors     = []
+      ids        = set()
+      for i, passenger in enumerate(passengers):
+         problems = passenger.validate()
+         if passenger.id in ids:
+            problems.append('duplicate id ' + str(passenger.id))
+         ids.add(passenger.id)
+         errors.extend( 'passenger %d: %s' % (i + 1, problem)
+                        for problem in problems )
+      if not passengers:
+         errors.append('no passenger')
+      
+      if errors:
+         self.eprint('Invalid passengers:', '; '.join(errors))
+         return False
+      self.passengers = passengers
+      return True
+   # End of set_passengers
+
+
+
+
+   def search_flight (self, _limit=1, _currency='EUR', _stream=False):
+      """ Search the flight based on the program arguments
+      
+          Arguments:
+            _limit     (int):  Limit of search results
+            _currency  (str):  Currency
+            _stream    (bool): Decode only the first flight record while
+                               downloading, the rest is not downloaded
+            
+          Return:
+            (str): Booking token. Returns 0 if no token has been found
+      """
+      started = monotonic()
+      self.search_candidates = []
+      if self.args.speculate:
+         _limit = max(_limit, self.args.speculate[0])
+      
+      if self.args.date_to or ',' in (self.args.from_iata[0] +
+                                      self.args.to_iata[0]):
+         token = self._search_flight_fan_out(_currency)
+      elif self.args.rank or self.args.bags:
+         token = self._search_flight_ranked(_currency)
+      elif _stream:
+         token = self._search_flight_stream(_limit, _currency)
+      else:
+         token = self._search_flight_simple(_limit, _currency)
+      
+      if token:
+         self._record(journal.c_SEARCHED, token = token,
+                      price = self.search_price,
+                      currency = self.search_currency,
+                      duration = self.search_duration)
+      self.metrics.observe('bookflight_phase_seconds', monotonic() - started,
+                           { 'phase': 'search' })
+      return token
+   # End of search_flight
+
+
+
+
+   def iter_search (self, _limit=1, _currency='EUR', _meta=None):
+      """ Search the flights and yield the flight records one by one as they
+          are decoded from the downloaded response. The search cache is not
+          used.
+      
+          Arguments:
+            _limit     (int):  Limit of search results
+            _currency  (str):  Currency
+            _meta      (dict): Filled with the other top level fields of the
+                               response (currency, _results, ...)
+            
+          Return:
+            (generator): Flight records (dict), empty if the request failed
+      """
+      param = self._search_params(_limit, _currency)
+      self.search_result = self._send_request(self.c_EP_FLIGHTS, param,
+                                              _stream = True,
+                                              _phase = 'search')
+      if self.search_result.status_code is None:
+         return ( flight for flight in () )   # Closable like iter_flights()
+      
+      return iter_flights(self.search_result, _meta)
+   # End of iter_search
+
+
+
+
+   def search_result_set (self, _limit=1000, _currency='EUR'):
+      """ Search the flights into a compact column-wise result set. The
+          records are decoded one by one, see iter_search(). With
+          self.search_cache the whole response is cached.
+      
+          Arguments:
+            _limit     (int):  Limit of search results
+            _currency  (str):  Currency
+            
+          Return:
+            (ResultSet): Search results, empty in case of error
+      """
+      if self.search_cache is None:
+         flights = self.iter_search(_limit, _currency)
+      else:
+         flights = self._iter_cached_search(_limit, _currency)
+      try:
+         return ResultSet.from_records(flights, self.c_BAGS_MAX)
+      except Exception as e:
+         if not self._deadline_passes( _phase = 'search' ):
+            self.eprint("JSON: Invalid received data: EXCEPTION:", str(e) )
+         return ResultSet(self.c_BAGS_MAX)
+      finally:
+         flights.close()
+   # End of search_result_set
+
+
+
+
+   def check_flight (self, _token, _currency='EUR'):
+      """ Check the flight based on search response
+          
+          Arguments:
+            _token     (str): booking_token
+            _currency  (str): Currency
+      
+          Return:
+            (bool): flights_checked,
+            (bool): flights_invalid
+      """
+
+      param = self._check_params(_token, _currency)
+      
+      # -- Send HTTP request ---------------------------------------------------
+      # You need to repeat the check_flights until the value is True
+      attempt   = self.check_attempts
+      f_ch      = None
+      f_i       = None
+      started   = monotonic()
+      deadline  = started + self.check_deadline
+      
+      polls     = 0
+      
+      while True:
+         f_ch, f_i = self._send_check_flight(param)
+         polls += 1
+         
+         # Backoff with jitter: short waits first, check_wait at most
+         delay = self.check_backoff.delay(self.check_attempts - attempt,
+                                          self.check_wait)
+         if monotonic() + delay > deadline:
+            attempt = 0             # No time left for another attempt
+         
+         if self._check_done(f_ch, f_i, attempt, delay):
+            break
+         
+         # Repeat after some delay
+         self.iprint('Attempts left:', str(attempt),
+                     '. Waiting for', '%.1f' % delay, 'seconds...')
+         attempt -= 1
+         sleep(delay)
+      
+      if f_ch == True and f_i == False:
+         self.check_latency = monotonic() - started
+      self.observe_check(started, polls)
+               
+      return f_ch, f_i
+   # End of check_flight
+
+
+
+
+   def check_candidates (self, _k, _currency='EUR', _scheduler=None):
+      """ Check the best _k searched flights at once and take the best
+          ranked bookable one (speculative check). A better ranked flight
+          still being checked is waited for at most c_SPECULATE_GRACE
+          seconds after a worse one was checked, then the remaining checks
+          are cancelled. The chosen flight replaces self.token and
+          the searched price and duration.
+          
+          Arguments:
+            _k         (int):            Number of checked flights
+            _currency  (str):            Currency
+            _scheduler (CheckScheduler): Shared polling, None = own one
+      
+          Return:
+            (bool): flights_checked,
+            (bool): flights_invalid of the chosen flight (of the best
+                    ranked one if no flight is bookable)
+      """
+      candidates = self.search_candidates[:_k]
+      if len(candidates) < 2:
+         return self.check_flight(self.token, _currency)
+      
+      scheduler = _scheduler
+      if scheduler is None:
+         scheduler = CheckScheduler( _workers = len(candidates),
+                                     _backoff = self.check_backoff )
+      tickets = [ scheduler.submit(self._candidate(), token, _currency)
+                  for token, price, duration in candidates ]
+      self.iprint('Checking', len(tickets), 'flights at once...')
+      try:
+         best = self._speculate_wait(tickets)
+      finally:
+         for ticket in tickets:
+            if not ticket.finished.is_set():
+               scheduler.cancel(ticket)
+         if _scheduler is None:
+            scheduler.stop()
+      
+      for i, ticket in enumerate(tickets):
+         self.metrics.inc('bookflight_speculative_checks_total',
+                          { 'result': self._speculation_result(ticket,
+                                                                i == best) })
+      
+      chosen = tickets[best if best is not None else 0]
+      bf     = chosen.bf
+      self.token, self.search_price, self.search_duration = \
+         candidates[tickets.index(chosen)]
+      self.check_result   = bf.check_result
+      self.check_price    = bf.check_price
+      self.check_currency = bf.check_currency
+      self.check_latency  = bf.check_latency
+      
+      if best is None and any( t.bf.deadline_exceeded for t in tickets ):
+         self._deadline_error('check')
+         return chosen.f_ch, chosen.f_i
+      if best is None:
+         self.eprint('None of the', len(tickets), 'checked flights is',
+                     'bookable:', bf.error_msg)
+         return chosen.f_ch, chosen.f_i
+      
+      self.metrics.observe('bookflight_speculation_rank', best + 1)
+      self.iprint('Flight number', best + 1, 'of', len(tickets),
+                  'has been checked')
+      self._record(journal.c_SEARCHED, token = self.token,
+                   price = self.search_price,
+                   currency = self.search_currency,
+                   duration = self.search_duration)
+      self._record(journal.c_CHECKED, check_price = self.check_price,
+                   check_currency = self.check_currency)
+      return chosen.f_ch, chosen.f_i
+   # End of check_candidates
+
+
+
+
+   def book_flight (self, _token, _currency, _passenger=None):
+      """ Book the flight based on check response
+         
+          Arguments:
+            _token     (str):       booking_token
+            _currency  (str):       Currency abv.
+            _passenger (Passenger): Passenger object or list of them,
+                                    None = self.passengers. The number
+                                    must be the checked one (pnum).
+            
+          Return:
+            (str): PNR booking code
+      """
+
+      started = monotonic()
+      
+      if _passenger is None:
+         passengers = self.passengers
+      elif isinstance(_passenger, Passenger):
+         passengers = [_passenger]
+      else:
+         passengers = list(_passenger)
+      if not passengers or len(passengers) != self._pnum():
+         self.eprint('Booking of', len(passengers), 'passengers, but',
+                     self._pnum(), 'were checked')
+         return "0"
+      
+      # -- Collect all required Kiwi API book data -----------------------------
+      if self.args.bags:
+         bags = self.args.bags[0]
+      else:
+         bags = 0
+      
+      data = {}
+      data['currency']        = _currency
+      data['passengers']      = [ p.to_dict() for p in passengers ]
+      data['booking_token']   = _token
+      data['bags']            = bags * len(passengers)
+            
+      data_json = self._codec().dumps(data)
+      
+      # No booking without the time for its response
+      if self._deadline_passes( _phase = 'book' ):
+         return "0"
+      
+      # The booking must be on the disk before it is sent: a resumed
+      # pipeline must not book the same token twice
+      self._record(journal.c_BOOKING, _sync = True)
+      
+      # Send JSON data by POST method
+      sent = False
+      try:
+         self.book_result = self.transport.post( self.c_EP_BOOK,
+                                                 _data=data_json,
+                                                 _headers=self.c_HEADERS,
+                                                 _phase='book',
+                                                 _deadline=self.deadline )
+         sent = True
+      except DeadlineExceeded:
+         self._deadline_error('book')
+      except Exception as e:
+         self.eprint( 'EXCEPTION: ' + str(e) )
+      
+      # Debug purposes
+      if self.args.debug:
+         self._dprint( data_json.decode('utf-8'),
+                       self.book_result,
+                       self.book_result.status_code )
+      
+      try:
+         resp_json = self._decode(self.book_result, 'book')
+      except Exception as e:
+         resp_json = {}
+         self.eprint("JSON: Invalid received data: EXCEPTION:", str(e) )
+      
+      if self.args.debug:
+         self._dprint( resp_json )
+            
+      # Check status
+      if 'status' in resp_json:
+         if resp_json['status'] == 'confirmed':
+            self.iprint('Booking status is confirmed.')
+         else:
+            self.eprint('Booking status is invalid:', resp_json['status'])
+      else:
+         self.eprint("Booking response doesn't contain confirmation status.")
+      
+      # Check PNR
+      pnr = "0"
+      
+      if 'pnr' in resp_json:
+         pnr = resp_json['pnr']
+         self.iprint('PNR: ', pnr)
+      else:
+         self.eprint("Booking response doesn't contain PNR code.")
+   
+      self.book_pnr = pnr
+      
+      # Without the response the result is unknown => stays 'booking'
+      if sent and self.error:
+         self._record(journal.c_FAILED, _sync = True, error = self.error_msg)
+      elif sent:
+         self._record(journal.c_BOOKED, _sync = True, pnr = pnr)
+      
+      self.metrics.observe('bookflight_phase_seconds', monotonic() - started,
+                           { 'phase': 'book' })
+      return pnr
+   # End of book_flight   
+
+
+
+
+   def search (self, _request):
+      """ Search the flight of the booking request. The state of the
+          search is kept in a booking object of the request, so many
+          requests can be served at once.
+          
+          Arguments:
+            _request (BookingRequest): Booking request
+            
+          Return:
+            (SearchResult): Token, price and best flights (candidates)
+      """
+      bf = self._session(_request)
+      if not bf.error:
+         bf.search_flight( _currency = _request.currency )
+      return bf._search_result()
+   # End of search
+
+
+
+
+   def check (self, _request, _search):
+      """ Check the flight of the booking request, the best flights at
+          once with _request.speculate. A failed search is not checked,
+          its error is in the result.
+          
+          Arguments:
+            _request (BookingRequest): Booking request
+            _search  (SearchResult):   Result of search(), or booking_token
+            
+          Return:
+            (CheckResult): Checked token (the chosen one with speculate),
+                           flights_checked, flights_invalid and price
+      """
+      bf = self._session(_request)
+      if isinstance(_search, SearchResult):
+         bf.token             = _search.token
+         bf.search_price      = _search.price
+         bf.search_currency   = _search.currency
+         bf.search_duration   = _search.duration
+         bf.search_candidates = list(_search.candidates)
+         if _search.error is not None and not bf.error:
+            bf.error, bf.error_msg = True, _search.error
+      else:
+         bf.token = _search
+      if not bf.error and not bf.token:
+         bf.eprint('No booking_token to check')
+      
+      f_ch, f_i = None, None
+      if not bf.error:
+         if _request.speculate:
+            f_ch, f_i = bf.check_candidates( _request.speculate,
+                                             _currency = _request.currency )
+         else:
+            f_ch, f_i = bf.check_flight( bf.token, _request.currency )
+      return bf._check_result(f_ch, f_i)
+   # End of check
+
+
+
+
+   def book (self, _request, _check):
+      """ Book the checked flight for the passengers of the request. Nothing
+          is sent if the check failed or the flight was not checked, the
+          error is in the result.
+          
+          Arguments:
+            _request (BookingRequest): Booking request
+            _check   (CheckResult):    Result of check(), or booking_token
+                                       checked by other means
+            
+          Return:
+            (BookResult): PNR code
+      """
+      bf = self._session(_request)
+      if isinstance(_check, CheckResult):
+         bf.token          = _check.token
+         bf.check_price    = _check.price
+         bf.check_currency = _check.currency
+         if _check.error is not None and not bf.error:
+            bf.error, bf.error_msg = True, _check.error
+         elif not bf.error and not (_check.checked == True and
+                                    _check.invalid == False):
+            bf.eprint('The flight was not checked: flights_checked =',
+                      _check.checked, ', flights_invalid =', _check.invalid)
+      else:
+         bf.token = _check
+      if not bf.error and not bf.token:
+         bf.eprint('No booking_token to book')
+      
+      if not bf.error:
+         bf.book_flight( bf.token, _request.currency )
+      return bf._book_result()
+   # End of book
+
+
+
+
+   def run (self, _request):
+      """ Search, check and book the flight of the request. With
+          the journal, the booking is resumed from its last step.
+          
+          Arguments:
+            _request (BookingRequest): Booking request
+            
+          Return:
+            (BookResult): PNR code and the checked price
+      """
+      bf   = self._session(_request)
+      step = None if bf.error else bf.resume()
+      
+      if not bf.error and step is None:
+         bf.search_flight( _currency = _request.currency )
+      if not bf.error and step is None and _request.speculate:
+         bf.check_candidates( _request.speculate, _request.currency )
+      elif not bf.error and step != 'checked':
+         bf.check_flight( bf.token, _request.currency )
+      if not bf.error:
+         bf.book_flight( bf.token, _request.currency )
+      return bf._book_result()
+   # End of run
+
+
+
+
+   def resume(self):
+      """ Restore the state of the pipeline self.journal_id from the
+          journal. Sets self.error if the pipeline was interrupted while
+          booking (its result is unknown).
+         
+          Return:
+            (str): Last step: None = start with the search, 'searched' =
+                   check self.token, 'checked' = book self.token
+      """
+      if self.journal is None:
+         return None
+      
+      state = self.journal.state(self.journal_id)
+      if state is None or state['step'] in journal.c_FINAL:
+         return None
+      
+      if state['step'] == journal.c_BOOKING:
+         self.eprint('Booking of the token was interrupted, its result is',
+                     'unknown. Check it before booking again:',
+                     state.get('token'))
+         return state['step']
+      
+      self.token           = state['token']
+      self.search_price    = state.get('price', 0)
+      self.search_currency = state.get('currency', 0)
+      self.search_duration = state.get('duration', 0)
+      if state['step'] == journal.c_CHECKED:
+         self.check_price    = state.get('check_price', 0)
+         self.check_currency = state.get('check_currency', 0)
+      self.iprint('Resuming the booking, last step:', state['step'])
+      return state['step']
+   # End of resume
+
+
+
+
+   def observe_check(self, _started, _polls):
+      """ Record the metrics of the finished check_flights polling
+         
+          Arguments:
+            _started (float): monotonic() time of the first poll
+            _polls   (int):   Number of sent check_flights requests
+      """
+      self.metrics.observe('bookflight_phase_seconds', monotonic() - _started,
+                           { 'phase': 'check' })
+      self.metrics.observe('bookflight_check_polls', _polls)
+   # End of observe_check
+
+
+
+
+   def eprint(self, *_args, **_kwargs):
+      """ Prints message on the stderr and sets self.error attribute
+          Arguments: Same as print()
+      """
+      self.error = True
+      if not self.deadline_exceeded:    # Follow-up errors of the deadline
+         self.error_msg = ' '.join( str(arg) for arg in _args )
+      if getattr(self.args, 'verbose', False):
+         print('ERROR:', *_args, file=sys.stderr, **_kwargs)
+   # End of eprint
+
+
+
+
+   def iprint(self, *_args, **_kwargs):
+      """ Prints message on the stdout if VERBOSE argument is True
+          Arguments: Same as print()
+      """
+      if getattr(self.args, 'verbose', False):
+         print('INFO:', *_args, file=sys.stderr, **_kwargs)
+   # End of iprint
+
+
+   
+   
+   """ -- PRIVATE -- """
+   
+   def _dprint(self, *_objs):
+      """ Pretty-prints the objects (--debug) """
+      import pprint                       # Debug only
+      for obj in _objs:
+         pprint.pprint(obj)
+   # End of _dprint
+
+
+
+
+   def _session(self, _request):
+      """ Booking object of one request. It shares the transport, caches,
+          metrics, journal and settings, the state of the booking (c_STATE)
+          is its own.
+      """
+      bf    = copy.copy(self)
+      clean = BookFlight( _transport = self.transport )
+      for name in c_STATE:
+         setattr(bf, name, getattr(clean, name))
+      
+      bf.set_args(
+         _request.date,
+         _request.from_iata,
+         _request.to_iata,
+         _bags     = _request.bags,
+         _return_n = _request.return_n,
+         _fastest  = _request.fastest,
+         _verbose  = _request.verbose,
+         _debug    = _request.debug,
+         _rank     = _request.rank,
+         _rank_limit   = _request.rank_limit,
+         _price_weight = _request.price_weight,
+         _date_to  = _request.date_to,
+         _workers  = _request.workers,
+         _speculate = _request.speculate,
+         _nearby   = _request.nearby,
+         _deadline = _request.deadline,
+      )
+      if not bf.error and _request.passengers:
+         bf.set_passengers(_request.passengers)
+      if bf.journal is not None:
+         bf.journal_id = pipeline_id(bf.args, _request.currency,
+                                     _request.passengers)
+      return bf
+   # End of _session
+
+
+
+
+   def _search_result(self):
+      """ Return: (SearchResult): Result of the search of this object """
+      return SearchResult( self.token, self.search_price,
+                           self.search_currency, self.search_duration,
+                           tuple(self.search_candidates),
+                           self.error_msg if self.error else None )
+   # End of _search_result
+
+
+
+
+   def _check_result(self, _f_ch, _f_i):
+      """ Return: (CheckResult): Result of the check of this object """
+      return CheckResult( self.token, _f_ch, _f_i, self.check_price,
+                          self.check_currency, self.check_latency,
+                          self.error_msg if self.error else None )
+   # End of _check_result
+
+
+
+
+   def _book_result(self):
+      """ Return: (BookResult): Result of the booking of this object """
+      return BookResult( self.token, self.book_pnr if not self.error else '0',
+                         self.check_price, self.check_currency,
+                         self.error_msg if self.error else None )
+   # End of _book_result
+
+
+
+
+   def _candidate(self):
+      """ Booking object of one speculatively checked flight. It shares
+          the arguments and the transport, the check state is its own.
+      """
+      bf = copy.copy(self)
+      bf.journal      = None
+      bf.error        = False
+      bf.error_msg    = ''
+      bf.check_result = {}
+      bf.deadline_exceeded = False
+      return bf
+   # End of _candidate
+
+
+
+
+   def _speculate_wait(self, _tickets):
+      """ Wait for the best ranked checked flight
+         
+          Arguments:
+            _tickets (list): CheckTicket objects, best ranked first
+      
+          Returns:
+            (int): Index of the chosen ticket, None if none is bookable
+      """
+      grace_end = None
+      while True:
+         pending = [ i for i, t in enumerate(_tickets)
+                     if not t.finished.is_set() ]
+         checked = [ i for i, t in enumerate(_tickets)
+                     if t.finished.is_set() and t.checked() ]
+         if not pending:
+            return checked[0] if checked else None
+         if checked:
+            if checked[0] < pending[0]:
+               return checked[0]    # All better flights are not bookable
+            if grace_end is None:
+               grace_end = monotonic() + self.c_SPECULATE_GRACE
+            if monotonic() >= grace_end:
+               return checked[0]
+         
+         # Any finished ticket may change the decision
+         _tickets[pending[0]].wait(0.05)
+   # End of _speculate_wait
+
+
+
+
+   def _speculation_result(self, _ticket, _chosen):
+      """ Return: (str): Result label of the speculatively checked flight """
+      if _chosen:
+         return 'won'
+      if not _ticket.finished.is_set() or _ticket.cancelled:
+         return 'cancelled'
+      if _ticket.checked():
+         return 'checked'
+      if _ticket.f_i == True:
+         return 'invalid'
+      return 'failed'
+   # End of _speculation_result
+
+
+
+
+   def _pnum(self):
+      """ Return: (int): Number of passengers of the booking """
+      return len(self.passengers) or 1
+   # End of _pnum
+
+
+
+
+   def _record(self, _step, _sync=False, **_fields):
+      """ Append the pipeline step to the journal (if any) """
+      if self.journal is not None:
+         self.journal.append(self.journal_id, _step, _sync, **_fields)
+   # End of _record
+
+
+
+
+   def _deadline_passes(self, _delay=0, _phase='check'):
+      """ Checks the --deadline budget, reports the error if it is out
+
+          Arguments:
+            _delay (float): Seconds of the next planned step (a poll delay)
+            _phase (str):   Booking phase of the step (metrics label)
+
+          Returns:
+            (bool): True = the deadline passes before the step, stop
+      """
+      if self.deadline is None or monotonic() + _delay < self.deadline:
+         return False
+      self._deadline_error(_phase)
+      return True
+   # End of _deadline_passes
+
+
+
+
+   def _deadline_error(self, _phase):
+      """ Report the exhausted --deadline budget (once), sets self.error """
+      if self.deadline_exceeded:
+         return
+      budget = getattr(self.args, 'deadline', None)
+      if budget:
+         self.eprint('Deadline exceeded in the', _phase, 'phase:', budget[0],
+                     'seconds')
+      else:
+         self.eprint('Deadline exceeded in the', _phase, 'phase')
+      self.deadline_exceeded = True
+      self.metrics.inc('bookflight_deadline_exceeded_total',
+                       { 'phase': _phase })
+   # End of _deadline_error
+
+
+
+
+   def _validate_args(self):
+      """ Check values of the loaded arguments, sets self.error """
       # -- Validation - check arguments value ----------------------------------
       # DATE
       try:
@@ -124,11 +1199,26 @@ class BookFlight(object):
       except ValueError:
          self.eprint("Invalid value of DATE argument.")
 
+      # DATE-TO
+      if self.args.date_to:                    # optional argument
+         try:
+            if not date_range(self.args.date[0], self.args.date_to[0]):
+               self.eprint("DATE-TO argument is before DATE argument.")
+         except ValueError:
+            self.eprint("Invalid value of DATE-TO argument.")
+
       # FROM, TO - 3 IATA code chars
-      if len(self.args.from_iata[0]) != 3:
+      if any( len(code) != 3 for code in self.args.from_iata[0].split(',') ):
          self.eprint("Invalid IATA code in FROM argument.")
-      if len(self.args.to_iata[0]) != 3:
+      if any( len(code) != 3 for code in self.args.to_iata[0].split(',') ):
          self.eprint("Invalid IATA code in TO argument.")
+      if not self.error and (self.check_iata or self.args.nearby):
+         self._validate_iata()
+
+      # WORKERS
+      if self.args.workers:                    # optional argument
+         if self.args.workers[0] < 1:
+            self.eprint("Invalid count in WORKERS argument")
          
       # RETURN
       if self.args.return_n:                    # optional argument
@@ -144,33 +1234,107 @@ class BookFlight(object):
          elif self.args.bags[0] > self.c_BAGS_MAX:
             self.eprint("Invalid bags count in BAGS argument",
                   "(Maximum bags is", self.c_BAGS_MAX, "per one person)")
-            
-   # End of load_args
 
+      # RANK-LIMIT
+      if self.args.rank_limit:                 # optional argument
+         if self.args.rank_limit[0] < 1:
+            self.eprint("Invalid count in RANK-LIMIT argument")
 
+      # SPECULATE
+      if self.args.speculate:                  # optional argument
+         if not 1 <= self.args.speculate[0] <= self.c_SPECULATE_MAX:
+            self.eprint("Invalid count in SPECULATE argument",
+                        "(must be between 1 and", self.c_SPECULATE_MAX, ")")
 
+      # PRICE-WEIGHT
+      if self.args.price_weight:               # optional argument
+         if not 0 <= self.args.price_weight[0] <= 1:
+            self.eprint("Invalid value of PRICE-WEIGHT argument",
+                        "(must be between 0 and 1)")
 
-   def search_flight (self, _limit=1, _currency='EUR'):
-      """ Search the flight based on the program arguments
+      # DEADLINE - the budget starts with the arguments
+      self.deadline = None
+      self.deadline_exceeded = False
+      if self.args.deadline:                   # optional argument
+         if not self.args.deadline[0] > 0:
+            self.eprint("Invalid value of DEADLINE argument",
+                        "(must be positive seconds)")
+         else:
+            self.deadline = monotonic() + self.args.deadline[0]
+   # End of _validate_args
+
+
+
+
+   def _validate_iata(self):
+      """ Check FROM and TO codes by the airport index and expand them
+          by NEARBY, sets self.error
+      """
+      index = self._airports()
+      if index is None:
+         if self.args.nearby:
+            self.eprint("Airport index is not available for NEARBY argument")
+         return
       
+      for name, arg in (('FROM', self.args.from_iata),
+                        ('TO', self.args.to_iata)):
+         codes = arg[0].upper().split(',')
+         unknown = [ code for code in codes if not index.is_valid(code) ]
+         if unknown and self.check_iata:
+            self.eprint("Unknown IATA code in " + name + " argument:",
+                        ', '.join(unknown))
+            continue
+         
+         # NEARBY
+         if self.args.nearby:                  # optional argument
+            if self.args.nearby[0] <= 0:
+               self.eprint("Invalid distance in NEARBY argument")
+               return
+            expanded = []
+            for code in codes:
+               for near in index.expand(code, self.args.nearby[0],
+                                        self.c_NEARBY_MAX) or [code]:
+                  if near not in expanded:
+                     expanded.append(near)
+            self.iprint(name, 'airports:', ', '.join(expanded))
+            arg[0] = ','.join(expanded)
+   # End of _validate_iata
+
+
+
+
+   def _airports(self):
+      """ Return: (AirportIndex): Index of the airports, None if missing """
+      if self.airports is None:
+         self.airports = default_index()
+      return self.airports
+   # End of _airports
+
+
+
+
+   def _search_params(self, _limit, _currency, _from=None, _to=None,
+                      _date=None):
+      """ Collect all Kiwi API flights parameters
+         
           Arguments:
             _limit     (int): Limit of search results
             _currency  (str): Currency
-            
-          Return:
-            (str): Booking token. Returns 0 if no token has been found
-      """
-      
-      # -- Collect all Kiwi API flights parameters -----------------------------
+            _from      (str): Departure airport, None = FROM argument
+            _to        (str): Arrival airport, None = TO argument
+            _date      (str): Departure date, None = DATE argument
       
+          Returns:
+            (dict): Request parameters
+      """
       # Kiwi API flight parameters associative array {'param' : 'value'}
       param = {} 
       
       # Required parameters
-      param['flyFrom'] = self.args.from_iata[0]
-      param['to']      = self.args.to_iata[0]
+      param['flyFrom'] = _from or self.args.from_iata[0]
+      param['to']      = _to or self.args.to_iata[0]
       
-      date = datetime.datetime.strptime(self.args.date[0], "%Y-%m-%d")
+      date = datetime.datetime.strptime(_date or self.args.date[0], "%Y-%m-%d")
       date_str = date.strftime("%d/%m/%Y")
       param['dateFrom']       = date_str
       param['dateTo']         = date_str
@@ -189,9 +1353,9 @@ class BookFlight(object):
          param['typeFlight'] = 'oneway'         # Default option
 
       # FASTEST vs CHEAPEST
-      # NOTE: In general the checked flight can be cheaper than the searched
-      #       one due to different price of baggage. But the description
-      #       of assignment is not clear.
+      # NOTE: The searched price is without baggage. With --bags the results
+      #       are ranked locally by the total price (_select_ranked), so the
+      #       checked flight is the really cheapest one.
       if self.args.fastest:
          sort = 'duration'
       else:
@@ -200,14 +1364,27 @@ class BookFlight(object):
       param['sort']  = sort
       param['asc']   = '1'          # 1 = ascending
       param['limit'] = _limit       # count of results
-      param['curr']  = _currency   
+      param['curr']  = _currency
+      if self._pnum() > 1:
+         param['adults'] = self._pnum()   # Seats for the whole group
+      
+      return param
+   # End of _search_params
+
+
+
+
+   def _search_flight_simple(self, _limit, _currency):
+      """ search_flight() variant: one search, the first flight is taken """
+      # -- Collect all Kiwi API flights parameters -----------------------------
+      param = self._search_params(_limit, _currency)
       
       # -- Send HTTP request ---------------------------------------------------
-      self.search_result = self._send_request(self.c_EP_FLIGHTS, param)
+      self.search_result = self._send_search(param)
       
       # Obtain 'booking_token'
       try:
-         json = self.search_result.json()
+         json = self._decode(self.search_result, 'search')
       except Exception as e:
          json = {}
          self.eprint("JSON: Invalid received data: EXCEPTION:", str(e) )
@@ -226,210 +1403,251 @@ class BookFlight(object):
          self.search_duration = json['data'][0]['fly_duration']
       except (IndexError, KeyError):
          self.iprint("currency/price/fly_duration not found in search response")
+      
+      # Candidates of the speculative check
+      try:
+         self.search_candidates = [
+            (f['booking_token'], f.get('price', 0), f.get('fly_duration', 0))
+            for f in json['data'][:self.c_SPECULATE_MAX] ]
+      except (KeyError, TypeError):
+         self.search_candidates = []
 
       # Debug purposes
       if self.args.debug:
-         pprint.pprint(self.search_result.url)
-         pprint.pprint(self.search_result.json())
+         self._dprint( self.search_result.url,
+                       json )
       
       return self.token
-   # End of search_flight
+   # End of _search_flight_simple
 
 
 
 
-   def check_flight (self, _token, _currency='EUR'):
-      """ Check the flight based on search response
-          
-          Arguments:
-            _token     (str): booking_token
-            _currency  (str): Currency
-      
-          Return:
-            (bool): flights_checked,
-            (bool): flights_invalid
+   def _search_flight_ranked(self, _currency):
+      """ search_flight() variant: one wide search ranked locally (--rank,
+          or the total price with --bags)
       """
-
-      # -- Collect all required Kiwi API check_flights parameters --------------
+      if self.args.rank_limit:
+         limit = self.args.rank_limit[0]
+      elif self.args.rank:
+         limit = self.c_RANK_LIMIT
+      else:
+         limit = self.c_BAGS_LIMIT
+      weight = self.args.price_weight[0] if self.args.price_weight else 0.5
+      if self.args.rank:
+         method = self.args.rank[0]
+      else:
+         method = 'fastest' if self.args.fastest else 'cheapest'
       
-      # Kiwi API check_flights parameters associative array {'param' : 'value'}
-      param = {}
-            
-      if self.args.bags:
-         bags = self.args.bags[0]
+      self.search_set   = self.search_result_set(limit, _currency)
+      return self._select_ranked(method, weight, _currency)
+   # End of _search_flight_ranked
+
+
+
+
+   def _search_flight_fan_out(self, _currency):
+      """ search_flight() variant: more airports/dates searched in parallel,
+          merged into the global top-k
+      """
+      if self.args.date_to:
+         dates = date_range(self.args.date[0], self.args.date_to[0])
       else:
-         bags = 0
+         dates = [ self.args.date[0] ]
       
-      param['booking_token']  = _token
-      param['bnum']           = bags
-      param['currency']       = _currency
-      param['pnum']           = 1            # Number of passengers
-      param['affily']         = 'picky_us'
-      param['v']              = 2
+      if self.args.rank:
+         k = self.args.rank_limit[0] if self.args.rank_limit \
+             else self.c_RANK_LIMIT
+      else:
+         k = self.c_TOP_K
+      workers = self.args.workers[0] if self.args.workers else self.c_WORKERS
+      key     = 'duration' if self.args.fastest else 'price'
+      bags    = self.args.bags[0] if self.args.bags else 0
+      # The cheapest flights with bags may be further in the responses
+      limit   = max(k, self.c_BAGS_LIMIT) if bags else k
       
-      # -- Send HTTP request ---------------------------------------------------
-      # You need to repeat the check_flights until the value is True
-      attempt   = self.check_attempts
-      f_ch      = None
-      f_i       = None
+      self.search_set = fan_out_search(
+         self,
+         self.args.from_iata[0].split(','),
+         self.args.to_iata[0].split(','),
+         dates,
+         _key      = key,
+         _k        = k,
+         _limit    = limit,
+         _currency = _currency,
+         _workers  = workers,
+         _bags     = bags,
+         _pnum     = self._pnum(),
+      )
+      if self._deadline_passes( _phase = 'search' ):
+         return 0
       
-      while True:
-         f_ch, f_i = self._send_check_flight(param)
-         
-         
-         if f_ch == True and f_i == False:
-            # Successfull response
-            
-            # Debug purposes
-            if self.args.debug:
-               pprint.pprint(self.check_result.url)
-               pprint.pprint(self.check_result.json())
-               
-            break
-         elif f_i == True:
-            # Invalid flight
-            self.eprint ('Flight is not bookable anymore: flights_invalid =',
-                           f_i, '. Ending...')
-            break
-         elif self.error:
-            # Some HTTP request error
-            break
-         else:
-            if attempt <= 0:
-               # Too much attempts => Give it up
-               self.eprint ('Unsuccessful. Ending...:', 'flights_checked =',
-                            str(f_ch), ', flights_invalid =', str(f_i) )
-               break
-            else:
-               # Repeat after some delay
-               self.iprint('Attempts left:', str(attempt),
-                           '. Waiting for', str(self.check_wait), 'seconds...')
-               attempt -= 1
-               sleep(self.check_wait)
-               
-      return f_ch, f_i
-   # End of check_flight
+      if self.args.rank:
+         method = self.args.rank[0]
+      else:
+         method = 'fastest' if self.args.fastest else 'cheapest'
+      weight = self.args.price_weight[0] if self.args.price_weight else 0.5
+      return self._select_ranked(method, weight, _currency)
+   # End of _search_flight_fan_out
 
 
 
 
-   def book_flight (self, _token, _currency, _passenger):
-      """ Book the flight based on check response
-         
-          Arguments:
-            _token     (str):       booking_token
-            _currency  (str):       Currency abv.
-            _passenger (Passenger): Passenger object
-            
-          Return:
-            (str): PNR booking code
+   def _select_ranked(self, _method, _weight, _currency):
+      """ Rank self.search_set and take the best flight. With --bags the
+          price is the total price including the bags of all passengers.
       """
-
-      # -- Collect all required Kiwi API book data -----------------------------
-      p = {}
-      p['documentID'] = _passenger.id
-      p['lastName']   = _passenger.last_name
-      p['title']      = _passenger.title
-      p['birthday']   = _passenger.birthday
-      p['firstName']  = _passenger.first_name
-      p['email']      = _passenger.email
-
-      if self.args.bags:
-         bags = self.args.bags[0]
-      else:
-         bags = 0
+      bags = self.args.bags[0] if self.args.bags else 0
+      self.search_order = ranking.rank(self.search_set, _method, _weight,
+                                       bags, self._pnum())
+      self.iprint('Ranked', len(self.search_set), 'flights by', _method,
+                  'with %d bags' % bags if bags else '')
       
-      data = {}
-      data['currency']        = _currency
-      data['passengers']      = [p]
-      data['booking_token']   = _token
-      data['bags']            = bags
-            
-      data_json = json.dumps(data)
+      if not self.search_order:
+         self.token = 0
+         if bags and len(self.search_set):
+            self.eprint("No searched flight offers", bags, "bags")
+         else:
+            self.eprint("booking_token was not found in the search response")
+         return self.token
       
-      # Send JSON data by POST method
-      try:
-         self.book_result = requests.post( self.c_EP_BOOK, data=data_json,
-                                           headers=self.c_HEADERS )
-      except Exception as e:
-         self.eprint( 'EXCEPTION: ' + str(e) )
+      total = self.search_set.total_price(bags, self._pnum())
+      best  = self.search_set[self.search_order[0]]
+      self.token           = best.booking_token
+      self.search_currency = _currency
+      self.search_price    = total[self.search_order[0]]
+      self.search_duration = self._format_duration(best.duration)
+      self.search_candidates = [
+         (self.search_set.token[i], total[i],
+          self._format_duration(self.search_set.duration[i]))
+         for i in self.search_order[:self.c_SPECULATE_MAX] ]
       
       # Debug purposes
       if self.args.debug:
-         pprint.pprint(json.dumps(data))
-         pprint.pprint(self.book_result)
-         pprint.pprint(self.book_result.status_code)
-         pprint.pprint(self.book_result.json())
+         self._dprint( getattr(self.search_result, 'url', None),
+                       [ self.search_set[i] for i in self.search_order[:10] ] )
       
+      return self.token
+   # End of _select_ranked
+
+
+
+
+   def _format_duration(self, _seconds):
+      """ Return: (str): Duration in the fly_duration format ('2h 05m') """
+      return '%dh %02dm' % (_seconds // 3600, _seconds % 3600 // 60)
+   # End of _format_duration
+
+
+
+
+   def _search_flight_stream(self, _limit, _currency):
+      """ search_flight() variant using the streaming parser """
+      meta   = {}
+      flight = {}
+      flights = self.iter_search(_limit, _currency, meta)
       try:
-         resp_json = self.book_result.json()
+         flight = next(flights, {})
       except Exception as e:
-         resp_json = {}
-         self.eprint("JSON: Invalid received data: EXCEPTION:", str(e) )
-            
-      # Check status
-      if 'status' in resp_json:
-         if resp_json['status'] == 'confirmed':
-            self.iprint('Booking status is confirmed.')
-         else:
-            self.eprint('Booking status is invalid:', resp_json['status'])
-      else:
-         self.eprint("Booking response doesn't contain confirmation status.")
+         if not self._deadline_passes( _phase = 'search' ):
+            self.eprint("JSON: Invalid received data: EXCEPTION:", str(e) )
+      finally:
+         flights.close()
       
-      # Check PNR
-      pnr = "0"
+      try:
+         self.token = flight['booking_token']
+      except KeyError:
+         self.token = 0
+         self.eprint("booking_token was not found in the search response")
       
-      if 'pnr' in resp_json:
-         pnr = resp_json['pnr']
-         self.iprint('PNR: ', pnr)
-      else:
-         self.eprint("Booking response doesn't contain PNR code.")
-   
-      return pnr
-   # End of book_flight   
+      # Just for information. The currency may follow the data array.
+      self.search_currency = meta.get('currency', _currency)
+      try:
+         self.search_price    = flight['price']
+         self.search_duration = flight['fly_duration']
+      except KeyError:
+         self.iprint("price/fly_duration not found in search response")
+      if self.token:
+         self.search_candidates = [ (self.token, self.search_price,
+                                     self.search_duration) ]
+      
+      # Debug purposes
+      if self.args.debug:
+         self._dprint( self.search_result.url,
+                       flight )
+      
+      return self.token
+   # End of _search_flight_stream
 
 
 
 
-   def eprint(self, *_args, **_kwargs):
-      """ Prints message on the stderr and sets self.error attribute
-          Arguments: Same as print()
+   def _iter_cached_search(self, _limit, _currency):
+      """ iter_search() variant: the response is taken from or stored into
+          self.search_cache, so it is downloaded whole (generator)
       """
-      self.error = True
-      if self.args.verbose:
-         print('ERROR:', *_args, file=sys.stderr, **_kwargs)
-   # End of eprint
+      param = self._search_params(_limit, _currency)
+      self.search_result = self._send_search(param)
+      if self.search_result.status_code is None:
+         return
+      
+      for flight in self._decode(self.search_result, 'search')['data']:
+         yield flight
+   # End of _iter_cached_search
 
 
 
 
-   def iprint(self, *_args, **_kwargs):
-      """ Prints message on the stdout if VERBOSE argument is True
-          Arguments: Same as print()
+   def _send_search(self, _params):
+      """ Send search request, the response is cached if self.search_cache
+          is set
+         
+          Arguments:
+            _params (dict): Request parameters
+      
+          Returns:
+            (Response): Response from the server or from the cache
       """
-      if self.args.verbose:
-         print('INFO:', *_args, file=sys.stderr, **_kwargs)
-   # End of iprint
+      cache = self.search_cache
+      if cache is not None:
+         resp = cache.get(self.c_EP_FLIGHTS, _params)
+         if resp is not None:
+            self.iprint('Search response taken from the cache')
+            return resp
+      
+      resp = self._send_request(self.c_EP_FLIGHTS, _params,
+                                _phase = 'search')
+      
+      if cache is not None and resp.status_code:
+         cache.put(self.c_EP_FLIGHTS, _params, resp)
+      return resp
+   # End of _send_search
 
 
-   
-   
-   """ -- PRIVATE -- """
-   
-   def _send_request(self, _ep, _params):
+
+
+   def _send_request(self, _ep, _params, _stream=False, _phase=None):
       """ Create and send HTTP request
          
           Arguments:
             _ep     (str):  API Endpoint
             _params (dict): Request parameters
+            _stream (bool): Do not download the body immediately
+            _phase  (str):  Booking phase of the request (metrics label)
       
           Returns:
             (Response): Response from the server
       """
+      import requests                     # HTTP requests, JSON
+      
       resp = requests.Response()
       try:
-         resp = requests.get( _ep, params = _params,
-                              headers = self.c_HEADERS )
+         resp = self.transport.get( _ep, _params = _params,
+                                    _headers = self.c_HEADERS,
+                                    _stream = _stream, _phase = _phase,
+                                    _deadline = self.deadline )
+      except DeadlineExceeded:
+         self._deadline_error(_phase or 'other')
       except Exception as e:
          self.eprint( 'EXCEPTION: ' + str(e) )
       
@@ -439,6 +1657,118 @@ class BookFlight(object):
    
    
    
+   def _codec(self):
+      """ Return: (JsonCodec): Codec of the request and response bodies """
+      if self.codec is None:
+         self.codec = default_codec()
+      return self.codec
+   # End of _codec
+   
+   
+   
+   
+   def _decode(self, _resp, _phase):
+      """ Decode the JSON response body. The body is decoded only once, the
+          result is kept on the response. The decoding time is recorded.
+         
+          Arguments:
+            _resp  (Response): Response from the server
+            _phase (str):      Booking phase of the response (metrics label)
+      
+          Returns:
+            (dict): Decoded JSON, raises exception for invalid data
+      """
+      if getattr(_resp, 'decoded_json', None) is not None:
+         return _resp.decoded_json
+      
+      started = monotonic()
+      data = decode_response(_resp, self._codec())
+      self.metrics.observe('bookflight_json_decode_seconds',
+                           monotonic() - started, { 'phase': _phase })
+      return data
+   # End of _decode
+   
+   
+   
+   
+   def _check_params(self, _token, _currency):
+      """ Collect all required Kiwi API check_flights parameters
+         
+          Arguments:
+            _token     (str): booking_token
+            _currency  (str): Currency
+      
+          Returns:
+            (dict): Request parameters
+      """
+      # Kiwi API check_flights parameters associative array {'param' : 'value'}
+      param = {}
+            
+      if self.args.bags:
+         bags = self.args.bags[0]
+      else:
+         bags = 0
+      
+      param['booking_token']  = _token
+      param['bnum']           = bags * self._pnum()
+      param['currency']       = _currency
+      param['pnum']           = self._pnum()   # Number of passengers
+      param['affily']         = 'picky_us'
+      param['v']              = 2
+      
+      return param
+   # End of _check_params
+
+
+
+
+   def _check_done(self, _f_ch, _f_i, _attempt, _delay=0):
+      """ Decides whether the check_flights polling is finished
+         
+          Arguments:
+            _f_ch    (bool):  flights_checked
+            _f_i     (bool):  flights_invalid
+            _attempt (int):   Attempts left
+            _delay   (float): Seconds until the next attempt
+      
+          Returns:
+            (bool): True = stop polling (success or error)
+      """
+      if _f_ch == True and _f_i == False:
+         # Successfull response
+         
+         # Debug purposes
+         if self.args.debug:
+            self._dprint( self.check_result.url,
+                          self._decode(self.check_result, 'check') )
+         
+         self._record(journal.c_CHECKED, check_price = self.check_price,
+                      check_currency = self.check_currency)
+         return True
+      elif _f_i == True:
+         # Invalid flight
+         self._record(journal.c_INVALID)
+         self.eprint ('Flight is not bookable anymore: flights_invalid =',
+                        _f_i, '. Ending...')
+         return True
+      elif self.error:
+         # Some HTTP request error
+         return True
+      elif self._deadline_passes(_delay):
+         # The next attempt would be after the deadline
+         return True
+      elif _attempt <= 0:
+         # Too much attempts => Give it up
+         self.eprint ('Unsuccessful. Ending...:', 'flights_checked =',
+                      str(_f_ch), ', flights_invalid =', str(_f_i) )
+         return True
+      
+      return False
+   # End of _check_done
+
+
+
+
    def _send_check_flight(self, _params):
       """ Sends and checks check flight request
          
@@ -453,13 +1783,14 @@ class BookFlight(object):
       f_i       = None
    
       # Send request
-      self.check_result = self._send_request(self.c_EP_CHECK, _params)
+      self.check_result = self._send_request(self.c_EP_CHECK, _params,
+                                             _phase = 'check')
          
       f_ch_str = 'flights_checked'
       f_i_str  = 'flights_invalid'
       
       try:
-         json = self.check_result.json()
+         json = self._decode(self.check_result, 'check')
       except Exception as e:
          json = {}
          self.eprint("JSON: Invalid received data: EXCEPTION:", str(e) )
@@ -509,6 +1840,8 @@ class BookFlight(object):
 class Passenger(object):
    """ Passenger's data class """
    
+   __slots__ = ('id', 'last_name', 'first_name', 'birthday', 'title', 'email')
+   
    def __init__(
       self,
       _id         = 0,
@@ -524,6 +1857,31 @@ class Passenger(object):
       self.birthday     = _birthday
       self.title        = _title
       self.email        = _email
+   
+   def to_dict(self):
+      """ Return: (dict): Passenger in the booking request format """
+      return { 'documentID': self.id,
+               'lastName':   self.last_name,
+               'title':      self.title,
+               'birthday':   self.birthday,
+               'firstName':  self.first_name,
+               'email':      self.email }
+   
+   def validate(self):
+      """ Return: (list): Problems of the passenger data, empty if valid """
+      problems = []
+      if not self.last_name or not self.first_name:
+         problems.append('missing name')
+      try:
+         datetime.datetime.strptime(self.birthday, "%Y-%m-%d")
+      except (TypeError, ValueError):
+         problems.append('invalid birthday ' + repr(self.birthday))
+      if str(self.title).lower() not in c_TITLES:
+         problems.append('invalid title ' + repr(self.title))
+      user, at, domain = str(self.email).partition('@')
+      if not user or not at or '.' not in domain:
+         problems.append('invalid email ' + repr(self.email))
+      return problems
       
       
       
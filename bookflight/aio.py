@@ -0,0 +1,251 @@
+
+'''
+    File name: aio.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from . import BookFlight               # Book flight implementation
+from .transport import Transport       # Pooled keep-alive HTTP transport
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class AsyncBookFlight(object):
+   """ Asyncio booking engine
+
+       Runs many search -> check -> book pipelines in one event loop. Every
+       pipeline has its own BookFlight object (its own state), all of them
+       share one pooled Transport. Blocking HTTP calls are executed in
+       a thread pool of _concurrency workers, which is also the limit of
+       requests in flight. The waiting between check_flights attempts is
+       asyncio.sleep(), so idle pipelines don't hold any thread.
+   """
+
+   def __init__(self, _concurrency=10, _transport=None, _cache=None):
+      """ Arguments:
+            _concurrency (int):         Max. number of HTTP requests in flight
+            _transport   (Transport):   Shared HTTP transport, None = new one
+            _cache       (SearchCache): Shared search cache, None = no cache
+      """
+      if _transport is None:
+         _transport = Transport( _pool_maxsize = _concurrency )
+      self.concurrency = _concurrency
+      self.transport   = _transport
+      self.cache       = _cache
+      self.executor    = ThreadPoolExecutor( max_workers = _concurrency )
+
+   def new_booking(self):
+      """ Creates BookFlight object sharing the engine transport
+
+          Return:
+            (BookFlight): New booking object, arguments are not set yet
+      """
+      bf = BookFlight( _transport = self.transport )
+      bf.search_cache = self.cache
+      return bf
+   # End of new_booking
+
+
+
+
+   async def _run(self, _func, *_args):
+      """ Run blocking function in the thread pool """
+      loop = asyncio.get_event_loop()
+      return await loop.run_in_executor(self.executor, _func, *_args)
+   # End of _run
+
+
+
+
+   async def search_flight(self, _bf, _limit=1, _currency='EUR'):
+      """ Async counterpart of BookFlight.search_flight()
+
+          Arguments:
+            _bf        (BookFlight): Booking object with arguments set
+            _limit     (int):        Limit of search results
+            _currency  (str):        Currency
+
+          Return:
+            (str): Booking token. Returns 0 if no token has been found
+      """
+      return await self._run(_bf.search_flight, _limit, _currency)
+   # End of search_flight
+
+
+
+
+   async def check_flight(self, _bf, _token, _currency='EUR'):
+      """ Async counterpart of BookFlight.check_flight()
+
+          Arguments:
+            _bf        (BookFlight): Booking object with arguments set
+            _token     (str):        booking_token
+            _currency  (str):        Currency
+
+          Return:
+            (bool): flights_checked,
+            (bool): flights_invalid
+      """
+      param    = _bf._check_params(_token, _currency)
+      attempt  = _bf.check_attempts
+      started  = monotonic()
+      deadline = started + _bf.check_deadline
+      polls    = 0
+
+      while True:
+         f_ch, f_i = await self._run(_bf._send_check_flight, param)
+         polls += 1
+
+         delay = _bf.check_backoff.delay(_bf.check_attempts - attempt,
+                                         _bf.check_wait)
+         if monotonic() + delay > deadline:
+            attempt = 0             # No time left for another attempt
+
+         if _bf._check_done(f_ch, f_i, attempt, delay):
+            break
+
+         # Repeat after some delay, the event loop serves other pipelines
+         _bf.iprint('Attempts left:', str(attempt),
+                    '. Waiting for', '%.1f' % delay, 'seconds...')
+         attempt -= 1
+         await asyncio.sleep(delay)
+
+      if f_ch == True and f_i == False:
+         _bf.check_latency = monotonic() - started
+      _bf.observe_check(started, polls)
+
+      return f_ch, f_i
+   # End of check_flight
+
+
+
+
+   async def check_candidates(self, _bf, _k, _currency='EUR'):
+      """ Async counterpart of BookFlight.check_candidates(). The flights
+          are polled by its CheckScheduler, one thread of the pool waits
+          for the result.
+
+          Arguments:
+            _bf        (BookFlight): Booking object after the search
+            _k         (int):        Number of checked flights
+            _currency  (str):        Currency
+
+          Return:
+            (bool): flights_checked,
+            (bool): flights_invalid of the chosen flight
+      """
+      if len(_bf.search_candidates[:_k]) < 2:
+         return await self.check_flight(_bf, _bf.token, _currency)
+      return await self._run(_bf.check_candidates, _k, _currency)
+   # End of check_candidates
+
+
+
+
+   async def book_flight(self, _bf, _token, _currency, _passenger):
+      """ Async counterpart of BookFlight.book_flight()
+
+          Arguments:
+            _bf        (BookFlight): Booking object with arguments set
+            _token     (str):        booking_token
+            _currency  (str):        Currency abv.
+            _passenger (Passenger):  Passenger object
+
+          Return:
+            (str): PNR booking code
+      """
+      return await self._run(_bf.book_flight, _token, _currency, _passenger)
+   # End of book_flight
+
+
+
+
+   async def run_pipeline(self, _bf, _passenger, _currency='EUR'):
+      """ Search, check and book one flight. If the booking object has
+          a journal, the pipeline is resumed from its last step. With
+          speculate set, the best searched flights are checked at once.
+
+          Arguments:
+            _bf        (BookFlight): Booking object with arguments set
+            _passenger (Passenger):  Passenger object
+            _currency  (str):        Currency abv.
+
+          Return:
+            (BookFlight): The booking object. The result is in its book_pnr
+                          attribute, bf.error is True in case of any error.
+      """
+      if _bf.error:
+         return _bf
+
+      step = _bf.resume()
+      if _bf.error:
+         return _bf
+
+      if step is None:
+         await self.search_flight(_bf, _currency = _currency)
+         if _bf.error:
+            return _bf
+
+      if step is None and _bf.args.speculate:
+         await self.check_candidates(_bf, _bf.args.speculate[0], _currency)
+         if _bf.error:
+            return _bf
+      elif step != 'checked':
+         await self.check_flight(_bf, _bf.token, _currency = _currency)
+         if _bf.error:
+            return _bf
+      token = _bf.token             # The chosen one with speculate
+
+      await self.book_flight(_bf, token, _currency, _passenger)
+      return _bf
+   # End of run_pipeline
+
+
+
+
+   def run_many(self, _jobs, _currency='EUR'):
+      """ Run pipelines for all jobs in a new event loop
+
+          Arguments:
+            _jobs      (list):  List of (BookFlight, Passenger) tuples
+            _currency  (str):   Currency abv.
+
+          Return:
+            (list): BookFlight objects in the order of the jobs
+      """
+      async def run_all():
+         return await asyncio.gather(*[
+            self.run_pipeline(bf, passenger, _currency)
+            for bf, passenger in _jobs ])
+
+      loop = asyncio.new_event_loop()
+      try:
+         return loop.run_until_complete(run_all())
+      finally:
+         loop.close()
+   # End of run_many
+
+
+
+
+   def close(self):
+      """ Shut down the thread pool and close the connections """
+      self.executor.shutdown()
+      self.transport.close()
+   # End of close
+
+
+
+
+# End of file
+
+
+
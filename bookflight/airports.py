@@ -0,0 +1,463 @@
+
+'''
+    File name: airports.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+# NOTE: csv and tempfile are imported only to build the index
+import collections
+import math
+import mmap
+import os
+import struct
+import threading
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+c_DATA_DIR    = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+c_AIRPORTS    = os.path.join(c_DATA_DIR, 'airports.csv')   # iata,city,...
+c_CITIES      = os.path.join(c_DATA_DIR, 'cities.csv')     # City codes
+c_INDEX       = os.path.join(c_DATA_DIR, 'airports.idx')   # Built index
+
+c_MAGIC       = b'BFAI'
+c_VERSION     = 1
+c_CELL_DEG    = 2               # Grid cell size in degrees
+c_ROWS        = 180 // c_CELL_DEG
+c_COLS        = 360 // c_CELL_DEG
+c_SLOTS       = 26 ** 3         # One slot per three letter code
+c_EARTH_KM    = 6371.0
+
+# Binary layout, all little-endian:
+#   header, airport slots, city slots, grid cells, airports, cities,
+#   city members, strings
+c_HEADER      = struct.Struct('<4sHHIII')   # magic, version, cell, counts
+c_SLOT        = struct.Struct('<H')         # Record number + 1, 0 = empty
+c_CELL        = struct.Struct('<I')         # First airport of the cell
+c_AIRPORT     = struct.Struct('<3sxffI')    # iata, lat, lon, strings offset
+c_CITY        = struct.Struct('<3sxHH')     # code, first member, count
+
+Airport = collections.namedtuple('Airport', 'iata city country lat lon')
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class AirportIndex(object):
+   """ Memory-mapped index of the airports and city codes
+
+       Codes are looked up in O(1) by a direct table of all three letter
+       codes. The airports are sorted by the cells of a 2 degree grid,
+       so nearby() reads only the cells around the airport. The file is
+       built by build_index(), see default_index().
+   """
+
+   def __init__(self, _path=c_INDEX):
+      """ Arguments:
+            _path (str): Index file built by build_index(), raises
+                         ValueError if it isn't a valid index
+      """
+      self.path = _path
+      with open(_path, 'rb') as f:
+         self._map = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+
+      try:
+         magic, version, cell, count, cities, members = \
+            c_HEADER.unpack_from(self._map)
+      except struct.error:
+         magic = version = cell = None
+      if magic != c_MAGIC or version != c_VERSION or cell != c_CELL_DEG:
+         self._map.close()
+         raise ValueError('Invalid airport index: ' + _path)
+
+      self.count  = count
+      self.cities = cities
+      offsets = _offsets(count, cities, members)
+      self._airport_slots = offsets[0]
+      self._city_slots    = offsets[1]
+      self._cells         = offsets[2]
+      self._airports      = offsets[3]
+      self._city_records  = offsets[4]
+      self._members       = offsets[5]
+      self._strings       = offsets[6]
+
+   def __len__(self):
+      return self.count
+
+   def __contains__(self, _code):
+      return self.is_valid(_code)
+
+   def is_valid(self, _code):
+      """ Return: (bool): True for a known airport or city code """
+      slot = _slot(_code)
+      if slot is None:
+         return False
+      return bool(self._slot_value(self._airport_slots, slot) or
+                  self._slot_value(self._city_slots, slot))
+   # End of is_valid
+
+
+
+
+   def get(self, _code):
+      """ Airport of the IATA code
+
+          Arguments:
+            _code (str): IATA code of the airport
+
+          Return:
+            (Airport): Airport record, None if unknown
+      """
+      slot = _slot(_code)
+      if slot is None:
+         return None
+      number = self._slot_value(self._airport_slots, slot)
+      return self._airport(number - 1) if number else None
+   # End of get
+
+
+
+
+   def city(self, _code):
+      """ Airports of the city code (LON, NYC, ...)
+
+          Arguments:
+            _code (str): IATA city code
+
+          Return:
+            (list): IATA codes of the airports, empty for unknown codes
+      """
+      slot = _slot(_code)
+      if slot is None:
+         return []
+      number = self._slot_value(self._city_slots, slot)
+      if not number:
+         return []
+      code, first, size = c_CITY.unpack_from(
+         self._map, self._city_records + (number - 1) * c_CITY.size)
+      return [ self._airport(self._member(first + i)).iata
+               for i in range(size) ]
+   # End of city
+
+
+
+
+   def nearby(self, _code, _radius):
+      """ Airports within the radius, the airport itself included
+
+          Arguments:
+            _code   (str):   IATA code of the airport
+            _radius (float): Radius in km
+
+          Return:
+            (list): (distance in km, IATA code) tuples, nearest first.
+                    Empty for unknown airports.
+      """
+      center = self.get(_code)
+      if center is None:
+         return []
+
+      result = []
+      for number in self._cells_around(center.lat, center.lon, _radius):
+         airport = self._airport(number)
+         dist = distance(center.lat, center.lon, airport.lat, airport.lon)
+         if dist <= _radius:
+            result.append((dist, airport.iata))
+      result.sort()
+      return result
+   # End of nearby
+
+
+
+
+   def expand(self, _code, _radius=0, _limit=None):
+      """ Airports of the airport or city code and the airports nearby
+
+          Arguments:
+            _code   (str):   IATA code of the airport or city
+            _radius (float): Radius in km, 0 = only the city airports
+            _limit  (int):   Max. number of airports, None = all
+
+          Return:
+            (list): IATA codes, the given airport (city airports) first,
+                    then by distance. Empty for unknown codes.
+      """
+      centers = self.city(_code) or ([_code.upper()] if self.get(_code)
+                                      else [])
+      found = dict( (code, 0.0) for code in centers )
+      if _radius > 0:
+         for center in centers:
+            for dist, code in self.nearby(center, _radius):
+               found[code] = min(dist, found.get(code, dist))
+      codes = sorted(found, key = lambda code: (found[code], code))
+      return codes[:_limit] if _limit else codes
+   # End of expand
+
+
+
+
+   def close(self):
+      """ Unmap the index file """
+      self._map.close()
+   # End of close
+
+
+
+
+   """ -- PRIVATE -- """
+
+   def _slot_value(self, _table, _slot):
+      """ Record number + 1 in the slot table, 0 = empty """
+      return c_SLOT.unpack_from(self._map, _table + _slot * c_SLOT.size)[0]
+   # End of _slot_value
+
+
+
+
+   def _member(self, _i):
+      """ Airport number of the i-th city member """
+      return c_SLOT.unpack_from(self._map, self._members +
+                                _i * c_SLOT.size)[0]
+   # End of _member
+
+
+
+
+   def _airport(self, _number):
+      """ Airport record number _number """
+      iata, lat, lon, text = c_AIRPORT.unpack_from(
+         self._map, self._airports + _number * c_AIRPORT.size)
+      start = self._strings + text
+      end   = self._map.find(b'\0', start)
+      city, country = self._map[start:end].decode('utf-8').split('\t')
+      return Airport(iata.decode('ascii'), city, country, lat, lon)
+   # End of _airport
+
+
+
+
+   def _cells_around(self, _lat, _lon, _radius):
+      """ Numbers of the airports in the grid cells around the point """
+      dlat = math.degrees(_radius / c_EARTH_KM)
+      row_min = _row(max(_lat - dlat, -90.0))
+      row_max = _row(min(_lat + dlat, 90.0))
+
+      # Longitude span at the latitude farthest from the equator
+      far = min(abs(_lat) + dlat, 90.0)
+      cos = math.cos(math.radians(far))
+      if cos < 1e-6 or dlat / cos >= 180:
+         cols = range(c_COLS)
+      else:
+         dlon = dlat / cos
+         first = _col(_lon - dlon)
+         count = (_col(_lon + dlon) - first) % c_COLS + 1
+         cols = [ (first + i) % c_COLS for i in range(count) ]
+
+      for row in range(row_min, row_max + 1):
+         for col in cols:
+            cell = row * c_COLS + col
+            start, end = struct.unpack_from('<II', self._map,
+                                            self._cells + cell * c_CELL.size)
+            for number in range(start, end):
+               yield number
+   # End of _cells_around
+
+
+
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_index():
+   """ Index of the bundled airport data, opened with the first use. It is
+       (re)built if it is missing or older than the data files, into the
+       temporary directory if the package directory isn't writable.
+
+       Return:
+         (AirportIndex): Shared index, None if it can't be built
+   """
+   global _default
+   with _default_lock:
+      if _default is None:
+         import tempfile
+         fallback = os.path.join(tempfile.gettempdir(),
+                                 'bookflight-airports.idx')
+         for path in (c_INDEX, fallback):
+            try:
+               if _stale(path):
+                  build_index(path)
+               _default = AirportIndex(path)
+               break
+            except (OSError, ValueError):
+               continue
+   return _default
+# End of default_index
+
+
+
+
+def build_index(_path=c_INDEX, _airports=c_AIRPORTS, _cities=c_CITIES):
+   """ Build the binary index from the CSV files. The file is replaced
+       atomically, readers never see a partial index.
+
+       Arguments:
+         _path     (str): Index file
+         _airports (str): CSV with the columns iata, city, country, lat, lon
+         _cities   (str): CSV with the columns code, city, country, airports
+                          (space separated IATA codes)
+
+       Return:
+         (int): Number of airports
+   """
+   import csv
+   with open(_airports, encoding = 'utf-8', newline = '') as f:
+      airports = [ (row['iata'].upper(), row['city'], row['country'],
+                    float(row['lat']), float(row['lon']))
+                   for row in csv.DictReader(f)
+                   if _slot(row['iata']) is not None ]
+   with open(_cities, encoding = 'utf-8', newline = '') as f:
+      cities = [ (row['code'].upper(), row['airports'].split())
+                 for row in csv.DictReader(f)
+                 if _slot(row['code']) is not None ]
+
+   # Airports sorted by the grid cells
+   airports.sort(key = lambda a: (_row(a[3]) * c_COLS + _col(a[4]), a[0]))
+   numbers = dict( (a[0], i) for i, a in enumerate(airports) )
+
+   airport_slots = [0] * c_SLOTS
+   cells   = [0] * (c_ROWS * c_COLS + 1)
+   records = []
+   strings = bytearray()
+   for i, (iata, city, country, lat, lon) in enumerate(airports):
+      airport_slots[_slot(iata)] = i + 1
+      cells[_row(lat) * c_COLS + _col(lon) + 1] += 1
+      records.append(c_AIRPORT.pack(iata.encode('ascii'), lat, lon,
+                                    len(strings)))
+      strings += (city + '\t' + country).encode('utf-8') + b'\0'
+   for cell in range(1, len(cells)):
+      cells[cell] += cells[cell - 1]   # Counts => start of every cell
+
+   city_slots   = [0] * c_SLOTS
+   city_records = []
+   members      = []
+   for code, codes in cities:
+      known = [ numbers[c] for c in codes if c in numbers ]
+      if not known:
+         continue
+      city_records.append(c_CITY.pack(code.encode('ascii'), len(members),
+                                      len(known)))
+      city_slots[_slot(code)] = len(city_records)
+      members.extend(known)
+
+   data = bytearray(c_HEADER.pack(c_MAGIC, c_VERSION, c_CELL_DEG,
+                                  len(records), len(city_records),
+                                  len(members)))
+   data += struct.pack('<%dH' % c_SLOTS, *airport_slots)
+   data += struct.pack('<%dH' % c_SLOTS, *city_slots)
+   data += struct.pack('<%dI' % len(cells), *cells)
+   data += b''.join(records)
+   data += b''.join(city_records)
+   data += struct.pack('<%dH' % len(members), *members)
+   data += strings
+
+   temp = '%s.%d.tmp' % (_path, os.getpid())
+   with open(temp, 'wb') as f:
+      f.write(data)
+   os.replace(temp, _path)
+   return len(records)
+# End of build_index
+
+
+
+
+def distance(_lat1, _lon1, _lat2, _lon2):
+   """ Great-circle distance (haversine)
+
+       Return:
+         (float): Distance of the points in km
+   """
+   phi1, phi2 = math.radians(_lat1), math.radians(_lat2)
+   dphi = phi2 - phi1
+   dlam = math.radians(_lon2 - _lon1)
+   a = math.sin(dphi / 2) ** 2 + \
+       math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
+   return 2 * c_EARTH_KM * math.asin(min(1.0, math.sqrt(a)))
+# End of distance
+
+
+
+
+def _slot(_code):
+   """ Slot of the three letter code, None if it isn't A-Z letters """
+   if len(_code) != 3:
+      return None
+   slot = 0
+   for char in _code.upper():
+      if not 'A' <= char <= 'Z':
+         return None
+      slot = slot * 26 + ord(char) - 65
+   return slot
+# End of _slot
+
+
+
+
+def _row(_lat):
+   """ Grid row of the latitude """
+   return min(int((_lat + 90.0) // c_CELL_DEG), c_ROWS - 1)
+# End of _row
+
+
+
+
+def _col(_lon):
+   """ Grid column of the longitude """
+   return int((_lon + 180.0) // c_CELL_DEG) % c_COLS
+# End of _col
+
+
+
+
+def _offsets(_count, _cities, _members):
+   """ Offsets of the sections of the index file """
+   offsets = [ c_HEADER.size ]
+   for size in ( c_SLOTS * c_SLOT.size,                    # Airport slots
+                 c_SLOTS * c_SLOT.size,                    # City slots
+                 (c_ROWS * c_COLS + 1) * c_CELL.size,      # Cells
+                 _count * c_AIRPORT.size,                  # Airports
+                 _cities * c_CITY.size,                    # Cities
+                 _members * c_SLOT.size ):                 # City members
+      offsets.append(offsets[-1] + size)
+   return offsets
+# End of _offsets
+
+
+
+
+def _stale(_path):
+   """ Return: (bool): True if the index is missing or older than the data """
+   try:
+      built = os.path.getmtime(_path)
+   except OSError:
+      return True
+   return any( os.path.getmtime(data) > built
+               for data in (c_AIRPORTS, c_CITIES) )
+# End of _stale
+
+
+
+
+# End of file
+
+
+
@@ -0,0 +1,405 @@
+
+'''
+    File name: batch.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import argparse                        # Script parameters parser
+import asyncio
+import json
+import sys
+from . import Passenger                # Passenger class (data structure)
+from .journal import Journal, c_BOOKED, c_FAILED   # Resumable batches
+from .aio import AsyncBookFlight       # Asyncio booking engine
+from .transport import Transport       # Pooled keep-alive HTTP transport
+from .ratelimit import RateLimiter, parse_rates   # Per-phase rate limits
+from .hedge import HedgePolicy         # Hedged search requests
+from .breaker import CircuitBreakers   # Per-endpoint circuit breakers
+from .capture import CaptureWriter     # Record/replay archive
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+c_CURRENCY  = 'CZK'
+c_WORKERS   = 10         # HTTP requests in flight
+c_PIPELINES = 100        # Bookings processed at once
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def main(_argv=None):
+   """ Batch booking script: book_batch.py [FILE] [OPTIONS] """
+   parser = argparse.ArgumentParser(
+      description="This program books the flights of all jobs in the JSONL "
+                  "file. One result line is printed per job.")
+   parser.add_argument(
+      'file', help='JSONL file with booking jobs (default stdin)', nargs='?',
+      default='-'
+   )
+   parser.add_argument(
+      '--workers', help='HTTP requests in flight (default ' +
+      str(c_WORKERS) + ')', type=int, default=c_WORKERS
+   )
+   parser.add_argument(
+      '--pipelines', help='bookings processed at once (default ' +
+      str(c_PIPELINES) + ')', type=int, default=c_PIPELINES
+   )
+   parser.add_argument(
+      '--currency', help='default currency (default ' + c_CURRENCY + ')',
+      type=str, default=c_CURRENCY
+   )
+   parser.add_argument(
+      '--rate', help='max. requests per second of the phase (search, check '
+      'or book), e.g. --rate search=5 --rate check=20', type=str,
+      action='append', metavar='PHASE=N'
+   )
+   parser.add_argument(
+      '--hedge', help='send a duplicate search request when it has no '
+      'response after the P-th percentile latency of the recent searches, '
+      'the first response is used', type=float, metavar='P'
+   )
+   parser.add_argument(
+      '--breaker', help='fail the requests of an endpoint fast for 30 '
+      'seconds after N consecutive failures (errors, 5xx)', type=int,
+      metavar='N'
+   )
+   parser.add_argument(
+      '--journal', help='journal file, a restarted batch skips the booked '
+      'jobs and resumes the interrupted ones', type=str
+   )
+   parser.add_argument(
+      '--metrics', help='write timing metrics of the phases to the file '
+      '(.json = JSON, otherwise Prometheus text, - = stderr)', type=str
+   )
+   parser.add_argument(
+      '--capture', help='record the HTTP requests and responses into the '
+      'archive FILE (and FILE.idx) for replay', type=str, metavar='FILE'
+   )
+   parser.add_argument(
+      '-v', '--verbose', help='prints additional info', action="store_true"
+   )
+   args = parser.parse_args(_argv)
+   try:
+      rates = parse_rates(args.rate)
+   except ValueError as e:
+      parser.error(str(e))
+   if args.hedge is not None and not 0 < args.hedge < 100:
+      parser.error('--hedge P must be between 0 and 100')
+   if args.breaker is not None and args.breaker < 1:
+      parser.error('--breaker N must be positive')
+
+   if args.file == '-':
+      run_batch(sys.stdin, sys.stdout, args.workers, args.pipelines,
+                args.currency, args.verbose, args.metrics, args.journal,
+                rates, args.capture, args.hedge, args.breaker)
+   else:
+      with open(args.file) as f:
+         run_batch(f, sys.stdout, args.workers, args.pipelines,
+                   args.currency, args.verbose, args.metrics, args.journal,
+                   rates, args.capture, args.hedge, args.breaker)
+# End of main
+
+
+
+
+def run_batch(
+   _input,
+   _output,
+   _workers   = c_WORKERS,
+   _pipelines = c_PIPELINES,
+   _currency  = c_CURRENCY,
+   _verbose   = False,
+   _metrics   = None,
+   _journal   = None,
+   _rates     = None,
+   _capture   = None,
+   _hedge     = None,
+   _breaker   = None,
+):
+   """ Book the flights of all jobs
+
+       The jobs are read lazily, at most _pipelines of them are processed at
+       once. A result line is written as soon as the job is finished, so the
+       results are not in the order of the jobs. With the journal, the
+       jobs already booked (or failed) are not run again, their result
+       lines are written from the journal. The interrupted jobs resume
+       from their last step. Job ids must be unique.
+
+       Job line:
+         {"id": "1", "date": "2018-04-13", "from": "BCN", "to": "DUB",
+          "bags": 1, "return": 5, "fastest": false, "currency": "EUR",
+          "passenger": {"id": "001", "last_name": "...", "first_name": "...",
+                        "birthday": "YYYY-MM-DD", "title": "Mr",
+                        "email": "..."}}
+       A group is booked at once with "passengers": [{...}, {...}] instead
+       of "passenger". "deadline": 30 limits the job to 30 seconds.
+       Result line:
+         {"id": "1", "pnr": "ABC123", "error": null}
+       A failed job has "pnr": "0" and the error message, "pnr": null if
+       the job was stopped by an unexpected exception. The other jobs
+       go on in both cases.
+
+       Arguments:
+         _input     (file): JSONL lines with the jobs
+         _output    (file): Result lines are written here
+         _workers   (int):  HTTP requests in flight
+         _pipelines (int):  Bookings processed at once
+         _currency  (str):  Currency of jobs without "currency"
+         _verbose   (bool): Prints additional info
+         _metrics   (str):  Write the metrics to the file, see Metrics.write()
+         _journal   (str):  Journal file, None = no journaling
+         _rates     (dict): Max. requests per second of the phases
+         _capture   (str):  Archive file of the recorded HTTP traffic,
+                            None = no capture
+         _hedge     (float): Latency percentile of the hedged searches,
+                             None = no hedging
+         _breaker   (int):  Failures opening the circuit of an endpoint,
+                            None = no circuit breakers
+
+       Return:
+         (int): Number of failed jobs
+   """
+   transport = Transport( _pool_maxsize = _workers,
+                          _rate_limiter = RateLimiter(_rates),
+                          _hedge = HedgePolicy(_hedge) if _hedge else None,
+                          _breakers = CircuitBreakers(_breaker)
+                                      if _breaker else None )
+   if _capture:
+      transport.capture = CaptureWriter(_capture)
+   engine  = AsyncBookFlight( _concurrency = _workers, _transport = transport )
+   journal = Journal(_journal) if _journal else None
+   loop    = asyncio.new_event_loop()
+   try:
+      return loop.run_until_complete(
+         _run_jobs(engine, _input, _output, _pipelines, _currency, _verbose,
+                   journal))
+   finally:
+      loop.close()
+      engine.close()
+      if journal is not None:
+         journal.close()
+      if transport.capture is not None:
+         transport.capture.close()
+      if _metrics:
+         engine.transport.metrics.write(_metrics)
+# End of run_batch
+
+
+
+
+async def _run_jobs(_engine, _input, _output, _pipelines, _currency,
+                    _verbose, _journal=None):
+   """ Run the pipelines of all jobs, at most _pipelines at once """
+   pending = set()
+   failed  = 0
+
+   for n, line in enumerate(_input):
+      if not line.strip():
+         continue
+
+      while len(pending) >= _pipelines:
+         done, pending = await asyncio.wait(
+            pending, return_when = asyncio.FIRST_COMPLETED)
+         failed += _write_results(done, _output)
+
+      pending.add(asyncio.ensure_future(
+         _run_job(_engine, line, n + 1, _currency, _verbose, _journal)))
+
+   while pending:
+      done, pending = await asyncio.wait(
+         pending, return_when = asyncio.FIRST_COMPLETED)
+      failed += _write_results(done, _output)
+
+   return failed
+# End of _run_jobs
+
+
+
+
+async def _run_job(_engine, _line, _line_no, _currency, _verbose,
+                   _journal=None):
+   """ Parse one job line and run its pipeline
+
+       Return:
+         (dict): Result line
+   """
+   job_id = _line_no
+   try:
+      job = json.loads(_line)
+      job_id = job.get('id', _line_no)
+      bf = _engine.new_booking()
+      passenger, currency = setup_job(bf, job, _currency, _verbose)
+   except (ValueError, KeyError, TypeError, AttributeError) as e:
+      return { 'id': job_id, 'pnr': '0', 'error': 'Invalid job: ' + repr(e) }
+
+   if _journal is not None:
+      bf.journal, bf.journal_id = _journal, job_id
+      state = _journal.state(job_id)
+      if state is not None and state['step'] == c_BOOKED:
+         return { 'id': job_id, 'pnr': state['pnr'], 'error': None }
+      if state is not None and state['step'] == c_FAILED:
+         return { 'id': job_id, 'pnr': '0', 'error': state['error'] }
+
+   try:
+      await _engine.run_pipeline(bf, passenger, currency)
+   except asyncio.CancelledError:
+      raise
+   except Exception as e:
+      # An unexpected error fails only this job, not the whole batch
+      return { 'id': job_id, 'pnr': None, 'error': str(e) or repr(e) }
+
+   if bf.error:
+      return { 'id': job_id, 'pnr': '0', 'error': bf.error_msg }
+   return { 'id': job_id, 'pnr': bf.book_pnr, 'error': None }
+# End of _run_job
+
+
+
+
+def _write_results(_done, _output):
+   """ Write result lines of the finished jobs
+
+       Return:
+         (int): Number of failed jobs
+   """
+   failed = 0
+   for task in _done:
+      result = task.result()
+      if result['error'] is not None:
+         failed += 1
+      _output.write(json.dumps(result) + '\n')
+   _output.flush()
+   return failed
+# End of _write_results
+
+
+
+
+def setup_job(_bf, _job, _currency=c_CURRENCY, _verbose=False,
+              _passenger=True):
+   """ Set the booking object arguments from the job dict
+
+       Arguments:
+         _bf        (BookFlight): Booking object
+         _job       (dict):       Job fields, see run_batch()
+         _currency  (str):        Currency of jobs without "currency"
+         _verbose   (bool):       Prints additional info
+         _passenger (bool):       The "passenger" or "passengers" field is
+                                  required
+
+       Return:
+         (Passenger): Passenger object, list of them for "passengers",
+                      None if not required and missing,
+         (str):       Currency
+
+       Raises:
+         KeyError, TypeError, AttributeError: Missing or invalid job fields
+   """
+   currency  = _job.get('currency', _currency)
+   if 'passengers' in _job:
+      passenger = [ passenger_from_dict(p) for p in _job['passengers'] ]
+   elif _passenger or 'passenger' in _job:
+      passenger = passenger_from_dict(_job['passenger'])
+   else:
+      passenger = None
+
+   _bf.set_args(
+      _job['date'],
+      _job['from'],
+      _job['to'],
+      _bags     = _job.get('bags', 0),
+      _return_n = _job.get('return'),
+      _fastest  = _job.get('fastest', False),
+      _verbose  = _verbose,
+      _deadline = _job.get('deadline'),
+   )
+   if isinstance(passenger, list):
+      _bf.set_passengers(passenger)
+   return passenger, currency
+# End of setup_job
+
+
+
+
+def validate_job(_job, _passenger=True, _token=False):
+   """ Check the types of the job fields used by setup_job()
+
+       Arguments:
+         _job       (dict): Job fields, see run_batch()
+         _passenger (bool): The "passenger" or "passengers" field is
+                            required
+         _token     (bool): The "booking_token" field is required
+
+       Return:
+         (list): Problems of the job, empty if valid
+   """
+   if not isinstance(_job, dict):
+      return ['the job is not a JSON object']
+
+   problems = []
+   required = ['date', 'from', 'to'] + (['booking_token'] if _token else [])
+   for name in required:
+      if name not in _job:
+         problems.append('missing "' + name + '"')
+      elif not isinstance(_job[name], str):
+         problems.append('"' + name + '" is not a string')
+   if 'currency' in _job and not isinstance(_job['currency'], str):
+      problems.append('"currency" is not a string')
+
+   for name in ('bags', 'return', 'deadline'):
+      value = _job.get(name)
+      if value is not None and (isinstance(value, bool) or
+                                not isinstance(value, (int, float))):
+         problems.append('"' + name + '" is not a number')
+   if not isinstance(_job.get('fastest', False), bool):
+      problems.append('"fastest" is not a boolean')
+
+   if 'passengers' in _job:
+      passengers = _job['passengers']
+      if not isinstance(passengers, list) or \
+         not all( isinstance(p, dict) for p in passengers ):
+         problems.append('"passengers" is not a list of objects')
+   elif 'passenger' in _job:
+      if not isinstance(_job['passenger'], dict):
+         problems.append('"passenger" is not an object')
+   elif _passenger:
+      problems.append('missing "passenger"')
+   return problems
+# End of validate_job
+
+
+
+
+def passenger_from_dict(_data):
+   """ Create Passenger object from the job dict
+
+       Arguments:
+         _data (dict): Passenger fields: id, last_name, first_name, birthday,
+                       title, email
+
+       Return:
+         (Passenger): Passenger object
+   """
+   return Passenger(
+      _id         = _data.get('id', 0),
+      _last_name  = _data.get('last_name', ""),
+      _first_name = _data.get('first_name', ""),
+      _birthday   = _data.get('birthday', ""),
+      _title      = _data.get('title', ""),
+      _email      = _data.get('email', ""),
+   )
+# End of passenger_from_dict
+
+
+
+
+# End of file
+
+
+
@@ -0,0 +1,168 @@
+
+'''
+    File name: breaker.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import threading
+from time import monotonic
+from urllib.parse import urlsplit
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class CircuitOpen(Exception):
+   """ The request was not sent, the circuit of its endpoint is open """
+
+
+
+
+class CircuitBreaker(object):
+   """ Circuit breaker of one endpoint
+
+       After _failures consecutive failed requests (connection errors,
+       timeouts, 5xx) the circuit opens: the requests fail fast without
+       being sent. After _reset seconds one request is let through
+       (half-open), its success closes the circuit, its failure keeps it
+       open for another _reset seconds.
+   """
+
+   def __init__(self, _failures=5, _reset=30.0):
+      """ Arguments:
+            _failures (int):   Consecutive failures opening the circuit
+            _reset    (float): Seconds until the next trial request
+      """
+      self.max_failures = _failures
+      self.reset        = _reset
+
+      self._lock     = threading.Lock()
+      self._failures = 0             # Consecutive failures
+      self._open     = False
+      self._retry    = 0.0           # monotonic() time of the next trial
+      self.opened    = 0             # Times the circuit was opened
+      self.rejected  = 0             # Requests failed fast
+
+   @property
+   def state(self):
+      """ (str): 'closed', 'open' or 'half-open' (trial request allowed) """
+      with self._lock:
+         if not self._open:
+            return 'closed'
+         return 'half-open' if monotonic() >= self._retry else 'open'
+
+   def allow(self):
+      """ Decide whether the request can be sent
+
+          Return:
+            (bool): False = the circuit is open, fail fast
+      """
+      with self._lock:
+         if not self._open:
+            return True
+         now = monotonic()
+         if now >= self._retry:
+            # One trial request per reset period
+            self._retry = now + self.reset
+            return True
+         self.rejected += 1
+         return False
+   # End of allow
+
+
+
+
+   def success(self):
+      """ The request succeeded, close the circuit """
+      with self._lock:
+         self._failures = 0
+         self._open     = False
+   # End of success
+
+
+
+
+   def failure(self):
+      """ The request failed
+
+          Return:
+            (bool): True if the circuit has been opened now
+      """
+      with self._lock:
+         self._failures += 1
+         if self._open:
+            self._retry = monotonic() + self.reset    # The trial failed
+            return False
+         if self._failures < self.max_failures:
+            return False
+         self._open  = True
+         self._retry = monotonic() + self.reset
+         self.opened += 1
+         return True
+   # End of failure
+
+
+
+
+   def stats(self):
+      """ Return: (dict): State, failures, openings and rejected requests """
+      state = self.state
+      with self._lock:
+         return { 'state': state, 'failures': self._failures,
+                  'opened': self.opened, 'rejected': self.rejected }
+   # End of stats
+
+
+
+
+class CircuitBreakers(object):
+   """ Circuit breakers of the endpoints (host and path), created with
+       the first request of the endpoint
+   """
+
+   def __init__(self, _failures=5, _reset=30.0):
+      """ Arguments: See CircuitBreaker """
+      self.max_failures = _failures
+      self.reset        = _reset
+      self.breakers     = {}         # endpoint -> CircuitBreaker
+      self._lock        = threading.Lock()
+
+   def get(self, _url):
+      """ Circuit breaker of the URL endpoint
+
+          Return:
+            (str):            Endpoint (host and path),
+            (CircuitBreaker): Its breaker
+      """
+      url      = urlsplit(_url)
+      endpoint = url.netloc + url.path
+      breaker  = self.breakers.get(endpoint)
+      if breaker is None:
+         with self._lock:
+            breaker = self.breakers.get(endpoint)
+            if breaker is None:
+               breaker = self.breakers[endpoint] = \
+                  CircuitBreaker(self.max_failures, self.reset)
+      return endpoint, breaker
+   # End of get
+
+
+
+
+   def stats(self):
+      """ Return: (dict): endpoint -> breaker stats """
+      return dict( (endpoint, breaker.stats())
+                   for endpoint, breaker in list(self.breakers.items()) )
+   # End of stats
+
+
+
+
+# End of file
+
+
+
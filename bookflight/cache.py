@@ -0,0 +1,235 @@
+
+'''
+    File name: cache.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class SearchCache(object):
+   """ Cache of the search responses
+
+       Responses are keyed by the endpoint and the normalized Kiwi API
+       parameters. The memory tier is LRU with a limited size, the optional
+       disk tier (one file per response in _path) is shared between script
+       invocations. All entries expire after _ttl seconds.
+   """
+
+   def __init__(self, _ttl=300, _maxsize=256, _path=None):
+      """ Arguments:
+            _ttl     (float): Time to live of the entries in seconds
+            _maxsize (int):   Max. entries in the memory tier
+            _path    (str):   Directory of the disk tier, None = memory only
+      """
+      self.ttl     = _ttl
+      self.maxsize = _maxsize
+      self.path    = _path
+      if _path:
+         os.makedirs(_path, exist_ok = True)
+
+      self._lock    = threading.Lock()
+      self._entries = OrderedDict()    # key -> (time, status, url, body)
+      self.hits      = 0               # Memory tier hits
+      self.disk_hits = 0               # Disk tier hits
+      self.misses    = 0
+
+   def key(self, _ep, _params):
+      """ Normalized cache key of the request
+
+          Arguments:
+            _ep     (str):  API Endpoint
+            _params (dict): Request parameters
+
+          Return:
+            (str): Cache key
+      """
+      import hashlib
+
+      norm = sorted( (str(k), str(v)) for k, v in _params.items() )
+      data = json.dumps([_ep, norm])
+      return hashlib.sha1(data.encode('utf-8')).hexdigest()
+   # End of key
+
+
+
+
+   def get(self, _ep, _params):
+      """ Cached response of the request
+
+          Arguments:
+            _ep     (str):  API Endpoint
+            _params (dict): Request parameters
+
+          Return:
+            (Response): Cached response, None if not cached or expired
+      """
+      key = self.key(_ep, _params)
+      now = time.time()
+
+      with self._lock:
+         entry = self._entries.get(key)
+         if entry is not None:
+            if now - entry[0] < self.ttl:
+               self._entries.move_to_end(key)
+               self.hits += 1
+               return self._response(entry)
+            del self._entries[key]
+
+      entry = self._disk_get(key, now)
+
+      with self._lock:
+         if entry is None:
+            self.misses += 1
+            return None
+         self.disk_hits += 1
+         self._put(key, entry)
+      return self._response(entry)
+   # End of get
+
+
+
+
+   def put(self, _ep, _params, _resp):
+      """ Store the response, only successful responses are cached
+
+          Arguments:
+            _ep     (str):      API Endpoint
+            _params (dict):     Request parameters
+            _resp   (Response): Response from the server
+      """
+      if _resp.status_code != 200:
+         return
+
+      key   = self.key(_ep, _params)
+      entry = (time.time(), _resp.status_code, _resp.url, _resp.content)
+
+      with self._lock:
+         self._put(key, entry)
+      self._disk_put(key, entry)
+   # End of put
+
+
+
+
+   def stats(self):
+      """ Cache statistics
+
+          Return:
+            (dict): Hits, disk hits, misses and size of the memory tier
+      """
+      with self._lock:
+         return {
+            'hits':      self.hits,
+            'disk_hits': self.disk_hits,
+            'misses':    self.misses,
+            'size':      len(self._entries),
+         }
+   # End of stats
+
+
+
+
+   """ -- PRIVATE -- """
+
+   def _put(self, _key, _entry):
+      """ Store entry in the memory tier, self._lock must be locked """
+      self._entries[_key] = _entry
+      self._entries.move_to_end(_key)
+      while len(self._entries) > self.maxsize:
+         self._entries.popitem(last = False)
+   # End of _put
+
+
+
+
+   def _response(self, _entry):
+      """ Create Response object from the cache entry """
+      import requests                     # HTTP requests, JSON
+
+      resp = requests.Response()
+      resp.status_code = _entry[1]
+      resp.url         = _entry[2]
+      resp._content    = _entry[3]
+      resp.encoding    = 'utf-8'
+      return resp
+   # End of _response
+
+
+
+
+   def _disk_get(self, _key, _now):
+      """ Load entry from the disk tier
+
+          Return:
+            (tuple): Cache entry, None if not found or expired
+      """
+      if not self.path:
+         return None
+
+      file_name = os.path.join(self.path, _key)
+      try:
+         with open(file_name, 'rb') as f:
+            header = json.loads(f.readline().decode('utf-8'))
+            body   = f.read()
+      except (OSError, ValueError):
+         return None
+
+      if _now - header['time'] >= self.ttl:
+         try:
+            os.remove(file_name)
+         except OSError:
+            pass
+         return None
+
+      return (header['time'], header['status'], header['url'], body)
+   # End of _disk_get
+
+
+
+
+   def _disk_put(self, _key, _entry):
+      """ Store entry in the disk tier, the file is replaced atomically.
+          Every writer (process or thread) has its own temporary file.
+      """
+      if not self.path:
+         return
+
+      header = { 'time': _entry[0], 'status': _entry[1], 'url': _entry[2] }
+      file_name = os.path.join(self.path, _key)
+      tmp_name  = None
+      try:
+         fd, tmp_name = tempfile.mkstemp( dir = self.path,
+                                          prefix = _key + '.',
+                                          suffix = '.tmp' )
+         with os.fdopen(fd, 'wb') as f:
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+            f.write(_entry[3])
+         os.replace(tmp_name, file_name)
+      except OSError:
+         if tmp_name is not None:
+            try:
+               os.remove(tmp_name)
+            except OSError:
+               pass
+   # End of _disk_put
+
+
+
+
+# End of file
+
+
+
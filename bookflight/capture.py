@@ -0,0 +1,314 @@
+
+'''
+    File name: capture.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import collections
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+c_MAGIC   = b'BFCI'
+c_VERSION = 1
+
+c_REDACTED = 'REDACTED'                   # Recorded passenger field values
+
+# Index file: header, then one entry per exchange
+c_HEADER = struct.Struct('<4sI')          # magic, version
+# key digest, endpoint digest, offset, meta length, body length, latency
+c_ENTRY  = struct.Struct('<16s16sQIIf')
+
+# One recorded request/response pair, see CaptureArchive.read()
+Exchange = collections.namedtuple('Exchange',
+   'method path params body status content_type content latency')
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class CaptureWriter(object):
+   """ Append-only archive of the HTTP request/response pairs
+
+       The archive is two files: _path with the records (request JSON and
+       zlib-compressed response body) and _path.idx with fixed-size entries
+       (request digest, offset, sizes, latency). A record is indexed after
+       it was written, so a killed process leaves at most a record which is
+       not indexed. Used by Transport.capture for every sent request.
+       The values of the passenger fields of the booking requests are
+       replaced by c_REDACTED, the response bodies are stored as received.
+   """
+
+   def __init__(self, _path, _level=6):
+      """ Arguments:
+            _path  (str): Archive file, appended if it exists
+            _level (int): zlib compression level of the bodies
+      """
+      self.path  = _path
+      self.level = _level
+      self.count = 0                 # Records written by this object
+
+      self._lock  = threading.Lock()
+      self._data  = open(_path, 'ab')
+      self._index = open(_path + '.idx', 'ab')
+      if self._index.tell() == 0:
+         self._index.write(c_HEADER.pack(c_MAGIC, c_VERSION))
+         self._index.flush()
+
+   def record(self, _method, _url, _params, _body, _resp, _latency):
+      """ Append the exchange
+
+          Arguments:
+            _method  (str):      HTTP method
+            _url     (str):      Request URL
+            _params  (dict):     Query parameters
+            _body    (bytes):    Request body
+            _resp    (Response): Response with the downloaded body
+            _latency (float):    Seconds until the body was downloaded
+      """
+      path, pairs = _request(_url, _params)
+      body = _redact(_bytes(_body))
+      meta = json.dumps({
+         'method':       _method,
+         'path':         path,
+         'params':       pairs,
+         'body':         body.decode('utf-8', 'replace'),
+         'status':       _resp.status_code,
+         'content_type': _resp.headers.get('Content-Type'),
+      }).encode('utf-8')
+      content = zlib.compress(_resp.content or b'', self.level)
+      key = request_key(_method, _url, _params, body)
+
+      with self._lock:
+         offset = self._data.tell()
+         self._data.write(meta + content)
+         self._data.flush()
+         self._index.write(c_ENTRY.pack(key, endpoint_key(_method, _url),
+                                        offset, len(meta), len(content),
+                                        _latency))
+         self._index.flush()
+         self.count += 1
+   # End of record
+
+
+
+
+   def close(self):
+      """ Close the files """
+      with self._lock:
+         self._data.close()
+         self._index.close()
+   # End of close
+
+
+
+
+class CaptureArchive(object):
+   """ Read-only archive written by CaptureWriter
+
+       The index is loaded into memory, the records are read from the
+       memory-mapped archive file. lookup() finds the response of
+       a request: the recorded responses of the same request are served
+       in their recorded order (round robin), so a check_flights polling
+       gets the unchecked and checked responses like the recorded one.
+   """
+
+   def __init__(self, _path):
+      """ Arguments:
+            _path (str): Archive file, _path.idx must exist
+      """
+      self.path = _path
+      with open(_path + '.idx', 'rb') as f:
+         index = f.read()
+      if len(index) < c_HEADER.size or \
+         c_HEADER.unpack_from(index)[0] != c_MAGIC:
+         raise ValueError('Not a capture archive index: ' + _path + '.idx')
+
+      # A torn last entry of a killed writer is ignored
+      count = (len(index) - c_HEADER.size) // c_ENTRY.size
+      self.entries = [ c_ENTRY.unpack_from(index, c_HEADER.size +
+                                           i * c_ENTRY.size)
+                       for i in range(count) ]
+      self._keys      = {}            # request digest -> entry numbers
+      self._endpoints = {}            # endpoint digest -> entry numbers
+      for i, entry in enumerate(self.entries):
+         self._keys.setdefault(entry[0], []).append(i)
+         self._endpoints.setdefault(entry[1], []).append(i)
+
+      self._lock    = threading.Lock()
+      self._cursors = {}              # digest -> next served position
+      self._file = open(_path, 'rb')
+      size = os.fstat(self._file.fileno()).st_size
+      self._map  = b''
+      if size:
+         self._map = mmap.mmap(self._file.fileno(), 0,
+                               access = mmap.ACCESS_READ)
+
+   def __len__(self):
+      return len(self.entries)
+
+   def read(self, _i, _content=True):
+      """ Read the recorded exchange
+
+          Arguments:
+            _i       (int):  Entry number 0..len-1
+            _content (bool): Decompress the response body
+
+          Return:
+            (Exchange): Request and response
+      """
+      key, endpoint, offset, meta_size, size, latency = self.entries[_i]
+      meta = json.loads(bytes(self._map[offset:offset + meta_size])
+                        .decode('utf-8'))
+      content = None
+      if _content:
+         start   = offset + meta_size
+         content = zlib.decompress(self._map[start:start + size])
+      return Exchange( meta['method'], meta['path'],
+                       [ tuple(pair) for pair in meta['params'] ],
+                       meta['body'].encode('utf-8'), meta['status'],
+                       meta['content_type'], content, latency )
+   # End of read
+
+
+
+
+   def lookup(self, _method, _url, _params=None, _body=None, _fallback=True):
+      """ Recorded response of the request
+
+          Arguments:
+            _method   (str):   HTTP method
+            _url      (str):   URL or path, the query is included
+            _params   (dict):  Other query parameters
+            _body     (bytes): Request body
+            _fallback (bool):  Use the responses of the same endpoint
+                               (method and path) if the request was not
+                               recorded
+
+          Return:
+            (Exchange): Exchange, None if not found
+      """
+      digest  = request_key(_method, _url, _params, _body)
+      entries = self._keys.get(digest)
+      if entries is None and _fallback:
+         digest  = endpoint_key(_method, _url)
+         entries = self._endpoints.get(digest)
+      if entries is None:
+         return None
+
+      with self._lock:
+         position = self._cursors.get(digest, 0)
+         self._cursors[digest] = position + 1
+      return self.read(entries[position % len(entries)])
+   # End of lookup
+
+
+
+
+   def close(self):
+      """ Unmap and close the archive file """
+      if self._map:
+         self._map.close()
+      self._file.close()
+   # End of close
+
+
+
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def request_key(_method, _url, _params=None, _body=None):
+   """ Digest of the request: method, path, sorted query parameters, body.
+       The host is not included, so the recorded requests match the ones
+       sent to a replay server. The passengers of the body are redacted,
+       a booking matches the recorded one of other passengers.
+
+       Return:
+         (bytes): 16 bytes digest
+   """
+   path, pairs = _request(_url, _params)
+   digest = hashlib.md5()
+   for part in (_method.upper(), path, urlencode(pairs)):
+      digest.update(part.encode('utf-8') + b'\0')
+   digest.update(_redact(_bytes(_body)))
+   return digest.digest()
+# End of request_key
+
+
+
+
+def endpoint_key(_method, _url):
+   """ Return: (bytes): 16 bytes digest of the method and path """
+   path = urlsplit(_url).path
+   return hashlib.md5( (_method.upper() + '\0' + path).encode('utf-8')
+                     ).digest()
+# End of endpoint_key
+
+
+
+
+def _request(_url, _params):
+   """ Path and sorted query parameters (str pairs) of the request """
+   url   = urlsplit(_url)
+   pairs = parse_qsl(url.query, keep_blank_values = True)
+   pairs.extend( (str(k), str(v)) for k, v in (_params or {}).items()
+                 if v is not None )
+   return url.path, sorted(pairs)
+# End of _request
+
+
+
+
+def _bytes(_body):
+   """ Request body as bytes """
+   if _body is None:
+      return b''
+   if isinstance(_body, str):
+      return _body.encode('utf-8')
+   return bytes(_body)
+# End of _bytes
+
+
+
+
+def _redact(_body):
+   """ JSON body with the values of the "passengers" fields replaced by
+       c_REDACTED, other bodies are returned unchanged
+   """
+   if b'"passengers"' not in _body:
+      return _body
+   try:
+      data = json.loads(_body.decode('utf-8'))
+      passengers = data['passengers']
+   except (ValueError, KeyError, TypeError):
+      return _body
+   if not isinstance(passengers, list) or \
+      not all( isinstance(p, dict) for p in passengers ):
+      return _body
+
+   data['passengers'] = [ dict.fromkeys(p, c_REDACTED) for p in passengers ]
+   return json.dumps(data, sort_keys = True).encode('utf-8')
+# End of _redact
+
+
+
+
+# End of file
+
+
+
@@ -0,0 +1,145 @@
+
+'''
+    File name: codec.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import json
+import os
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+# Fast JSON libraries in the order of preference, the stdlib is the fallback
+c_CODECS = ('orjson', 'ujson', 'stdlib')
+c_ENV    = 'BOOKFLIGHT_JSON'    # Environment variable forcing the codec
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class JsonCodec(object):
+   """ JSON encoder/decoder of the request and response bodies """
+
+   def __init__(self, _name='stdlib'):
+      """ Arguments:
+            _name (str): 'orjson', 'ujson' or 'stdlib', raises ImportError
+                         if the library is not installed
+      """
+      self.name = _name
+      if _name == 'orjson':
+         import orjson
+         self._dumps = orjson.dumps
+         self._loads = orjson.loads                # bytes or str
+      elif _name == 'ujson':
+         import ujson
+         self._dumps = lambda obj: ujson.dumps(obj).encode('utf-8')
+         self._loads = ujson.loads
+      elif _name == 'stdlib':
+         self._dumps = lambda obj: json.dumps(obj).encode('utf-8')
+         self._loads = lambda data: json.loads(_text(data))
+      else:
+         raise ValueError('Unknown JSON codec: ' + str(_name))
+
+   def dumps(self, _obj):
+      """ Return: (bytes): Object encoded to UTF-8 JSON (request body) """
+      return self._dumps(_obj)
+
+   def loads(self, _data):
+      """ Decode JSON, raises ValueError for invalid data
+
+          Arguments:
+            _data (bytes/str): JSON document (bytes must be UTF-8)
+
+          Return:
+            (object): Decoded object
+      """
+      return self._loads(_data)
+
+
+
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+_default = None
+
+
+def default_codec():
+   """ The fastest installed codec, loaded with the first use. The codec
+       can be forced by the BOOKFLIGHT_JSON environment variable.
+
+       Return:
+         (JsonCodec): Codec shared by all booking objects
+   """
+   global _default
+   if _default is None:
+      forced = os.environ.get(c_ENV)
+      names  = (forced,) if forced else c_CODECS
+      for name in names:
+         try:
+            _default = JsonCodec(name)
+            break
+         except (ImportError, ValueError):
+            continue
+      else:
+         _default = JsonCodec()
+   return _default
+# End of default_codec
+
+
+
+
+def decode_response(_resp, _codec=None):
+   """ Decode the JSON body of the response only once, the decoded object
+       is kept on the response (later calls return it)
+
+       Arguments:
+         _resp  (Response):  Response from the server or from the cache
+         _codec (JsonCodec): Decoder, None = default_codec()
+
+       Return:
+         (object): Decoded body, raises ValueError for invalid data
+   """
+   decoded = getattr(_resp, 'decoded_json', None)
+   if decoded is not None:
+      return decoded
+
+   if _codec is None:
+      _codec = default_codec()
+   content = _resp.content
+   if content is None:
+      raise ValueError('No response body')
+
+   encoding = _resp.encoding
+   if encoding and encoding.lower().replace('-', '') not in ('utf8', 'ascii'):
+      content = content.decode(encoding)
+
+   decoded = _codec.loads(content)
+   _resp.decoded_json = decoded
+   return decoded
+# End of decode_response
+
+
+
+
+def _text(_data):
+   """ Bytes decoded as UTF-8 (Python 3.5 json.loads() needs str) """
+   if isinstance(_data, (bytes, bytearray)):
+      return _data.decode('utf-8')
+   return _data
+# End of _text
+
+
+
+
+# End of file
+
+
+
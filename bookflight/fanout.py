@@ -0,0 +1,230 @@
+
+'''
+    File name: fanout.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import datetime
+import heapq
+import itertools
+import threading
+from .results import ResultSet         # Compact search results
+from .stream import iter_flights       # Streaming search response parser
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+# Ranking key of the merged results, the same as the remote 'sort' parameter
+c_KEYS = {
+   'price':    lambda record: record['price'],
+   'duration': lambda record: record['duration']['total'],
+}
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def date_range(_date_from, _date_to):
+   """ All dates of the range
+
+       Arguments:
+         _date_from (str): First date in the format YYYY-MM-DD
+         _date_to   (str): Last date in the format YYYY-MM-DD (included)
+
+       Return:
+         (list): Dates in the format YYYY-MM-DD
+   """
+   first = datetime.datetime.strptime(_date_from, "%Y-%m-%d")
+   last  = datetime.datetime.strptime(_date_to, "%Y-%m-%d")
+   days  = (last - first).days
+   return [ (first + datetime.timedelta(days = i)).strftime("%Y-%m-%d")
+            for i in range(days + 1) ]
+# End of date_range
+
+
+
+
+def fan_out_search(
+   _bf,
+   _origins,
+   _destinations,
+   _dates,
+   _key      = 'price',
+   _k        = 10,
+   _limit    = 50,
+   _currency = 'EUR',
+   _workers  = 8,
+   _bags     = 0,
+   _pnum     = 1,
+):
+   """ Search all combinations of origins, destinations and dates in
+       parallel and merge the results into the global top-k
+
+       Each response is decoded by the streaming parser and its records are
+       pushed into one bounded heap. The responses are sorted by the same
+       key, so reading of a response stops at the first record that
+       wouldn't make it into the top-k. With _bags the flights without the
+       offer of _bags bags are left out and the price is the total price
+       with the bags of all passengers.
+
+       Arguments:
+         _bf           (BookFlight): Booking object with arguments set
+         _origins      (list):       IATA codes of the departure airports
+         _destinations (list):       IATA codes of the arrival airports
+         _dates        (list):       Departure dates YYYY-MM-DD
+         _key          (str):        'price' or 'duration'
+         _k            (int):        Number of the best flights
+         _limit        (int):        Limit of results of one search
+         _currency     (str):        Currency
+         _workers      (int):        Number of parallel searches
+         _bags         (int):        Bags per passenger
+         _pnum         (int):        Number of passengers
+
+       Return:
+         (ResultSet): Top-k flights ordered by the key
+   """
+   from concurrent.futures import ThreadPoolExecutor
+
+   key  = c_KEYS[_key]
+   sort = 'price' if _key == 'price' else 'duration'
+   if _bags > 0:
+      # The responses are sorted without the bags, a lower bound of the total
+      top = _TopK(_k, _bags_key(_key, _bags, _pnum), key)
+   else:
+      top = _TopK(_k, key)
+
+   def search(_combination):
+      """ Worker: one search request streamed into the top-k heap """
+      origin, destination, date = _combination
+      param = _bf._search_params(_limit, _currency, origin, destination, date)
+      param['sort'] = sort
+
+      try:
+         resp = _bf.transport.get( _bf.c_EP_FLIGHTS, _params = param,
+                                   _headers = _bf.c_HEADERS, _stream = True,
+                                   _phase = 'search',
+                                   _deadline = _bf.deadline )
+      except Exception as e:
+         _bf.iprint('WARNING: search', origin, destination, date,
+                    'failed: EXCEPTION:', str(e))
+         return 0
+
+      count = 0
+      flights = iter_flights(resp)
+      try:
+         for record in flights:
+            count += 1
+            if not top.push(record):
+               break                 # The rest is worse (sorted response)
+      except Exception as e:
+         _bf.iprint('WARNING: search', origin, destination, date,
+                    'failed: EXCEPTION:', str(e))
+      finally:
+         flights.close()
+      return count
+
+   combinations = list(itertools.product(_origins, _destinations, _dates))
+   with ThreadPoolExecutor( max_workers = _workers ) as executor:
+      decoded = sum(executor.map(search, combinations))
+
+   _bf.iprint('Fan-out:', len(combinations), 'searches,', decoded,
+              'flights decoded')
+   return ResultSet.from_records(top.records(), _bf.c_BAGS_MAX)
+# End of fan_out_search
+
+
+
+
+def _bags_key(_key, _bags, _pnum):
+   """ Ranking key of the records with the bags, KeyError or TypeError if
+       the record doesn't offer _bags bags
+
+       Arguments:
+         _key  (str): 'price' or 'duration'
+         _bags (int): Bags per passenger
+         _pnum (int): Number of passengers
+
+       Return:
+         (function): Ranking key of a record
+   """
+   key  = c_KEYS[_key]
+   bags = str(_bags)
+
+   def bags_key(_record):
+      total = _record['price'] + _pnum * _record['bags_price'][bags]
+      return total if _key == 'price' else key(_record)
+   return bags_key
+# End of _bags_key
+
+
+
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class _TopK(object):
+   """ Thread-safe bounded heap of the k best records """
+
+   def __init__(self, _k, _key, _bound=None):
+      """ Arguments:
+            _k     (int):      Number of the best records
+            _key   (function): Ranking key of a record
+            _bound (function): Lower bound of the keys of the records after
+                               the record in a sorted response, None = _key
+      """
+      self.k     = _k
+      self.key   = _key
+      self.bound = _bound or _key
+      self.heap = []                # (-key, -seq, record) => max-heap
+      self.seq  = itertools.count()
+      self.lock = threading.Lock()
+
+   def push(self, _record):
+      """ Add the record if it is one of the k best
+
+          Return:
+            (bool): False if no record after this one in the sorted
+                    response can be better than the k-th one
+      """
+      try:
+         value = self.key(_record)
+      except (KeyError, TypeError):
+         value = None               # Not ranked, e.g. without the bags
+      try:
+         bound = self.bound(_record)
+      except (KeyError, TypeError):
+         bound = None
+
+      with self.lock:
+         if value is not None:
+            item = (-value, -next(self.seq), _record)
+            if len(self.heap) < self.k:
+               heapq.heappush(self.heap, item)
+            elif value < -self.heap[0][0]:
+               heapq.heapreplace(self.heap, item)
+         return ( bound is None or len(self.heap) < self.k or
+                  bound < -self.heap[0][0] )
+   # End of push
+
+
+
+
+   def records(self):
+      """ Return: (list): Records from the best one """
+      with self.lock:
+         return [ item[2] for item in sorted(self.heap, reverse = True) ]
+   # End of records
+
+
+
+
+# End of file
+
+
+
@@ -0,0 +1,136 @@
+
+'''
+    File name: hedge.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import collections
+import threading
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class HedgePolicy(object):
+   """ When to send a duplicate (hedged) request
+
+       A GET request of the hedged phases which has no response after the
+       _percentile latency of the recent requests of its phase is sent
+       once more, the first response is used (see Transport). Until
+       _min_samples latencies are known, _initial seconds are waited
+       (None = no hedging). The hedged requests are at most _budget of
+       all requests of the phase, so a slow upstream doesn't get double
+       load.
+   """
+
+   def __init__(self, _percentile=95, _phases=('search',), _min_samples=20,
+                _window=200, _initial=None, _budget=0.1):
+      """ Arguments:
+            _percentile  (float): Latency percentile of the hedging delay
+            _phases      (tuple): Hedged booking phases
+            _min_samples (int):   Latencies needed for the percentile
+            _window      (int):   Recent latencies kept per phase
+            _initial     (float): Delay before _min_samples are known,
+                                  None = no hedging until then
+            _budget      (float): Max. hedged part of the requests
+      """
+      self.percentile  = _percentile
+      self.phases      = tuple(_phases)
+      self.min_samples = _min_samples
+      self.window      = _window
+      self.initial     = _initial
+      self.budget      = _budget
+
+      self._lock      = threading.Lock()
+      self._latencies = {}           # phase -> deque of recent seconds
+      self._requests  = {}           # phase -> hedgeable requests
+      self._hedged    = {}           # phase -> sent duplicates
+
+   def applies(self, _phase, _method):
+      """ Return: (bool): The request can be hedged """
+      return _method == 'GET' and _phase in self.phases
+   # End of applies
+
+
+
+
+   def observe(self, _phase, _seconds):
+      """ Add the response latency of the phase """
+      if _phase not in self.phases:
+         return
+      with self._lock:
+         latencies = self._latencies.get(_phase)
+         if latencies is None:
+            latencies = self._latencies[_phase] = \
+               collections.deque(maxlen = self.window)
+         latencies.append(_seconds)
+   # End of observe
+
+
+
+
+   def delay(self, _phase):
+      """ Hedging delay of a new request of the phase
+
+          Return:
+            (float): Seconds, None = don't hedge
+      """
+      with self._lock:
+         self._requests[_phase] = self._requests.get(_phase, 0) + 1
+         return self._delay(_phase)
+   # End of delay
+
+
+
+
+   def allow(self, _phase):
+      """ Take a duplicate request from the budget
+
+          Return:
+            (bool): False = the budget is used up, don't hedge
+      """
+      with self._lock:
+         hedged = self._hedged.get(_phase, 0)
+         if hedged + 1 > self.budget * self._requests.get(_phase, 0):
+            return False
+         self._hedged[_phase] = hedged + 1
+         return True
+   # End of allow
+
+
+
+
+   def stats(self):
+      """ Return: (dict): phase -> requests, hedged and the current delay """
+      with self._lock:
+         return dict( (phase, { 'requests': requests,
+                                'hedged': self._hedged.get(phase, 0),
+                                'delay': self._delay(phase) })
+                      for phase, requests in self._requests.items() )
+   # End of stats
+
+
+
+
+   """ -- PRIVATE -- """
+
+   def _delay(self, _phase):
+      """ Percentile latency of the phase, self._lock must be locked """
+      latencies = self._latencies.get(_phase, ())
+      if len(latencies) < self.min_samples:
+         return self.initial
+      ordered = sorted(latencies)
+      return ordered[int(round((len(ordered) - 1) * self.percentile / 100.0))]
+   # End of _delay
+
+
+
+
+# End of file
+
+
+
@@ -0,0 +1,305 @@
+
+'''
+    File name: journal.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import hashlib
+import json
+import os
+import threading
+import time
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+# Pipeline steps in the journal
+c_SEARCHED = 'searched'     # booking_token found
+c_CHECKED  = 'checked'      # flights_checked
+c_INVALID  = 'invalid'      # flights_invalid, the token can't be booked
+c_BOOKING  = 'booking'      # Booking request is being sent
+c_BOOKED   = 'booked'       # PNR received
+c_FAILED   = 'failed'       # Booking response with an error
+
+c_FINAL    = (c_INVALID, c_BOOKED, c_FAILED)
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class Journal(object):
+   """ Crash-safe append-only journal of the booking pipelines
+
+       Every step of a pipeline is appended as one JSON line. The lines are
+       flushed to the OS immediately, so they survive a killed process.
+       fsync() (surviving a power loss) is done by a background thread in
+       batches every _sync_interval seconds, only appends with _sync=True
+       wait for it. On open, the journal is replayed into the last state
+       of every pipeline, a torn last line is ignored.
+   """
+
+   def __init__(self, _path, _sync_interval=0.1):
+      """ Arguments:
+            _path          (str):   Journal file, created if missing
+            _sync_interval (float): Max. seconds between fsync() batches
+      """
+      self.path          = _path
+      self.sync_interval = _sync_interval
+      self.states        = self._load(_path)     # id -> state (dict)
+
+      self._file    = open(_path, 'ab')
+      if self._torn(_path):
+         # The next record must not continue the torn line of a crash
+         self._file.write(b'\n')
+         self._file.flush()
+      self._cond    = threading.Condition()
+      self._written = 0               # Appended records
+      self._synced  = 0               # Records covered by fsync()
+      self._waiting = 0               # Appends waiting for fsync()
+      self._thread  = None
+      self._closed  = False
+      self.syncs    = 0               # fsync() calls
+
+   def state(self, _id):
+      """ Last state of the pipeline
+
+          Arguments:
+            _id (str): Pipeline id
+
+          Return:
+            (dict): Merged fields of the pipeline records ('step' is the
+                    last step), None if the pipeline is not in the journal
+      """
+      with self._cond:
+         state = self.states.get(str(_id))
+         return dict(state) if state is not None else None
+   # End of state
+
+
+
+
+   def append(self, _id, _step, _sync=False, **_fields):
+      """ Append the pipeline step
+
+          Arguments:
+            _id     (str):  Pipeline id
+            _step   (str):  Pipeline step (c_SEARCHED, c_CHECKED, ...)
+            _sync   (bool): Wait until the record is on the disk (fsync)
+            _fields:        Other fields of the record (token, pnr, ...)
+      """
+      record = dict(_fields, id = str(_id), step = _step, time = time.time())
+      line   = json.dumps(record).encode('utf-8') + b'\n'
+
+      with self._cond:
+         if self._closed:
+            raise ValueError('Journal is closed')
+         self._file.write(line)
+         self._file.flush()
+         self._written += 1
+         self._merge(self.states, record)
+         self._start()
+         if _sync:
+            self._wait(self._written)
+         else:
+            self._cond.notify_all()
+   # End of append
+
+
+
+
+   def sync(self):
+      """ Wait until all appended records are on the disk """
+      with self._cond:
+         self._wait(self._written)
+   # End of sync
+
+
+
+
+   def pending(self):
+      """ Return: (list): Ids of the unfinished pipelines """
+      with self._cond:
+         return [ key for key, state in self.states.items()
+                  if state['step'] not in c_FINAL ]
+   # End of pending
+
+
+
+
+   def close(self):
+      """ Sync the records and close the file """
+      with self._cond:
+         if self._closed:
+            return
+         self._closed = True
+         self._cond.notify_all()
+      if self._thread:
+         self._thread.join()
+      self._fsync()
+      self._file.close()
+   # End of close
+
+
+
+
+   """ -- PRIVATE -- """
+
+   def _load(self, _path):
+      """ Replay the journal file
+
+          Return:
+            (dict): id -> state
+      """
+      states = {}
+      try:
+         f = open(_path, 'rb')
+      except FileNotFoundError:
+         return states
+      with f:
+         for line in f:
+            try:
+               record = json.loads(line.decode('utf-8'))
+            except ValueError:
+               continue             # Torn line of a crashed write
+            self._merge(states, record)
+      return states
+   # End of _load
+
+
+
+
+   def _torn(self, _path):
+      """ Return: (bool): The file doesn't end with a complete line """
+      with open(_path, 'rb') as f:
+         f.seek(0, os.SEEK_END)
+         if f.tell() == 0:
+            return False
+         f.seek(-1, os.SEEK_END)
+         return f.read(1) != b'\n'
+   # End of _torn
+
+
+
+
+   def _merge(self, _states, _record):
+      """ Apply the record to the pipeline state """
+      if _record['step'] == c_SEARCHED:
+         _states[_record['id']] = dict(_record)     # New search = new state
+      else:
+         _states.setdefault(_record['id'], {}).update(_record)
+   # End of _merge
+
+
+
+
+   def _start(self):
+      """ Start the sync thread, self._cond must be locked """
+      if self._thread is None:
+         self._thread = threading.Thread( target = self._loop,
+                                          name = 'JournalSync' )
+         self._thread.daemon = True
+         self._thread.start()
+   # End of _start
+
+
+
+
+   def _wait(self, _seq):
+      """ Wait for fsync() of the record _seq, self._cond must be locked """
+      self._waiting += 1
+      self._cond.notify_all()
+      try:
+         while self._synced < _seq and not self._closed:
+            self._cond.wait()
+      finally:
+         self._waiting -= 1
+   # End of _wait
+
+
+
+
+   def _loop(self):
+      """ Sync thread: fsync() the appended records in batches """
+      while True:
+         with self._cond:
+            while self._synced == self._written and not self._closed:
+               self._cond.wait()
+            if self._closed:
+               return
+            # Collect more records, a waiting append stops it earlier
+            end = time.monotonic() + self.sync_interval
+            while not self._waiting and not self._closed:
+               left = end - time.monotonic()
+               if left <= 0:
+                  break
+               self._cond.wait(left)
+            target = self._written
+
+         self._fsync()
+
+         with self._cond:
+            self._synced = max(self._synced, target)
+            self.syncs += 1
+            self._cond.notify_all()
+   # End of _loop
+
+
+
+
+   def _fsync(self):
+      """ Flush the file to the disk """
+      try:
+         os.fsync(self._file.fileno())
+      except (OSError, ValueError):
+         pass
+   # End of _fsync
+
+
+
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def pipeline_id(_args, _currency, _passengers=None):
+   """ Journal id of the booking given by the program arguments and the
+       passengers, so the bookings of the same route for other passengers
+       are different pipelines
+
+       Arguments:
+         _args       (Namespace): Booking arguments (BookFlight.args)
+         _currency   (str):       Currency
+         _passengers (list):      Passenger objects, None = not included
+
+       Return:
+         (str): Pipeline id
+   """
+   parts = [
+      _args.date[0], _args.from_iata[0], _args.to_iata[0],
+      _args.date_to[0] if _args.date_to else '',
+      str(_args.return_n[0]) if _args.return_n else 'oneway',
+      str(_args.bags[0]) if _args.bags else '0',
+      _args.rank[0] if _args.rank else
+      ('fastest' if _args.fastest else 'cheapest'),
+      _currency,
+   ]
+   if _passengers:
+      # Digest: no personal data in the journal
+      data = json.dumps([ p.to_dict() for p in _passengers ],
+                        sort_keys = True)
+      parts.append(hashlib.sha1(data.encode('utf-8')).hexdigest()[:16])
+   return '|'.join(parts)
+# End of pipeline_id
+
+
+
+
+# End of file
+
+
+
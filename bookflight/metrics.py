@@ -0,0 +1,327 @@
+
+'''
+    File name: metrics.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import bisect
+import json
+import sys
+import threading
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+# Histogram buckets (upper bounds)
+c_SECONDS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+             0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+             300.0)
+c_COUNTS  = (1, 2, 3, 4, 5, 7, 10, 15, 20, 30, 50)
+
+# Known metrics: name -> (type, help, histogram buckets)
+c_METRICS = {
+   'bookflight_requests_total': (
+      'counter', 'HTTP requests by phase and status', None),
+   'bookflight_request_seconds': (
+      'histogram', 'HTTP request time until the response headers', c_SECONDS),
+   'bookflight_response_bytes_total': (
+      'counter', 'Received bytes of the response bodies', None),
+   'bookflight_coalesced_total': (
+      'counter', 'Requests answered by an identical request in flight',
+      None),
+   'bookflight_json_decode_seconds': (
+      'histogram', 'JSON decoding time of the responses', c_SECONDS),
+   'bookflight_rate_limit_wait_seconds': (
+      'histogram', 'Delay of the requests by the rate limiter', c_SECONDS),
+   'bookflight_throttled_total': (
+      'counter', 'Throttling responses (429, 5xx) slowing down the phase',
+      None),
+   'bookflight_phase_seconds': (
+      'histogram', 'Duration of the search, check and book phases',
+      c_SECONDS),
+   'bookflight_check_polls': (
+      'histogram', 'check_flights requests per checked booking token',
+      c_COUNTS),
+   'bookflight_speculative_checks_total': (
+      'counter', 'Flights checked at once by result (won, checked, invalid, '
+      'failed, cancelled)', None),
+   'bookflight_speculation_rank': (
+      'histogram', 'Search rank of the flight chosen by the speculative '
+      'check', c_COUNTS),
+   'bookflight_hedged_total': (
+      'counter', 'Requests sent twice (hedged) by the winning copy (primary, '
+      'hedge, none)', None),
+   'bookflight_circuit_opened_total': (
+      'counter', 'Circuit breaker openings by endpoint', None),
+   'bookflight_circuit_rejected_total': (
+      'counter', 'Requests failed fast by the open circuit by endpoint',
+      None),
+   'bookflight_deadline_exceeded_total': (
+      'counter', 'Bookings aborted by the exhausted --deadline budget by '
+      'phase', None),
+}
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class Histogram(object):
+   """ Counts of the observed values in fixed buckets """
+
+   def __init__(self, _buckets=c_SECONDS):
+      """ Arguments:
+            _buckets (tuple): Sorted upper bounds of the buckets
+      """
+      self.buckets = _buckets
+      self.counts  = [0] * (len(_buckets) + 1)    # The last one is +Inf
+      self.sum     = 0.0
+      self.count   = 0
+
+   def observe(self, _value):
+      """ Add the value """
+      self.counts[bisect.bisect_left(self.buckets, _value)] += 1
+      self.sum   += _value
+      self.count += 1
+
+   def quantile(self, _q):
+      """ Estimate of the quantile (upper bound of its bucket)
+
+          Arguments:
+            _q (float): Quantile 0..1
+
+          Return:
+            (float): Upper bound, None if empty or above the last bucket
+      """
+      rank  = _q * self.count
+      total = 0
+      for bound, count in zip(self.buckets, self.counts):
+         total += count
+         if total >= rank and total > 0:
+            return bound
+      return None
+
+
+
+
+class Metrics(object):
+   """ Thread-safe registry of counters and histograms
+
+       Every metric is a set of series identified by the labels (phase,
+       status, ...). The registry is exported as Prometheus text or JSON.
+   """
+
+   def __init__(self):
+      self._lock   = threading.Lock()
+      self._series = {}             # name -> {labels tuple: value/Histogram}
+      self._types  = {}             # name -> 'counter'/'histogram'
+
+   def inc(self, _name, _labels=None, _value=1):
+      """ Increase the counter
+
+          Arguments:
+            _name   (str):  Metric name
+            _labels (dict): Labels of the series
+            _value  (int):  Increment
+      """
+      key = self._key(_labels)
+      with self._lock:
+         series = self._get(_name, 'counter')
+         series[key] = series.get(key, 0) + _value
+   # End of inc
+
+
+
+
+   def observe(self, _name, _value, _labels=None):
+      """ Add the value to the histogram
+
+          Arguments:
+            _name   (str):   Metric name
+            _value  (float): Observed value (seconds, counts, ...)
+            _labels (dict):  Labels of the series
+      """
+      key = self._key(_labels)
+      with self._lock:
+         series = self._get(_name, 'histogram')
+         hist = series.get(key)
+         if hist is None:
+            hist = series[key] = Histogram(self._buckets(_name))
+         hist.observe(_value)
+   # End of observe
+
+
+
+
+   def value(self, _name, _labels=None):
+      """ Current value of the counter or count of the histogram
+
+          Return:
+            (int): Value, 0 if the series doesn't exist
+      """
+      with self._lock:
+         value = self._series.get(_name, {}).get(self._key(_labels), 0)
+         if isinstance(value, Histogram):
+            return value.count
+         return value
+   # End of value
+
+
+
+
+   def snapshot(self):
+      """ All series as JSON compatible structure
+
+          Return:
+            (dict): {name: {'type': .., 'help': .., 'series': [..]}}
+      """
+      result = {}
+      with self._lock:
+         for name in sorted(self._series):
+            series = []
+            for key in sorted(self._series[name]):
+               value = self._series[name][key]
+               item  = { 'labels': dict(key) }
+               if isinstance(value, Histogram):
+                  item['count'] = value.count
+                  item['sum']   = value.sum
+                  item['p50']   = value.quantile(0.5)
+                  item['p95']   = value.quantile(0.95)
+                  bounds = [ str(b) for b in value.buckets ] + [ '+Inf' ]
+                  item['buckets'] = dict(zip(bounds, value.counts))
+               else:
+                  item['value'] = value
+               series.append(item)
+            result[name] = { 'type': self._types[name],
+                             'help': self._help(name),
+                             'series': series }
+      return result
+   # End of snapshot
+
+
+
+
+   def to_json(self):
+      """ Return: (str): Metrics in JSON """
+      return json.dumps(self.snapshot(), indent = 2, sort_keys = True)
+   # End of to_json
+
+
+
+
+   def to_prometheus(self):
+      """ Return: (str): Metrics in the Prometheus text exposition format """
+      lines = []
+      with self._lock:
+         for name in sorted(self._series):
+            lines.append('# HELP %s %s' % (name, self._help(name)))
+            lines.append('# TYPE %s %s' % (name, self._types[name]))
+            for key in sorted(self._series[name]):
+               value = self._series[name][key]
+               if not isinstance(value, Histogram):
+                  lines.append('%s%s %s' % (name, _labels(key), value))
+                  continue
+               total = 0
+               for bound, count in zip(value.buckets, value.counts):
+                  total += count
+                  lines.append('%s_bucket%s %d' % (
+                     name, _labels(key + (('le', str(bound)),)), total))
+               lines.append('%s_bucket%s %d' % (
+                  name, _labels(key + (('le', '+Inf'),)), value.count))
+               lines.append('%s_sum%s %r' % (name, _labels(key), value.sum))
+               lines.append('%s_count%s %d' % (name, _labels(key),
+                                               value.count))
+      return '\n'.join(lines) + '\n'
+   # End of to_prometheus
+
+
+
+
+   def write(self, _path):
+      """ Write the metrics to the file
+
+          Arguments:
+            _path (str): File name, '.json' suffix = JSON, otherwise
+                         Prometheus text. '-' = Prometheus text on stderr.
+      """
+      if _path == '-':
+         sys.stderr.write(self.to_prometheus())
+         return
+
+      text = self.to_json() if _path.endswith('.json') else \
+             self.to_prometheus()
+      with open(_path, 'w') as f:
+         f.write(text)
+   # End of write
+
+
+
+
+   """ -- PRIVATE -- """
+
+   def _key(self, _labels):
+      """ Hashable key of the labels """
+      if not _labels:
+         return ()
+      return tuple(sorted( (k, str(v)) for k, v in _labels.items() ))
+   # End of _key
+
+
+
+
+   def _get(self, _name, _type):
+      """ Series of the metric, self._lock must be locked """
+      series = self._series.get(_name)
+      if series is None:
+         series = self._series[_name] = {}
+         self._types[_name] = _type
+      return series
+   # End of _get
+
+
+
+
+   def _buckets(self, _name):
+      """ Histogram buckets of the metric """
+      known = c_METRICS.get(_name)
+      if known and known[2]:
+         return known[2]
+      return c_SECONDS
+   # End of _buckets
+
+
+
+
+   def _help(self, _name):
+      """ Description of the metric """
+      known = c_METRICS.get(_name)
+      return known[1] if known else _name
+   # End of _help
+
+
+
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def _labels(_key):
+   """ Prometheus label set of the series key """
+   if not _key:
+      return ''
+   return '{' + ','.join( '%s="%s"' % (k, v.replace('\\', '\\\\')
+                                             .replace('"', '\\"'))
+                          for k, v in _key ) + '}'
+# End of _labels
+
+
+
+
+# End of file
+
+
+
@@ -0,0 +1,149 @@
+
+'''
+    File name: ranking.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+c_RANK_METHODS = ('cheapest', 'fastest', 'weighted', 'pareto')
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def rank(_rs, _method='cheapest', _weight=0.5, _bags=0, _pnum=1):
+   """ Rank the search results locally
+
+       Arguments:
+         _rs     (ResultSet): Search results
+         _method (str):       'cheapest', 'fastest', 'weighted' or 'pareto'
+         _weight (float):     Weight of the price for 'weighted' (0..1),
+                              the duration has weight 1 - _weight
+         _bags   (int):       Bags per passenger, the price is the total
+                              price with the bags (ResultSet.total_price)
+         _pnum   (int):       Number of passengers
+
+       Return:
+         (list): Row indices from the best one. 'pareto' returns only the
+                 Pareto-optimal rows ordered by price. Flights not offering
+                 _bags bags are left out.
+   """
+   price    = _rs.total_price(_bags, _pnum)
+   duration = _rs.duration
+   rows     = None
+   if _bags > 0:
+      rows = [ i for i, p in enumerate(price) if p == p ]   # NaN = no bags
+      if len(rows) < len(price):
+         price    = [ price[i] for i in rows ]
+         duration = [ duration[i] for i in rows ]
+      else:
+         rows = None
+
+   if _method == 'cheapest':
+      order = rank_cheapest(price, duration)
+   elif _method == 'fastest':
+      order = rank_fastest(price, duration)
+   elif _method == 'weighted':
+      order = rank_weighted(price, duration, _weight)
+   elif _method == 'pareto':
+      order = pareto_front(price, duration)
+   else:
+      raise ValueError('Unknown rank method: ' + str(_method))
+   return order if rows is None else [ rows[i] for i in order ]
+# End of rank
+
+
+
+
+def rank_cheapest(_price, _duration):
+   """ Row indices ordered by price, ties by duration
+
+       Arguments:
+         _price    (array): Price column
+         _duration (array): Duration column
+
+       Return:
+         (list): Row indices
+   """
+   return sorted(range(len(_price)), key = lambda i: (_price[i], _duration[i]))
+# End of rank_cheapest
+
+
+
+
+def rank_fastest(_price, _duration):
+   """ Row indices ordered by duration, ties by price
+
+       Arguments:
+         _price    (array): Price column
+         _duration (array): Duration column
+
+       Return:
+         (list): Row indices
+   """
+   return sorted(range(len(_price)), key = lambda i: (_duration[i], _price[i]))
+# End of rank_fastest
+
+
+
+
+def rank_weighted(_price, _duration, _weight=0.5):
+   """ Row indices ordered by weighted score of price and duration. Both
+       columns are normalized to 0..1 (min-max) before weighting.
+
+       Arguments:
+         _price    (array): Price column
+         _duration (array): Duration column
+         _weight   (float): Weight of the price (0..1)
+
+       Return:
+         (list): Row indices
+   """
+   if not len(_price):
+      return []
+
+   p_min, p_max = min(_price), max(_price)
+   d_min, d_max = min(_duration), max(_duration)
+   p_scale = _weight / (p_max - p_min) if p_max > p_min else 0.0
+   d_scale = (1.0 - _weight) / (d_max - d_min) if d_max > d_min else 0.0
+
+   score = [ (p - p_min) * p_scale + (d - d_min) * d_scale
+             for p, d in zip(_price, _duration) ]
+   return sorted(range(len(score)), key = score.__getitem__)
+# End of rank_weighted
+
+
+
+
+def pareto_front(_price, _duration):
+   """ Row indices of the Pareto-optimal flights: no other flight is both
+       cheaper (or same price) and faster. O(n log n) sweep over the rows
+       ordered by price.
+
+       Arguments:
+         _price    (array): Price column
+         _duration (array): Duration column
+
+       Return:
+         (list): Row indices ordered by price (= descending duration)
+   """
+   front = []
+   best  = None                  # Shortest duration seen so far
+   for i in rank_cheapest(_price, _duration):
+      if best is None or _duration[i] < best:
+         front.append(i)
+         best = _duration[i]
+   return front
+# End of pareto_front
+
+
+
+
+# End of file
+
+
+
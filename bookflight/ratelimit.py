@@ -0,0 +1,240 @@
+
+'''
+    File name: ratelimit.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import threading
+from time import monotonic, sleep
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+c_PHASES = ('search', 'check', 'book')
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class TokenBucket(object):
+   """ Adaptive token bucket of one endpoint
+
+       Allows _rate requests per second with bursts of _burst requests.
+       Throttling responses (429, 5xx) cut the rate by _decrease (at most
+       once per second) and pause the bucket for Retry-After seconds.
+       While the responses are successful, the rate grows back by _rate / 10
+       per second up to _rate (additive increase, multiplicative decrease).
+   """
+
+   def __init__(self, _rate, _burst=None, _decrease=0.5, _min_rate=None):
+      """ Arguments:
+            _rate     (float): Max. requests per second
+            _burst    (float): Bucket size, None = _rate (one second)
+            _decrease (float): Rate multiplier after a throttling response
+            _min_rate (float): Lowest rate, None = _rate / 20
+      """
+      self.max_rate = float(_rate)
+      self.rate     = float(_rate)
+      self.burst    = float(_burst) if _burst else max(self.max_rate, 1.0)
+      self.decrease = _decrease
+      self.min_rate = _min_rate if _min_rate else self.max_rate / 20
+      self.increase = self.max_rate / 10     # Per second
+
+      self._lock     = threading.Lock()
+      self._tokens   = self.burst
+      self._updated  = monotonic()
+      self._paused   = 0.0           # monotonic() time of the end of pause
+      self._cooldown = 0.0           # No rate decrease before this time
+      self._grown    = self._updated   # Last rate increase
+      self.throttled = 0             # Throttling responses
+
+   def acquire(self, _timeout=None):
+      """ Take one token, wait until it is available
+
+          Arguments:
+            _timeout (float): Max. seconds to wait, None = no limit
+
+          Return:
+            (float): Waiting time in seconds, None if the wait would be
+                     longer than _timeout (no token is taken)
+      """
+      with self._lock:
+         now = monotonic()
+         self._refill(now)
+         # Reserve the token, the deficit is paid by waiting (FIFO order)
+         self._tokens -= 1
+         wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+         wait = max(wait, self._paused - now)
+         if _timeout is not None and wait > _timeout:
+            self._tokens += 1
+            return None
+      if wait > 0:
+         sleep(wait)
+      return wait
+   # End of acquire
+
+
+
+
+   def feedback(self, _status, _retry_after=None):
+      """ Adapt the rate to the response
+
+          Arguments:
+            _status      (int): HTTP status code
+            _retry_after (str): Retry-After header (seconds)
+
+          Return:
+            (bool): True if the response was throttling
+      """
+      throttling = _status == 429 or _status >= 500
+      with self._lock:
+         now = monotonic()
+         self._refill(now)
+         if not throttling:
+            self.rate = min(self.max_rate, self.rate +
+                            self.increase * (now - self._grown))
+            self._grown = now
+            return False
+
+         self.throttled += 1
+         if now >= self._cooldown:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._cooldown = now + 1.0
+         self._grown = now
+         self._tokens = min(self._tokens, 0.0)
+         pause = _seconds(_retry_after)
+         if pause is None:
+            pause = 1.0 / self.rate
+         self._paused = max(self._paused, now + pause)
+      return True
+   # End of feedback
+
+
+
+
+   def stats(self):
+      """ Return: (dict): Current rate and throttling responses """
+      with self._lock:
+         return { 'rate': self.rate, 'max_rate': self.max_rate,
+                  'throttled': self.throttled }
+   # End of stats
+
+
+
+
+   """ -- PRIVATE -- """
+
+   def _refill(self, _now):
+      """ Add tokens for the elapsed time, self._lock must be locked """
+      elapsed = _now - self._updated
+      self._updated = _now
+      self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+   # End of _refill
+
+
+
+
+class RateLimiter(object):
+   """ Token buckets of the booking phases (search, check, book) """
+
+   def __init__(self, _rates=None):
+      """ Arguments:
+            _rates (dict): phase -> requests per second, or TokenBucket.
+                           Phases not in the dict are not limited.
+      """
+      self.buckets = {}
+      for phase, rate in (_rates or {}).items():
+         if not isinstance(rate, TokenBucket):
+            rate = TokenBucket(rate)
+         self.buckets[phase] = rate
+
+   def acquire(self, _phase, _timeout=None):
+      """ Wait for the token of the phase
+
+          Arguments:
+            _phase   (str):   Booking phase
+            _timeout (float): Max. seconds to wait, None = no limit
+
+          Return:
+            (float): Waiting time in seconds, None if the wait would be
+                     longer than _timeout
+      """
+      bucket = self.buckets.get(_phase)
+      return bucket.acquire(_timeout) if bucket is not None else 0.0
+   # End of acquire
+
+
+
+
+   def feedback(self, _phase, _status, _retry_after=None):
+      """ Adapt the rate of the phase to the response
+
+          Return:
+            (bool): True if the response was throttling
+      """
+      bucket = self.buckets.get(_phase)
+      if bucket is None or _status is None:
+         return False
+      return bucket.feedback(_status, _retry_after)
+   # End of feedback
+
+
+
+
+   def stats(self):
+      """ Return: (dict): phase -> bucket stats """
+      return dict( (phase, bucket.stats())
+                   for phase, bucket in self.buckets.items() )
+   # End of stats
+
+
+
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def parse_rates(_specs):
+   """ Parse the rate options
+
+       Arguments:
+         _specs (list): 'PHASE=RATE' strings, e.g. ['search=5', 'check=20']
+
+       Return:
+         (dict): phase -> requests per second, raises ValueError
+   """
+   rates = {}
+   for spec in _specs or []:
+      phase, sep, rate = spec.partition('=')
+      if phase not in c_PHASES or not sep:
+         raise ValueError('Invalid rate "' + spec + '", use PHASE=RATE with '
+                          'PHASE ' + '/'.join(c_PHASES))
+      rates[phase] = float(rate)
+      if rates[phase] <= 0:
+         raise ValueError('Rate must be positive: ' + spec)
+   return rates
+# End of parse_rates
+
+
+
+
+def _seconds(_retry_after):
+   """ Retry-After header in seconds, None if missing or HTTP date """
+   try:
+      return max(float(_retry_after), 0.0)
+   except (TypeError, ValueError):
+      return None
+# End of _seconds
+
+
+
+
+# End of file
+
+
+
@@ -0,0 +1,122 @@
+
+'''
+    File name: request.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import collections
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+c_FIELDS = ( 'date', 'from_iata', 'to_iata', 'currency', 'passengers', 'bags',
+             'return_n', 'fastest', 'rank', 'rank_limit', 'price_weight',
+             'date_to', 'workers', 'speculate', 'nearby', 'deadline',
+             'verbose', 'debug' )
+
+# Results of the booking phases, error is None or the error message
+SearchResult = collections.namedtuple('SearchResult',
+   'token price currency duration candidates error')
+CheckResult  = collections.namedtuple('CheckResult',
+   'token checked invalid price currency latency error')
+BookResult   = collections.namedtuple('BookResult',
+   'token pnr price currency error')
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class BookingRequest(collections.namedtuple('BookingRequest', c_FIELDS)):
+   """ Immutable booking request
+
+       All options of one booking, independent of the command line. Passed
+       to BookFlight.search(), check(), book() and run(), so one BookFlight
+       object serves many requests at once. Use _replace() for a modified
+       copy.
+   """
+
+   __slots__ = ()
+
+   def __new__(
+      cls,
+      _date,
+      _from_iata,
+      _to_iata,
+      _currency  = 'EUR',
+      _passengers = (),
+      _bags      = 0,
+      _return_n  = None,
+      _fastest   = False,
+      _rank      = None,
+      _rank_limit   = None,
+      _price_weight = None,
+      _date_to   = None,
+      _workers   = None,
+      _speculate = None,
+      _nearby    = None,
+      _deadline  = None,
+      _verbose   = False,
+      _debug     = False,
+   ):
+      """ Arguments: See BookFlight.set_args(), and
+            _currency   (str):   Currency
+            _passengers (tuple): Passenger objects of the booking
+            _deadline   (float): Time budget in seconds of each search(),
+                                 check(), book() or run() call
+      """
+      return super(BookingRequest, cls).__new__(
+         cls, _date, _from_iata, _to_iata, _currency, tuple(_passengers),
+         _bags, _return_n, _fastest, _rank, _rank_limit, _price_weight,
+         _date_to, _workers, _speculate, _nearby, _deadline, _verbose,
+         _debug)
+
+   @classmethod
+   def from_args(cls, _args, _currency='EUR', _passengers=()):
+      """ Booking request of the parsed program arguments
+
+          Arguments:
+            _args       (Namespace): Result of BookFlight.load_args()
+            _currency   (str):       Currency
+            _passengers (tuple):     Passenger objects
+
+          Return:
+            (BookingRequest): Request
+      """
+      def first(_name):
+         value = getattr(_args, _name, None)
+         return value[0] if value else None
+
+      return cls(
+         first('date'),
+         first('from_iata'),
+         first('to_iata'),
+         _currency  = _currency,
+         _passengers = _passengers,
+         _bags      = first('bags') or 0,
+         _return_n  = first('return_n'),
+         _fastest   = bool(_args.fastest),
+         _rank      = first('rank'),
+         _rank_limit   = first('rank_limit'),
+         _price_weight = first('price_weight'),
+         _date_to   = first('date_to'),
+         _workers   = first('workers'),
+         _speculate = first('speculate'),
+         _nearby    = None,       # FROM and TO are expanded already
+         _deadline  = first('deadline'),
+         _verbose   = bool(_args.verbose),
+         _debug     = bool(_args.debug),
+      )
+   # End of from_args
+
+
+
+
+# End of file
+
+
+
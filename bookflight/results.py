@@ -0,0 +1,313 @@
+
+'''
+    File name: results.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import heapq
+import operator
+import sys
+from array import array
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+c_NAN = float('nan')                   # Bag price not offered
+
+# Comparison operators of ResultSet.where()
+c_OPERATORS = {
+   '<':  operator.lt,
+   '<=': operator.le,
+   '>':  operator.gt,
+   '>=': operator.ge,
+   '==': operator.eq,
+   '!=': operator.ne,
+}
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class FlightRecord(object):
+   """ One flight of the ResultSet (data structure) """
+
+   __slots__ = ('price', 'duration', 'route', 'bags_price', 'booking_token')
+
+   def __init__(self, _price, _duration, _route, _bags_price, _booking_token):
+      self.price         = _price          # Price without bags
+      self.duration      = _duration       # duration.total in seconds
+      self.route         = _route          # e.g. 'PRG-VIE-LIS'
+      self.bags_price    = _bags_price     # (price of 1 bag, 2 bags, ...)
+      self.booking_token = _booking_token
+
+   def __repr__(self):
+      return 'FlightRecord(%r, %r, %r, %r)' % (
+         self.price, self.duration, self.route, self.bags_price)
+
+
+
+
+class ResultSet(object):
+   """ Compact column-wise storage of search results
+
+       Numeric columns are arrays of machine values, routes are interned
+       strings. Sorting, filtering and top-k work on whole columns and
+       return row indices, no per-flight dicts are kept.
+   """
+
+   def __init__(self, _bags_max=4):
+      """ Arguments:
+            _bags_max (int): Number of stored bag price columns
+      """
+      self.bags_max = _bags_max
+      self.price    = array('d')
+      self.duration = array('l')
+      self.route    = []
+      self.token    = []
+      self.bags     = [ array('d') for i in range(_bags_max) ]
+
+   @classmethod
+   def from_records(cls, _records, _bags_max=4):
+      """ Create result set from Kiwi API flight records
+
+          Arguments:
+            _records  (iterable): Flight records (dict), e.g. iter_search()
+            _bags_max (int):      Number of stored bag price columns
+
+          Return:
+            (ResultSet): New result set
+      """
+      result = cls(_bags_max)
+      for record in _records:
+         result.append(record)
+      return result
+   # End of from_records
+
+
+
+
+   def append(self, _record):
+      """ Append one Kiwi API flight record
+
+          Arguments:
+            _record (dict): Flight record from the 'data' array
+      """
+      self.price.append(float(_record.get('price', c_NAN)))
+      self.duration.append(int(_record.get('duration', {}).get('total', 0)))
+      self.route.append(sys.intern(route_string(_record)))
+      self.token.append(_record.get('booking_token', ''))
+
+      bags_price = _record.get('bags_price') or {}
+      for i, column in enumerate(self.bags):
+         column.append(float(bags_price.get(str(i + 1), c_NAN)))
+   # End of append
+
+
+
+
+   def __len__(self):
+      return len(self.price)
+
+   def __getitem__(self, _i):
+      return FlightRecord(
+         self.price[_i],
+         self.duration[_i],
+         self.route[_i],
+         tuple( column[_i] for column in self.bags ),
+         self.token[_i],
+      )
+
+   def __iter__(self):
+      for i in range(len(self)):
+         yield self[i]
+
+
+
+
+   def column(self, _name):
+      """ Column by the name
+
+          Arguments:
+            _name (str): 'price', 'duration', 'route', 'token' or 'bagsN'
+                         (price of N bags)
+
+          Return:
+            (array): Column values
+      """
+      if _name.startswith('bags'):
+         return self.bag_price(int(_name[4:]))
+      return getattr(self, _name)
+   # End of column
+
+
+
+
+   def bag_price(self, _bags):
+      """ Price column of the given number of bags
+
+          Arguments:
+            _bags (int): Number of bags (0 = no bags)
+
+          Return:
+            (array): Bags prices, NaN if the number of bags isn't offered
+      """
+      if _bags <= 0:
+         return array('d', bytes(8 * len(self)))
+      return self.bags[_bags - 1]
+   # End of bag_price
+
+
+
+
+   def total_price(self, _bags, _pnum=1):
+      """ Price column including the bags of all passengers
+
+          Arguments:
+            _bags (int): Number of bags per passenger (0 = no bags)
+            _pnum (int): Number of passengers
+
+          Return:
+            (array): price + _pnum * price of _bags, NaN if the number of
+                     bags isn't offered
+      """
+      if _bags <= 0:
+         return self.price
+      return array('d', [ price + _pnum * bags for price, bags in
+                          zip(self.price, self.bag_price(_bags)) ])
+   # End of total_price
+
+
+
+
+   def argsort(self, _name, _reverse=False):
+      """ Row indices ordered by the column
+
+          Arguments:
+            _name    (str):  Column name
+            _reverse (bool): Descending order
+
+          Return:
+            (list): Row indices
+      """
+      column = self.column(_name)
+      return sorted(range(len(column)), key = column.__getitem__,
+                    reverse = _reverse)
+   # End of argsort
+
+
+
+
+   def top_k(self, _name, _k, _largest=False):
+      """ Row indices of the k smallest (largest) values of the column
+
+          Arguments:
+            _name    (str):  Column name
+            _k       (int):  Number of rows
+            _largest (bool): Take the largest values
+
+          Return:
+            (list): Row indices, ordered
+      """
+      column = self.column(_name)
+      select = heapq.nlargest if _largest else heapq.nsmallest
+      return select(_k, range(len(column)), key = column.__getitem__)
+   # End of top_k
+
+
+
+
+   def where(self, _name, _op, _value):
+      """ Row indices where the column matches the condition
+
+          Arguments:
+            _name  (str): Column name
+            _op    (str): Comparison operator: < <= > >= == !=
+            _value:       Compared value
+
+          Return:
+            (list): Row indices
+      """
+      op = c_OPERATORS[_op]
+      column = self.column(_name)
+      return [ i for i, v in enumerate(column) if op(v, _value) ]
+   # End of where
+
+
+
+
+   def take(self, _indices):
+      """ New result set with selected rows
+
+          Arguments:
+            _indices (list): Row indices in the requested order
+
+          Return:
+            (ResultSet): New result set
+      """
+      result = ResultSet(self.bags_max)
+      result.price    = array('d', [ self.price[i] for i in _indices ])
+      result.duration = array('l', [ self.duration[i] for i in _indices ])
+      result.route    = [ self.route[i] for i in _indices ]
+      result.token    = [ self.token[i] for i in _indices ]
+      result.bags     = [ array('d', [ column[i] for i in _indices ])
+                          for column in self.bags ]
+      return result
+   # End of take
+
+
+
+
+   def memory_size(self):
+      """ Approximate size of the stored data
+
+          Return:
+            (int): Size in bytes
+      """
+      size  = sys.getsizeof(self.price) + sys.getsizeof(self.duration)
+      size += sum( sys.getsizeof(column) for column in self.bags )
+      size += sys.getsizeof(self.route) + sys.getsizeof(self.token)
+      size += sum( sys.getsizeof(r) for r in set(self.route) )
+      size += sum( sys.getsizeof(t) for t in self.token )
+      return size
+   # End of memory_size
+
+
+
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def route_string(_record):
+   """ Route of the flight record as a string of IATA codes
+
+       Arguments:
+         _record (dict): Kiwi API flight record
+
+       Return:
+         (str): e.g. 'PRG-VIE-LIS'
+   """
+   segments = _record.get('route') or []
+   if not segments:
+      return _record.get('flyFrom', '') + '-' + _record.get('flyTo', '')
+
+   codes = [ segments[0].get('flyFrom', '') ]
+   for segment in segments:
+      if segment.get('flyFrom', '') != codes[-1]:
+         codes.append(segment.get('flyFrom', ''))
+      codes.append(segment.get('flyTo', ''))
+   return '-'.join(codes)
+# End of route_string
+
+
+
+
+# End of file
+
+
+
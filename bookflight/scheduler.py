@@ -0,0 +1,328 @@
+
+'''
+    File name: scheduler.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import heapq
+import itertools
+import random
+import threading
+from time import monotonic
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class Backoff(object):
+   """ Exponential backoff with jitter
+
+       Delay of the n-th retry is min(_cap, _base * _factor ** n), randomly
+       shortened by up to _jitter fraction so that many polling tokens don't
+       hit the API at the same moment.
+   """
+
+   def __init__(self, _base=1.0, _factor=2.0, _cap=10.0, _jitter=0.5):
+      """ Arguments:
+            _base   (float): First delay in seconds
+            _factor (float): Multiplier of the delay for every retry
+            _cap    (float): Maximum delay in seconds
+            _jitter (float): Random part of the delay (0 = no jitter, 1 = full)
+      """
+      self.base   = _base
+      self.factor = _factor
+      self.cap    = _cap
+      self.jitter = _jitter
+
+   def delay(self, _retry, _cap=None):
+      """ Delay before the retry
+
+          Arguments:
+            _retry (int):   Number of the retry (0 = first one)
+            _cap   (float): Maximum delay instead of self.cap, None = self.cap
+
+          Return:
+            (float): Delay in seconds
+      """
+      if _cap is None:
+         _cap = self.cap
+      # Limit the exponent, the result is capped anyway
+      delay = min(_cap, self.base * self.factor ** min(_retry, 64))
+      return delay * (1.0 - self.jitter * random.random())
+   # End of delay
+
+
+
+
+class CheckTicket(object):
+   """ One booking token polled by CheckScheduler """
+
+   def __init__(self, _bf, _token, _param, _deadline):
+      self.bf       = _bf            # Booking object (state of the check)
+      self.token    = _token         # booking_token
+      self.param    = _param         # check_flights parameters
+      self.attempt  = _bf.check_attempts
+      self.polls    = 0              # Sent check_flights requests
+      self.started  = monotonic()
+      self.deadline = _deadline      # monotonic() time
+      self.latency  = None           # Seconds until flights_checked
+      self.f_ch     = None           # flights_checked
+      self.f_i      = None           # flights_invalid
+      self.cancelled = False
+      self.finished = threading.Event()
+
+   def checked(self):
+      """ Return: (bool): True if the flight was successfully checked """
+      return self.f_ch == True and self.f_i == False
+
+   def wait(self, _timeout=None):
+      """ Wait for the end of polling
+
+          Arguments:
+            _timeout (float): Timeout in seconds, None = forever
+
+          Return:
+            (bool): True if polling has finished
+      """
+      return self.finished.wait(_timeout)
+
+
+
+
+class CheckScheduler(object):
+   """ Multiplexed check_flights polling
+
+       All submitted booking tokens are kept in one timer queue (heap
+       ordered by the time of the next poll) served by a single scheduler
+       thread. Due polls are sent by a small pool of workers, so thousands
+       of tokens don't need thousands of sleeping threads.
+   """
+
+   def __init__(self, _workers=4, _backoff=None, _deadline=None):
+      """ Arguments:
+            _workers  (int):     Number of threads sending the requests
+            _backoff  (Backoff): Delays between polls, capped by check_wait
+                                 of the booking object, None = default
+            _deadline (float):   Max. seconds of polling of one token,
+                                 None = check_deadline of the booking object
+      """
+      from concurrent.futures import ThreadPoolExecutor
+
+      if _backoff is None:
+         _backoff = Backoff()
+      self.backoff  = _backoff
+      self.deadline = _deadline
+      self.executor = ThreadPoolExecutor( max_workers = _workers )
+
+      self._cond    = threading.Condition()
+      self._queue   = []              # heap of (due time, seq, ticket)
+      self._seq     = itertools.count()
+      self._active  = 0
+      self._thread  = None
+      self._running = False
+      self.latencies = []             # Latencies of checked tokens
+
+   def submit(self, _bf, _token, _currency='EUR', _deadline=None):
+      """ Start polling check_flights for the token
+
+          Arguments:
+            _bf        (BookFlight): Booking object with arguments set
+            _token     (str):        booking_token
+            _currency  (str):        Currency
+            _deadline  (float):      Max. seconds of polling, None = default
+
+          Return:
+            (CheckTicket): Ticket of the polled token
+      """
+      if _deadline is None:
+         _deadline = self.deadline
+      if _deadline is None:
+         _deadline = _bf.check_deadline
+      param  = _bf._check_params(_token, _currency)
+      ticket = CheckTicket(_bf, _token, param, monotonic() + _deadline)
+
+      with self._cond:
+         self._active += 1
+         self._start()
+      self._schedule(ticket, monotonic())
+      return ticket
+   # End of submit
+
+
+
+
+   def cancel(self, _ticket):
+      """ Stop polling of the token, the ticket is finished with its next
+          scheduled poll.
+      """
+      _ticket.cancelled = True
+      self._schedule(_ticket, monotonic())
+   # End of cancel
+
+
+
+
+   def wait_all(self, _tickets, _timeout=None):
+      """ Wait for the end of polling of all tickets
+
+          Arguments:
+            _tickets (list):  CheckTicket objects
+            _timeout (float): Timeout in seconds, None = forever
+
+          Return:
+            (bool): True if all tickets have finished
+      """
+      end = None if _timeout is None else monotonic() + _timeout
+      for ticket in _tickets:
+         left = None if end is None else max(end - monotonic(), 0)
+         if not ticket.wait(left):
+            return False
+      return True
+   # End of wait_all
+
+
+
+
+   def stats(self):
+      """ Polling statistics
+
+          Return:
+            (dict): Number of polled tokens, checked tokens and latencies
+      """
+      with self._cond:
+         latencies = sorted(self.latencies)
+         active = self._active
+      result = { 'active': active, 'checked': len(latencies) }
+      if latencies:
+         result['latency_min'] = latencies[0]
+         result['latency_avg'] = sum(latencies) / len(latencies)
+         result['latency_max'] = latencies[-1]
+      return result
+   # End of stats
+
+
+
+
+   def stop(self):
+      """ Stop the scheduler thread and the workers """
+      with self._cond:
+         self._running = False
+         self._cond.notify()
+      if self._thread:
+         self._thread.join()
+         self._thread = None
+      self.executor.shutdown()
+   # End of stop
+
+
+
+
+   """ -- PRIVATE -- """
+
+   def _start(self):
+      """ Start the scheduler thread, self._cond must be locked """
+      if not self._running:
+         self._running = True
+         self._thread = threading.Thread( target = self._loop,
+                                          name = 'CheckScheduler' )
+         self._thread.daemon = True
+         self._thread.start()
+   # End of _start
+
+
+
+
+   def _schedule(self, _ticket, _due):
+      """ Put the ticket into the timer queue """
+      with self._cond:
+         heapq.heappush(self._queue, (_due, next(self._seq), _ticket))
+         self._cond.notify()
+   # End of _schedule
+
+
+
+
+   def _loop(self):
+      """ Scheduler thread: dispatch due polls to the workers """
+      while True:
+         with self._cond:
+            while self._running:
+               now = monotonic()
+               if self._queue and self._queue[0][0] <= now:
+                  break
+               timeout = self._queue[0][0] - now if self._queue else None
+               self._cond.wait(timeout)
+            if not self._running:
+               return
+            due = []
+            while self._queue and self._queue[0][0] <= now:
+               due.append(heapq.heappop(self._queue)[2])
+
+         for ticket in due:
+            if ticket.finished.is_set():
+               continue
+            if ticket.cancelled:
+               self._finish(ticket)
+            else:
+               self.executor.submit(self._poll, ticket)
+   # End of _loop
+
+
+
+
+   def _poll(self, _ticket):
+      """ Worker: send one check_flights request and reschedule the ticket """
+      bf = _ticket.bf
+      try:
+         f_ch, f_i = bf._send_check_flight(_ticket.param)
+      except Exception as e:
+         bf.eprint('EXCEPTION: ' + str(e))
+         f_ch, f_i = None, None
+      _ticket.polls += 1
+      _ticket.f_ch, _ticket.f_i = f_ch, f_i
+
+      if _ticket.cancelled:
+         self._finish(_ticket)
+         return
+
+      delay = self.backoff.delay(_ticket.polls - 1, bf.check_wait)
+      if monotonic() + delay > _ticket.deadline:
+         _ticket.attempt = 0        # No time left for another attempt
+
+      if bf._check_done(f_ch, f_i, _ticket.attempt, delay):
+         if _ticket.checked():
+            _ticket.latency = monotonic() - _ticket.started
+            bf.check_latency = _ticket.latency
+         self._finish(_ticket)
+      else:
+         _ticket.attempt -= 1
+         self._schedule(_ticket, monotonic() + delay)
+   # End of _poll
+
+
+
+
+   def _finish(self, _ticket):
+      """ Mark the ticket as finished """
+      with self._cond:
+         if _ticket.finished.is_set():
+            return
+         self._active -= 1
+         if _ticket.latency is not None:
+            self.latencies.append(_ticket.latency)
+         _ticket.finished.set()
+      if _ticket.polls:
+         _ticket.bf.observe_check(_ticket.started, _ticket.polls)
+   # End of _finish
+
+
+
+
+# End of file
+
+
+
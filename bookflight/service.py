@@ -0,0 +1,459 @@
+
+'''
+    File name: service.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import argparse                        # Script parameters parser
+import json
+import os
+import signal
+import socketserver
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from . import BookFlight               # Book flight implementation
+from .batch import setup_job, validate_job   # Booking job fields
+from .cache import SearchCache         # Cache of search responses
+from .scheduler import CheckScheduler  # check_flights polling
+from .transport import Transport       # Pooled keep-alive HTTP transport
+from .ratelimit import RateLimiter, parse_rates   # Per-phase rate limits
+from .hedge import HedgePolicy         # Hedged search requests
+from .breaker import CircuitBreakers   # Per-endpoint circuit breakers
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+c_HOST      = '127.0.0.1'
+c_PORT      = 8080
+c_CURRENCY  = 'CZK'
+c_WORKERS   = 8          # Threads sending check_flights requests
+c_DRAIN     = 300        # Max. seconds to wait for in-flight requests
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class BookingService(object):
+   """ Warm booking state shared by all requests of the service
+
+       One Transport (connection pools), one SearchCache and one
+       CheckScheduler serve all requests. Every request gets its own
+       BookFlight object.
+   """
+
+   def __init__(self, _transport=None, _cache=None, _scheduler=None,
+                _currency=c_CURRENCY, _verbose=False):
+      """ Arguments:
+            _transport (Transport):      HTTP transport, None = new one
+            _cache     (SearchCache):    Search cache, None = no caching
+            _scheduler (CheckScheduler): Polling scheduler, None = new one
+            _currency  (str):            Currency of jobs without "currency"
+            _verbose   (bool):           Prints additional info
+      """
+      if _transport is None:
+         _transport = Transport()
+      if _scheduler is None:
+         _scheduler = CheckScheduler( _workers = c_WORKERS )
+      self.transport = _transport
+      self.cache     = _cache
+      self.scheduler = _scheduler
+      self.currency  = _currency
+      self.verbose   = _verbose
+
+      self._cond      = threading.Condition()
+      self._in_flight = 0
+      self._closing   = False
+      self.served     = 0
+
+   def begin(self):
+      """ Register in-flight request
+
+          Return:
+            (bool): False if the service is shutting down
+      """
+      with self._cond:
+         if self._closing:
+            return False
+         self._in_flight += 1
+         return True
+   # End of begin
+
+
+
+
+   def end(self):
+      """ Unregister in-flight request """
+      with self._cond:
+         self._in_flight -= 1
+         self.served += 1
+         self._cond.notify_all()
+   # End of end
+
+
+
+
+   def drain(self, _timeout=c_DRAIN):
+      """ Refuse new requests and wait for the in-flight ones
+
+          Arguments:
+            _timeout (float): Max. seconds to wait
+
+          Return:
+            (bool): True if all requests have finished
+      """
+      with self._cond:
+         self._closing = True
+         return self._cond.wait_for(lambda: self._in_flight == 0, _timeout)
+   # End of drain
+
+
+
+
+   def close(self):
+      """ Stop the scheduler and close the connections """
+      self.scheduler.stop()
+      self.transport.close()
+   # End of close
+
+
+
+
+   def stats(self):
+      """ Return: (dict): Service, connections, cache and polling stats """
+      with self._cond:
+         result = { 'in_flight': self._in_flight, 'served': self.served,
+                    'closing': self._closing }
+      result['connections'] = self.transport.stats()
+      if self.transport.rate_limiter is not None:
+         result['rate_limits'] = self.transport.rate_limiter.stats()
+      if self.transport.hedge is not None:
+         result['hedging'] = self.transport.hedge.stats()
+      if self.transport.breakers is not None:
+         result['breakers'] = self.transport.breakers.stats()
+      result['checks'] = self.scheduler.stats()
+      if self.cache is not None:
+         result['cache'] = self.cache.stats()
+      result['metrics'] = self.transport.metrics.snapshot()
+      return result
+   # End of stats
+
+
+
+
+   def new_booking(self, _job, _passenger=True):
+      """ Create booking object sharing the warm state
+
+          Arguments:
+            _job       (dict): Job fields, see batch.run_batch()
+            _passenger (bool): The "passenger" or "passengers" field is
+                               required
+
+          Return:
+            (BookFlight): Booking object,
+            (Passenger):  Passenger object (list for a group) or None,
+            (str):        Currency
+      """
+      bf = BookFlight( _transport = self.transport )
+      bf.search_cache = self.cache
+      passenger, currency = setup_job(bf, _job, self.currency, self.verbose,
+                                      _passenger)
+      return bf, passenger, currency
+   # End of new_booking
+
+
+
+
+   def search(self, _job):
+      """ POST /search: search the flight
+
+          Return:
+            (dict): booking_token, price, currency, fly_duration, error
+      """
+      bf, passenger, currency = self.new_booking(_job, False)
+      if not bf.error:
+         bf.search_flight( _currency = currency )
+      return {
+         'booking_token': bf.token,
+         'price':         bf.search_price,
+         'currency':      bf.search_currency,
+         'fly_duration':  bf.search_duration,
+         'error':         bf.error_msg if bf.error else None,
+      }
+   # End of search
+
+
+
+
+   def check(self, _job):
+      """ POST /check: check the flight of the job "booking_token"
+
+          Return:
+            (dict): flights_checked, flights_invalid, price, currency, error
+      """
+      bf, passenger, currency = self.new_booking(_job, False)
+      f_ch, f_i = None, None
+      if not bf.error:
+         f_ch, f_i = self._check(bf, _job['booking_token'], currency)
+      return {
+         'flights_checked': f_ch,
+         'flights_invalid': f_i,
+         'price':           bf.check_price,
+         'currency':        bf.check_currency,
+         'error':           bf.error_msg if bf.error else None,
+      }
+   # End of check
+
+
+
+
+   def book(self, _job):
+      """ POST /book: search, check and book the flight
+
+          Return:
+            (dict): pnr, price, currency, error
+      """
+      bf, passenger, currency = self.new_booking(_job)
+      if not bf.error:
+         token = bf.search_flight( _currency = currency )
+      if not bf.error:
+         self._check(bf, token, currency)
+      if not bf.error:
+         bf.book_flight(token, currency, passenger)
+      return {
+         'pnr':      bf.book_pnr if not bf.error else '0',
+         'price':    bf.check_price,
+         'currency': bf.check_currency,
+         'error':    bf.error_msg if bf.error else None,
+      }
+   # End of book
+
+
+
+
+   def _check(self, _bf, _token, _currency):
+      """ Check the flight using the shared polling scheduler """
+      ticket = self.scheduler.submit(_bf, _token, _currency)
+      ticket.wait()
+      return ticket.f_ch, ticket.f_i
+   # End of _check
+
+
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+   """ HTTP API of the BookingService (self.server.service) """
+
+   protocol_version = 'HTTP/1.1'
+
+   def do_GET(self):
+      if self.path == '/health':
+         self._reply(200, { 'status': 'ok' })
+      elif self.path == '/stats':
+         self._reply(200, self.server.service.stats())
+      elif self.path == '/metrics':
+         text = self.server.service.transport.metrics.to_prometheus()
+         self._reply(200, text, 'text/plain; version=0.0.4')
+      else:
+         self._reply(404, { 'error': 'Not found' })
+
+   def do_POST(self):
+      service = self.server.service
+      handlers = {
+         '/search': service.search,
+         '/check':  service.check,
+         '/book':   service.book,
+      }
+      if self.path not in handlers:
+         self._reply(404, { 'error': 'Not found' })
+         return
+
+      try:
+         length = int(self.headers.get('Content-Length', 0))
+         job = json.loads(self.rfile.read(length).decode('utf-8'))
+      except ValueError as e:
+         self._reply(400, { 'error': 'Invalid JSON: ' + str(e) })
+         return
+
+      problems = validate_job(job, self.path == '/book',
+                              self.path == '/check')
+      if problems:
+         self._reply(400, { 'error': 'Invalid job: ' + '; '.join(problems) })
+         return
+
+      if not service.begin():
+         self._reply(503, { 'error': 'Service is shutting down' })
+         return
+      try:
+         try:
+            status, result = 200, handlers[self.path](job)
+         except Exception as e:
+            self.log_error('Internal error: %r', e)
+            status, result = 500, { 'error': 'Internal error: ' + repr(e) }
+         self._reply(status, result)
+      finally:
+         # The drain waits until the response is sent
+         service.end()
+
+   def _reply(self, _status, _data, _content_type='application/json'):
+      """ Send JSON response (or the text of other content type) """
+      if _content_type == 'application/json':
+         _data = json.dumps(_data)
+      body = _data.encode('utf-8')
+      self.send_response(_status)
+      self.send_header('Content-Type', _content_type)
+      self.send_header('Content-Length', str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+   def address_string(self):
+      # Unix socket clients have no address
+      if isinstance(self.client_address, tuple):
+         return self.client_address[0]
+      return 'unix'
+
+   def log_message(self, _format, *_args):
+      if self.server.service.verbose:
+         BaseHTTPRequestHandler.log_message(self, _format, *_args)
+
+
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+   """ HTTP server on TCP port, one thread per connection """
+   daemon_threads = True
+
+
+
+
+class ThreadingUnixServer(socketserver.ThreadingMixIn,
+                          socketserver.UnixStreamServer):
+   """ HTTP server on Unix socket, one thread per connection """
+   daemon_threads = True
+
+
+
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def main(_argv=None):
+   """ Booking service script: book_service.py [OPTIONS] """
+   parser = argparse.ArgumentParser(
+      description="This program runs the booking service. POST the job JSON "
+                  "to /search, /check or /book.")
+   parser.add_argument(
+      '--host', help='listen address (default ' + c_HOST + ')', type=str,
+      default=c_HOST
+   )
+   parser.add_argument(
+      '--port', help='listen port (default ' + str(c_PORT) + ')', type=int,
+      default=c_PORT
+   )
+   parser.add_argument(
+      '--unix', help='listen on the Unix socket instead of TCP port',
+      type=str
+   )
+   parser.add_argument(
+      '--cache-ttl', help='cache search results for N seconds', type=int,
+      dest='cache_ttl'
+   )
+   parser.add_argument(
+      '--currency', help='default currency (default ' + c_CURRENCY + ')',
+      type=str, default=c_CURRENCY
+   )
+   parser.add_argument(
+      '--drain', help='max. seconds to finish in-flight requests on '
+      'shutdown (default ' + str(c_DRAIN) + ')', type=float, default=c_DRAIN
+   )
+   parser.add_argument(
+      '--rate', help='max. requests per second of the phase (search, check '
+      'or book), e.g. --rate search=5 --rate check=20', type=str,
+      action='append', metavar='PHASE=N'
+   )
+   parser.add_argument(
+      '--hedge', help='send a duplicate search request when it has no '
+      'response after the P-th percentile latency of the recent searches, '
+      'the first response is used', type=float, metavar='P'
+   )
+   parser.add_argument(
+      '--breaker', help='fail the requests of an endpoint fast for 30 '
+      'seconds after N consecutive failures (errors, 5xx)', type=int,
+      metavar='N'
+   )
+   parser.add_argument(
+      '-v', '--verbose', help='prints additional info', action="store_true"
+   )
+   args = parser.parse_args(_argv)
+   try:
+      rates = parse_rates(args.rate)
+   except ValueError as e:
+      parser.error(str(e))
+   if args.hedge is not None and not 0 < args.hedge < 100:
+      parser.error('--hedge P must be between 0 and 100')
+   if args.breaker is not None and args.breaker < 1:
+      parser.error('--breaker N must be positive')
+
+   cache = SearchCache( _ttl = args.cache_ttl ) if args.cache_ttl else None
+   transport = Transport( _rate_limiter = RateLimiter(rates),
+                          _hedge = HedgePolicy(args.hedge)
+                                   if args.hedge else None,
+                          _breakers = CircuitBreakers(args.breaker)
+                                      if args.breaker else None )
+   service = BookingService( _transport = transport, _cache = cache,
+                             _currency = args.currency,
+                             _verbose = args.verbose )
+   if args.unix:
+      if os.path.exists(args.unix):
+         os.remove(args.unix)
+      server = ThreadingUnixServer(args.unix, ServiceHandler)
+   else:
+      server = ThreadingHTTPServer((args.host, args.port), ServiceHandler)
+   server.service = service
+
+   serve(server, service, args.drain)
+   if args.unix:
+      os.remove(args.unix)
+# End of main
+
+
+
+
+def serve(_server, _service, _drain=c_DRAIN):
+   """ Serve until SIGTERM/SIGINT, then drain in-flight requests
+
+       Arguments:
+         _server  (HTTPServer):     Server with the ServiceHandler
+         _service (BookingService): The service
+         _drain   (float):          Max. seconds to wait for requests
+   """
+   def stop(_signum, _frame):
+      # shutdown() blocks until serve_forever() ends => another thread
+      threading.Thread( target = _server.shutdown ).start()
+
+   signal.signal(signal.SIGTERM, stop)
+   signal.signal(signal.SIGINT, stop)
+
+   try:
+      _server.serve_forever()
+   finally:
+      if not _service.drain(_drain):
+         print('WARNING: in-flight requests were not finished',
+               file=sys.stderr)
+      _server.server_close()
+      _service.close()
+# End of serve
+
+
+
+
+# End of file
+
+
+
@@ -0,0 +1,180 @@
+
+'''
+    File name: stream.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import codecs
+import json
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def iter_flights(_resp, _meta=None, _chunk_size=65536):
+   """ Incrementally decode flight records of the search response
+
+       The 'data' array is decoded record by record while the body is being
+       downloaded, so the whole payload is never held in memory. Stop the
+       iteration whenever you have enough records, the rest of the body is
+       not downloaded at all.
+
+       Arguments:
+         _resp       (Response): Search response sent with stream=True
+         _meta       (dict):     Filled with the other top level fields
+                                 (currency, _results, ...) seen so far
+         _chunk_size (int):      Size of the downloaded chunks in bytes
+
+       Return:
+         (generator): Flight records (dict) of the 'data' array
+   """
+   reader = _Reader(_resp.iter_content(_chunk_size))
+   try:
+      reader.expect('{')
+      if reader.peek() == '}':
+         return
+
+      while True:
+         key = reader.value()
+         reader.expect(':')
+
+         if key == 'data':
+            reader.expect('[')
+            if reader.peek() == ']':
+               reader.take()
+            else:
+               while True:
+                  yield reader.value()
+                  if reader.take() == ']':
+                     break
+                  reader.back(',')
+         else:
+            value = reader.value()
+            if _meta is not None:
+               _meta[key] = value
+
+         if reader.take() == '}':
+            break
+         reader.back(',')
+   finally:
+      _resp.close()
+# End of iter_flights
+
+
+
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class _Reader(object):
+   """ Buffered JSON tokens reader over the downloaded chunks """
+
+   def __init__(self, _chunks):
+      self.chunks  = _chunks
+      self.decoder = json.JSONDecoder()
+      self.utf8    = codecs.getincrementaldecoder('utf-8')()
+      self.buf     = ''
+      self.pos     = 0
+      self.eof     = False
+
+   def more(self):
+      """ Append next chunk to the buffer
+
+          Return:
+            (bool): False if the body is already read
+      """
+      if self.eof:
+         return False
+
+      # Drop the already decoded part of the buffer
+      if self.pos > len(self.buf) // 2:
+         self.buf = self.buf[self.pos:]
+         self.pos = 0
+
+      for chunk in self.chunks:
+         if chunk:
+            self.buf += self.utf8.decode(chunk)
+            return True
+      self.buf += self.utf8.decode(b'', final = True)
+      self.eof = True
+      return False
+   # End of more
+
+
+
+
+   def peek(self):
+      """ Next non-whitespace character, it is not consumed """
+      while True:
+         while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+            self.pos += 1
+         if self.pos < len(self.buf):
+            return self.buf[self.pos]
+         if not self.more():
+            raise ValueError('Unexpected end of the search response')
+   # End of peek
+
+
+
+
+   def take(self):
+      """ Consume next non-whitespace character """
+      c = self.peek()
+      self.pos += 1
+      return c
+   # End of take
+
+
+
+
+   def back(self, _char):
+      """ Check that the last consumed character is the separator """
+      if self.buf[self.pos - 1] != _char:
+         raise ValueError('Expected ' + repr(_char) + ' at position ' +
+                          str(self.pos - 1) + ' of the search response')
+   # End of back
+
+
+
+
+   def expect(self, _char):
+      """ Consume the expected character """
+      self.take()
+      self.back(_char)
+   # End of expect
+
+
+
+
+   def value(self):
+      """ Decode next JSON value """
+      self.peek()
+      while True:
+         try:
+            value, end = self.decoder.raw_decode(self.buf, self.pos)
+         except ValueError:
+            # Incomplete value, read more data
+            if not self.more():
+               raise
+            continue
+
+         # A number could continue in the next chunk
+         if end == len(self.buf) and self.more():
+            continue
+
+         self.pos = end
+         return value
+   # End of value
+
+
+
+
+# End of file
+
+
+
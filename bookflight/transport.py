@@ -0,0 +1,524 @@
+
+'''
+    File name: transport.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import queue
+import threading
+from time import monotonic
+from urllib.parse import urlsplit
+from .metrics import Metrics          # Counters and histograms
+from .breaker import CircuitOpen      # Fail fast of the open circuit
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class Transport(object):
+   """ Pooled keep-alive HTTP transport
+
+       One requests.Session with a connection pool per host. The same object
+       is used for the search, check and book phases, so the TCP+TLS
+       handshake is paid once per host instead of once per request.
+       The session (and the requests library) is loaded with the first
+       request. Time, status and size of every response are recorded in
+       self.metrics labelled by the booking phase (search, check, book).
+
+       Concurrent identical GET requests (same URL and parameters) are
+       coalesced: only the first one is sent, the others wait for it and
+       get the same response object. Streamed responses are not shared.
+       The optional RateLimiter delays the requests of every phase and
+       slows down after throttling responses (429, 5xx).
+
+       A request with _deadline gets its timeouts cut to the time left
+       and raises DeadlineExceeded when the time is out.
+
+       With self.capture (CaptureWriter) every response is downloaded and
+       recorded with its request, see bookflight.capture.
+
+       The optional HedgePolicy sends a duplicate of a slow GET request
+       (after the percentile latency of its phase) and uses the first
+       response. The optional CircuitBreakers fail the requests of an
+       unhealthy endpoint fast by CircuitOpen.
+   """
+
+   def __init__(
+      self,
+      _pool_connections = 4,
+      _pool_maxsize     = 10,
+      _connect_timeout  = 5.0,
+      _read_timeout     = 60.0,
+      _max_retries      = 0,
+      _metrics          = None,
+      _coalesce         = True,
+      _rate_limiter     = None,
+      _hedge            = None,
+      _breakers         = None,
+   ):
+      """ Arguments:
+            _pool_connections (int):   Number of per-host pools to keep
+            _pool_maxsize     (int):   Max. kept-alive connections per host
+            _connect_timeout  (float): TCP connect timeout in seconds
+            _read_timeout     (float): Socket read timeout in seconds
+            _max_retries      (int):   Retries on connection errors
+            _metrics          (Metrics): Shared metrics, None = new one
+            _coalesce         (bool):  Share identical in-flight GETs
+            _rate_limiter (RateLimiter): Limits per phase, None = no limits
+            _hedge        (HedgePolicy): Hedged requests, None = no hedging
+            _breakers (CircuitBreakers): Per endpoint, None = no breakers
+      """
+      self.pool_connections = _pool_connections
+      self.pool_maxsize     = _pool_maxsize
+      self.connect_timeout  = _connect_timeout
+      self.read_timeout     = _read_timeout
+      self.max_retries      = _max_retries
+      self.metrics = _metrics if _metrics is not None else Metrics()
+      self.coalesce = _coalesce
+      self.rate_limiter = _rate_limiter
+      self.throttle_retries = 3     # Repeats of throttled requests
+      self.capture = None           # CaptureWriter, None = no capture
+      self.hedge    = _hedge
+      self.breakers = _breakers
+
+      self.adapter  = None
+      self._session = None
+      self._lock     = threading.Lock()
+      self._requests = {}           # host -> sent requests count
+      self._calls    = {}           # key -> _Call of the in-flight GETs
+
+   @property
+   def session(self):
+      """ (requests.Session): Pooled session, created with the first use """
+      if self._session is None:
+         with self._lock:
+            if self._session is None:
+               self._session = self._new_session()
+      return self._session
+
+   def get(self, _url, _params=None, _headers=None, _timeout=None,
+           _stream=False, _phase=None, _deadline=None):
+      """ Send GET request
+
+          Arguments:
+            _url      (str):   URL
+            _params   (dict):  Query parameters
+            _headers  (dict):  HTTP headers
+            _timeout  (tuple): (connect, read) timeout, None = default
+            _stream   (bool):  Do not download the body immediately
+            _phase    (str):   Booking phase of the request (metrics label)
+            _deadline (float): monotonic() time limit, None = no limit
+
+          Return:
+            (Response): Response from the server
+      """
+      return self.request('GET', _url, _timeout = _timeout, _phase = _phase,
+                          _deadline = _deadline, params = _params,
+                          headers = _headers, stream = _stream)
+   # End of get
+
+
+
+
+   def post(self, _url, _data=None, _headers=None, _timeout=None,
+            _phase=None, _deadline=None):
+      """ Send POST request
+
+          Arguments:
+            _url      (str):   URL
+            _data     (str):   Request body
+            _headers  (dict):  HTTP headers
+            _timeout  (tuple): (connect, read) timeout, None = default
+            _phase    (str):   Booking phase of the request (metrics label)
+            _deadline (float): monotonic() time limit, None = no limit
+
+          Return:
+            (Response): Response from the server
+      """
+      return self.request('POST', _url, _timeout = _timeout, _phase = _phase,
+                          _deadline = _deadline, data = _data,
+                          headers = _headers)
+   # End of post
+
+
+
+
+   def request(self, _method, _url, _timeout=None, _phase=None,
+               _deadline=None, **_kwargs):
+      """ Send HTTP request through the pooled session
+
+          Arguments:
+            _method   (str):   HTTP method
+            _url      (str):   URL
+            _timeout  (tuple): (connect, read) timeout, None = default
+            _phase    (str):   Booking phase of the request (metrics label)
+            _deadline (float): monotonic() time limit, None = no limit.
+                               Raises DeadlineExceeded when it is reached.
+            _kwargs:           Passed to requests.Session.request()
+
+          Return:
+            (Response): Response from the server
+      """
+      if _timeout is None:
+         _timeout = (self.connect_timeout, self.read_timeout)
+      labels = { 'phase': _phase or 'other' }
+
+      if self.coalesce and _method == 'GET' and not _kwargs.get('stream'):
+         key = (_url, self._params_key(_kwargs.get('params')))
+         return self._single_flight(key, labels, _method, _url, _timeout,
+                                    _deadline, _kwargs)
+
+      return self._send(labels, _method, _url, _timeout, _deadline, _kwargs)
+   # End of request
+
+
+
+
+   def stats(self):
+      """ Connection reuse statistics
+
+          Return:
+            (dict): {host: {'requests': n, 'connections': n, 'reused': n}}
+      """
+      if self.adapter is None:
+         return {}
+
+      connections = {}
+      pools = self.adapter.poolmanager.pools
+      for key in pools.keys():
+         pool = pools.get(key)
+         if pool is None:
+            continue
+         host = pool.host
+         if pool.port and pool.port not in (80, 443):
+            host = host + ':' + str(pool.port)
+         connections[host] = connections.get(host, 0) + pool.num_connections
+
+      result = {}
+      with self._lock:
+         hosts = dict(self._requests)
+      for host, count in hosts.items():
+         conn = connections.get(host, 0)
+         result[host] = {
+            'requests':    count,
+            'connections': conn,
+            'reused':      max(count - conn, 0),
+         }
+      return result
+   # End of stats
+
+
+
+
+   def close(self):
+      """ Close all pooled connections """
+      if self._session is not None:
+         self._session.close()
+   # End of close
+
+
+
+
+   """ -- PRIVATE -- """
+
+   def _send(self, _labels, _method, _url, _timeout, _deadline, _kwargs,
+             _hedge=True):
+      """ Send the request, record its metrics. Requests of a rate limited
+          phase are repeated after throttling responses (the limiter
+          delays them): GET after 429 and 5xx, POST only after 429 (5xx
+          doesn't say whether the booking was made).
+      """
+      limiter = self.rate_limiter
+      phase   = _labels['phase']
+      retries = self.throttle_retries if limiter is not None and \
+                phase in limiter.buckets else 0
+      host = urlsplit(_url).netloc
+
+      if _hedge and self.hedge is not None and \
+         self.hedge.applies(phase, _method):
+         delay = self.hedge.delay(phase)
+         if delay is not None:
+            return self._hedged(delay, _labels, _method, _url, _timeout,
+                                _deadline, _kwargs)
+
+      endpoint, breaker = None, None
+      if self.breakers is not None:
+         endpoint, breaker = self.breakers.get(_url)
+
+      while True:
+         with self._lock:
+            self._requests[host] = self._requests.get(host, 0) + 1
+
+         if breaker is not None and not breaker.allow():
+            self.metrics.inc('bookflight_circuit_rejected_total',
+                             { 'endpoint': endpoint })
+            raise CircuitOpen('Circuit of ' + endpoint + ' is open')
+
+         if limiter is not None:
+            left = None if _deadline is None else _deadline - monotonic()
+            waited = limiter.acquire(phase, left)
+            if waited is None:
+               raise DeadlineExceeded('Deadline exceeded while waiting for '
+                                      'the rate limit')
+            if waited:
+               self.metrics.observe('bookflight_rate_limit_wait_seconds',
+                                    waited, _labels)
+
+         timeout = _left(_timeout, _deadline)
+         started = monotonic()
+         try:
+            resp = self.session.request(_method, _url, timeout = timeout,
+                                        **_kwargs)
+            elapsed = monotonic() - started
+            if self.capture is not None:
+               resp.content          # The streamed body is downloaded too
+         except Exception as e:
+            self.metrics.inc('bookflight_requests_total',
+                             dict(_labels, status = 'error'))
+            # The timeout was cut by the deadline
+            if _deadline is not None and monotonic() + 0.01 >= _deadline:
+               raise DeadlineExceeded('Deadline exceeded: ' + str(e))
+            self._breaker_failure(endpoint, breaker)
+            raise
+         self._record(_labels, resp, elapsed, _kwargs.get('stream', False))
+         if breaker is not None and resp.status_code >= 500:
+            self._breaker_failure(endpoint, breaker)
+         elif breaker is not None:
+            breaker.success()
+         if self.capture is not None:
+            self.capture.record(_method, _url, _kwargs.get('params'),
+                                _kwargs.get('data'), resp,
+                                monotonic() - started)
+
+         if limiter is None or not limiter.feedback(
+               phase, resp.status_code, resp.headers.get('Retry-After')):
+            return resp
+         self.metrics.inc('bookflight_throttled_total', _labels)
+
+         if retries <= 0 or (_method != 'GET' and resp.status_code != 429):
+            return resp
+         retries -= 1
+         resp.close()
+   # End of _send
+
+
+
+
+   def _hedged(self, _delay, _labels, _method, _url, _timeout, _deadline,
+               _kwargs):
+      """ Send the request and its duplicate after _delay seconds without
+          a response, return the first response. The later response is
+          closed. If both fail, the error of the first request is raised.
+      """
+      phase   = _labels['phase']
+      results = queue.Queue()
+      state   = { 'done': False }
+      lock    = threading.Lock()
+
+      def attempt(_n):
+         """ Thread: one copy of the request """
+         try:
+            result = (_n, self._send(_labels, _method, _url, _timeout,
+                                     _deadline, _kwargs, False), None)
+         except Exception as e:
+            result = (_n, None, e)
+         with lock:
+            if not state['done']:
+               results.put(result)
+               return
+         if result[1] is not None:
+            result[1].close()        # Lost the race
+
+      def start(_n):
+         thread = threading.Thread( target = attempt, args = (_n,),
+                                    name = 'HedgedRequest' )
+         thread.daemon = True
+         thread.start()
+
+      start(0)
+      sent = 1
+      try:
+         first = results.get(timeout = _delay)
+      except queue.Empty:
+         first = None
+         if self.hedge.allow(phase):
+            start(1)
+            sent = 2
+
+      errors  = {}
+      pending = sent
+      while True:
+         n, resp, error = first if first is not None else results.get()
+         first   = None
+         pending -= 1
+         if error is None or not pending:
+            break
+         errors[n] = error
+
+      with lock:
+         state['done'] = True
+         leftovers = []
+         while not results.empty():
+            leftovers.append(results.get())
+      for item in leftovers:
+         if item[1] is not None:
+            item[1].close()
+
+      if sent > 1:
+         winner = 'none' if error is not None else \
+                  ('hedge' if n == 1 else 'primary')
+         self.metrics.inc('bookflight_hedged_total',
+                          dict(_labels, winner = winner))
+      if error is not None:
+         raise errors.get(0, error)
+      return resp
+   # End of _hedged
+
+
+
+
+   def _breaker_failure(self, _endpoint, _breaker):
+      """ Count the failed request, record the opening of the circuit """
+      if _breaker is not None and _breaker.failure():
+         self.metrics.inc('bookflight_circuit_opened_total',
+                          { 'endpoint': _endpoint })
+   # End of _breaker_failure
+
+
+
+
+   def _single_flight(self, _key, _labels, _method, _url, _timeout,
+                      _deadline, _kwargs):
+      """ Send the request or wait for the identical one in flight. The
+          deadline of the sender is not shared: a waiting caller whose
+          request ran out of the sender's deadline sends it again with its
+          own deadline.
+      """
+      with self._lock:
+         call = self._calls.get(_key)
+         leader = call is None
+         if leader:
+            call = self._calls[_key] = _Call()
+
+      if not leader:
+         left = None if _deadline is None else max(_deadline - monotonic(), 0)
+         if not call.done.wait(left):
+            raise DeadlineExceeded('Deadline exceeded while waiting for '
+                                   'the identical request')
+         if isinstance(call.error, DeadlineExceeded):
+            return self._single_flight(_key, _labels, _method, _url,
+                                       _timeout, _deadline, _kwargs)
+         self.metrics.inc('bookflight_coalesced_total', _labels)
+         if call.error is not None:
+            raise call.error
+         return call.resp
+
+      try:
+         call.resp = self._send(_labels, _method, _url, _timeout, _deadline,
+                                _kwargs)
+      except Exception as e:
+         call.error = e
+         raise
+      finally:
+         with self._lock:
+            del self._calls[_key]
+         call.done.set()
+      return call.resp
+   # End of _single_flight
+
+
+
+
+   def _params_key(self, _params):
+      """ Hashable key of the query parameters """
+      if not _params:
+         return ()
+      return tuple(sorted( (str(k), str(v)) for k, v in _params.items() ))
+   # End of _params_key
+
+
+
+
+   def _record(self, _labels, _resp, _elapsed, _stream):
+      """ Record the metrics of the response """
+      metrics = self.metrics
+      metrics.observe('bookflight_request_seconds', _elapsed, _labels)
+      if self.hedge is not None:
+         self.hedge.observe(_labels['phase'], _elapsed)
+      metrics.inc('bookflight_requests_total',
+                  dict(_labels, status = _resp.status_code))
+
+      # The streamed body is not downloaded yet => its declared length
+      if _stream:
+         size = int(_resp.headers.get('Content-Length', 0) or 0)
+      else:
+         size = len(_resp.content or b'')
+      metrics.inc('bookflight_response_bytes_total', _labels, size)
+   # End of _record
+
+
+
+
+   def _new_session(self):
+      """ Create the session with the pooling adapter """
+      import requests                     # HTTP requests, JSON
+      from requests.adapters import HTTPAdapter
+
+      self.adapter = HTTPAdapter(
+         pool_connections = self.pool_connections,
+         pool_maxsize     = self.pool_maxsize,
+         max_retries      = self.max_retries,
+      )
+      session = requests.Session()
+      session.mount('https://', self.adapter)
+      session.mount('http://', self.adapter)
+      return session
+   # End of _new_session
+
+
+
+
+class DeadlineExceeded(Exception):
+   """ The time budget (deadline) of the request is exhausted """
+
+
+
+
+class _Call(object):
+   """ GET request in flight, shared by the coalesced callers """
+
+   def __init__(self):
+      self.done  = threading.Event()
+      self.resp  = None
+      self.error = None
+
+
+
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def _left(_timeout, _deadline):
+   """ (connect, read) timeout cut to the time left until the deadline,
+       raises DeadlineExceeded if no time is left
+   """
+   if _deadline is None:
+      return _timeout
+   left = _deadline - monotonic()
+   if left <= 0:
+      raise DeadlineExceeded('Deadline exceeded before the request')
+   return (min(_timeout[0], left), min(_timeout[1], left))
+# End of _left
+
+
+
+
+# End of file
+
+
+
@@ -0,0 +1,84 @@
+
+'''
+    Shared fixtures of the offline tests. The Kiwi API is the local fake
+    server of the benchmarks (benchmarks/fake_kiwi.py), no test needs
+    the network.
+
+    Run: python -m pytest -q tests
+
+    File name: conftest.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import os
+import sys
+import pytest
+
+c_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, c_ROOT)
+sys.path.insert(0, os.path.join(c_ROOT, 'benchmarks'))
+
+import fake_kiwi                       # Local stand-in of the Kiwi API
+from bookflight import BookFlight, Passenger, Transport, Backoff
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+c_DEAD_URL  = 'http://127.0.0.1:1'     # Nothing listens there
+c_PASSENGER = Passenger(
+   _id         = "001",
+   _last_name  = "2X4C",
+   _first_name = "Kryton",
+   _birthday   = "2980-04-06",
+   _title      = "Mr",
+   _email      = "kryton@reddwarf.space"
+)
+
+# ==============================================================================
+# Fixtures
+# ==============================================================================
+
+@pytest.fixture
+def kiwi():
+   """ Fake Kiwi API, flights_checked with the second check_flights """
+   server = fake_kiwi.start_server(fake_kiwi.FakeKiwiConfig( _polls = 1 ))
+   yield server
+   server.shutdown()
+   server.server_close()
+
+
+
+
+@pytest.fixture
+def transport():
+   """ Transport shared by the booking objects of the test """
+   transport = Transport()
+   yield transport
+   transport.close()
+
+
+
+
+@pytest.fixture
+def booking(transport):
+   """ Factory of booking objects of the URL with the arguments set """
+   def new_booking(_url, _date='2018-04-13', _from='BCN', _to='DUB',
+                   **_args):
+      bf = BookFlight( _transport = transport )
+      if _url is not None:
+         fake_kiwi.configure(bf, _url)
+      bf.check_backoff = Backoff( _base = 0.01, _jitter = 0 )
+      bf.set_args(_date, _from, _to, **_args)
+      assert not bf.error, bf.error_msg
+      return bf
+   return new_booking
+
+
+
+
+# End of file
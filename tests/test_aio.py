@@ -0,0 +1,75 @@
+
+'''
+    Tests of the asyncio booking engine.
+
+    File name: test_aio.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import pytest
+import fake_kiwi                       # Local stand-in of the Kiwi API
+from bookflight import Backoff
+from bookflight.aio import AsyncBookFlight
+from conftest import c_PASSENGER
+
+# ==============================================================================
+# Fixtures
+# ==============================================================================
+
+@pytest.fixture
+def engine(kiwi):
+   """ Engine of the booking objects of the fake server """
+   engine = AsyncBookFlight( _concurrency = 4 )
+   yield engine
+   engine.close()
+
+
+
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def booking(_engine, _url, _to='DUB', **_args):
+   """ Booking object of the engine with the arguments set """
+   bf = _engine.new_booking()
+   fake_kiwi.configure(bf, _url)
+   bf.check_backoff = Backoff( _base = 0.01, _jitter = 0 )
+   bf.set_args('2018-04-13', 'BCN', _to, **_args)
+   return bf
+# End of booking
+
+
+
+
+# ==============================================================================
+# Tests
+# ==============================================================================
+
+def test_pipelines_are_booked(kiwi, engine):
+   jobs = [ (booking(engine, kiwi.url, to), c_PASSENGER)
+            for to in ('DUB', 'LIS', 'VIE') ]
+   done = engine.run_many(jobs)
+   assert [ bf.error for bf in done ] == [False] * 3
+   assert sorted( bf.book_pnr for bf in done ) == \
+          ['PNR000001', 'PNR000002', 'PNR000003']
+   assert len(kiwi.polls) == 3
+
+
+
+
+def test_speculate_checks_the_best_flights(kiwi, engine):
+   bf = booking(engine, kiwi.url, _speculate = 3)
+   done = engine.run_many([ (bf, c_PASSENGER) ])[0]
+   assert not done.error and done.book_pnr == 'PNR000001'
+   assert len(kiwi.polls) == 3                     # Checked at once
+   assert done.token in [ c[0] for c in done.search_candidates[:3] ]
+
+
+
+
+# End of file
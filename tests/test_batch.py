@@ -0,0 +1,129 @@
+
+'''
+    Tests of the batch booking (book_batch.py).
+
+    File name: test_batch.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import io
+import json
+import fake_kiwi                       # Local stand-in of the Kiwi API
+from bookflight import Backoff
+from bookflight.aio import AsyncBookFlight
+from bookflight.batch import run_batch
+from conftest import c_DEAD_URL
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+c_PASSENGER = { 'id': '001', 'last_name': '2X4C', 'first_name': 'Kryton',
+                'birthday': '2980-04-06', 'title': 'Mr',
+                'email': 'kryton@reddwarf.space' }
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def redirect(_monkeypatch, _url):
+   """ Booking objects of the batch engine use the fake server at _url """
+   new_booking = AsyncBookFlight.new_booking
+
+   def fake_booking(_engine):
+      bf = new_booking(_engine)
+      fake_kiwi.configure(bf, _url)
+      bf.check_backoff = Backoff( _base = 0.01, _jitter = 0 )
+      return bf
+
+   _monkeypatch.setattr(AsyncBookFlight, 'new_booking', fake_booking)
+# End of redirect
+
+
+
+
+def batch(_jobs, **_options):
+   """ Run the jobs, return: (int) failed jobs, (dict) id -> result line """
+   lines  = ''.join( json.dumps(job) + '\n' for job in _jobs )
+   output = io.StringIO()
+   failed = run_batch(io.StringIO(lines), output, **_options)
+   results = [ json.loads(line) for line in output.getvalue().splitlines() ]
+   return failed, dict( (result['id'], result) for result in results )
+# End of batch
+
+
+
+
+def job(_id, _to='DUB', **_fields):
+   """ Job line dict """
+   fields = { 'id': _id, 'date': '2018-04-13', 'from': 'BCN', 'to': _to,
+              'currency': 'EUR', 'passenger': c_PASSENGER }
+   fields.update(_fields)
+   return fields
+# End of job
+
+
+
+
+# ==============================================================================
+# Tests
+# ==============================================================================
+
+def test_books_all_jobs(kiwi, monkeypatch):
+   redirect(monkeypatch, kiwi.url)
+   failed, results = batch([ job(str(i), to) for i, to in
+                             enumerate(('DUB', 'LIS', 'VIE')) ])
+   assert failed == 0
+   assert sorted(results) == ['0', '1', '2']
+   assert all( r['pnr'].startswith('PNR') and r['error'] is None
+               for r in results.values() )
+
+
+
+
+def test_invalid_job_fails_alone(kiwi, monkeypatch):
+   redirect(monkeypatch, kiwi.url)
+   failed, results = batch([ job('ok'), { 'id': 'bad', 'from': 'BCN' } ])
+   assert failed == 1
+   assert results['ok']['error'] is None
+   assert results['bad']['error'].startswith('Invalid job')
+
+
+
+
+def test_unexpected_exception_fails_only_its_job(kiwi, monkeypatch):
+   redirect(monkeypatch, kiwi.url)
+   run_pipeline = AsyncBookFlight.run_pipeline
+
+   async def broken_pipeline(_engine, _bf, _passenger, _currency='EUR'):
+      if _bf.args.to_iata[0] == 'LIS':
+         raise RuntimeError('broken pipeline')
+      return await run_pipeline(_engine, _bf, _passenger, _currency)
+
+   monkeypatch.setattr(AsyncBookFlight, 'run_pipeline', broken_pipeline)
+   failed, results = batch([ job('1'), job('2', 'LIS'), job('3', 'VIE') ],
+                           _pipelines = 2)
+   assert failed == 1
+   assert results['2'] == { 'id': '2', 'pnr': None,
+                            'error': 'broken pipeline' }
+   assert results['1']['pnr'].startswith('PNR')
+   assert results['3']['pnr'].startswith('PNR')
+
+
+
+
+def test_dead_endpoint_with_bags(monkeypatch):
+   redirect(monkeypatch, c_DEAD_URL)
+   failed, results = batch([ job('1', bags = 1), job('2') ])
+   assert failed == 2
+   assert results['1']['pnr'] == '0' and results['1']['error']
+   assert results['2']['pnr'] == '0' and results['2']['error']
+
+
+
+
+# End of file
@@ -0,0 +1,147 @@
+
+'''
+    Tests of the circuit breakers and of the hedged requests.
+
+    File name: test_breaker.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+from time import monotonic, sleep
+import pytest
+import requests
+import fake_kiwi                       # Local stand-in of the Kiwi API
+from bookflight import Transport, CircuitBreaker, CircuitBreakers
+from bookflight import CircuitOpen, HedgePolicy
+from conftest import c_DEAD_URL
+
+# ==============================================================================
+# Fixtures
+# ==============================================================================
+
+@pytest.fixture
+def slow_kiwi():
+   """ Fake Kiwi API answering after 0.1 seconds """
+   server = fake_kiwi.start_server(fake_kiwi.FakeKiwiConfig( _latency = 0.1 ))
+   yield server
+   server.shutdown()
+   server.server_close()
+
+
+
+
+# ==============================================================================
+# Tests
+# ==============================================================================
+
+def test_breaker_states():
+   breaker = CircuitBreaker( _failures = 2, _reset = 0.1 )
+   assert not breaker.failure()
+   breaker.success()                               # Not consecutive
+   assert not breaker.failure()
+   assert breaker.failure()                        # Opened now
+   assert breaker.state == 'open' and not breaker.allow()
+
+   sleep(0.1)
+   assert breaker.state == 'half-open'
+   assert breaker.allow()                          # One trial request
+   assert not breaker.allow()
+   breaker.failure()                               # The trial failed
+   assert breaker.state == 'open'
+
+   sleep(0.1)
+   assert breaker.allow()
+   breaker.success()
+   assert breaker.state == 'closed' and breaker.allow()
+   assert breaker.stats() == { 'state': 'closed', 'failures': 0,
+                               'opened': 1, 'rejected': 2 }
+
+
+
+
+def test_open_circuit_fails_fast():
+   transport = Transport( _breakers = CircuitBreakers( _failures = 2 ) )
+   url = c_DEAD_URL + '/flights'
+   for i in range(2):
+      with pytest.raises(requests.ConnectionError):
+         transport.get(url, _phase = 'search')
+
+   started = monotonic()
+   with pytest.raises(CircuitOpen):
+      transport.get(url, _phase = 'search')
+   assert monotonic() - started < 0.05
+
+   endpoint = '127.0.0.1:1/flights'
+   assert transport.metrics.value('bookflight_circuit_opened_total',
+                                  { 'endpoint': endpoint }) == 1
+   assert transport.metrics.value('bookflight_circuit_rejected_total',
+                                  { 'endpoint': endpoint }) == 1
+   transport.close()
+
+
+
+
+def test_trial_request_closes_the_circuit(kiwi):
+   breakers  = CircuitBreakers( _failures = 1, _reset = 0.1 )
+   transport = Transport( _breakers = breakers )
+   url = kiwi.url + '/flights'
+   endpoint, breaker = breakers.get(url)
+   breaker.failure()
+   with pytest.raises(CircuitOpen):
+      transport.get(url, { 'limit': 1 })
+
+   sleep(0.1)
+   assert transport.get(url, { 'limit': 1 }).status_code == 200
+   assert breaker.state == 'closed'
+   transport.close()
+
+
+
+
+def test_booking_with_open_circuit(kiwi, booking, transport):
+   transport.breakers = CircuitBreakers( _failures = 1 )
+   endpoint, breaker = transport.breakers.get(kiwi.url + '/flights')
+   breaker.failure()
+   bf = booking(kiwi.url)
+   assert bf.search_flight() == 0 and bf.error
+   assert transport.metrics.value('bookflight_circuit_rejected_total',
+                                  { 'endpoint': endpoint }) == 1
+   assert transport.metrics.value('bookflight_requests_total',
+                                  { 'phase': 'search', 'status': 200 }) == 0
+
+
+
+
+def test_hedging_delay_is_the_percentile():
+   hedge = HedgePolicy(90, _min_samples = 10, _initial = 0.5)
+   assert hedge.delay('search') == 0.5
+   for i in range(10):
+      hedge.observe('search', (i + 1) / 10.0)
+   hedge.observe('check', 10.0)                    # Not a hedged phase
+   assert hedge.delay('search') == 0.9
+   assert hedge.applies('search', 'GET')
+   assert not hedge.applies('search', 'POST')
+   assert not hedge.applies('book', 'GET')
+
+
+
+
+def test_slow_search_is_hedged(slow_kiwi):
+   hedge     = HedgePolicy( _initial = 0.02, _budget = 0.5 )
+   transport = Transport( _hedge = hedge )
+   url = slow_kiwi.url + '/flights'
+   hedged = []
+   for i in range(3):
+      resp = transport.get(url, { 'limit': i + 1 }, _phase = 'search')
+      assert len(resp.json()['data']) == i + 1
+      hedged.append(hedge.stats()['search']['hedged'])
+   assert hedged == [0, 1, 1]                      # Budget: half of requests
+   transport.close()
+
+
+
+
+# End of file
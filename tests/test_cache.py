@@ -0,0 +1,161 @@
+
+'''
+    Tests of the search cache: TTL, LRU memory tier and the disk tier.
+
+    File name: test_cache.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import os
+import threading
+import time
+import requests
+from bookflight import SearchCache
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+c_EP = 'http://fake/flights?'
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def response(_body, _status=200):
+   """ Response object with the body """
+   resp = requests.Response()
+   resp.status_code = _status
+   resp.url         = c_EP
+   resp._content    = _body
+   return resp
+# End of response
+
+
+
+
+# ==============================================================================
+# Tests
+# ==============================================================================
+
+def test_hit_and_miss():
+   cache = SearchCache( _ttl = 60 )
+   assert cache.get(c_EP, { 'flyFrom': 'BCN' }) is None
+   cache.put(c_EP, { 'flyFrom': 'BCN' }, response(b'{"data": []}'))
+
+   resp = cache.get(c_EP, { 'flyFrom': 'BCN' })
+   assert resp.status_code == 200
+   assert resp.json() == { 'data': [] }
+   assert cache.stats() == { 'hits': 1, 'disk_hits': 0, 'misses': 1,
+                             'size': 1 }
+
+
+
+
+def test_key_is_normalized():
+   cache = SearchCache()
+   assert cache.key(c_EP, { 'a': 1, 'b': '2' }) == \
+          cache.key(c_EP, { 'b': 2, 'a': '1' })
+   assert cache.key(c_EP, { 'a': 1 }) != cache.key(c_EP, { 'a': 2 })
+
+
+
+
+def test_errors_are_not_cached():
+   cache = SearchCache()
+   cache.put(c_EP, {}, response(b'{}', 500))
+   assert cache.get(c_EP, {}) is None
+
+
+
+
+def test_ttl_expires_memory_entry():
+   cache = SearchCache( _ttl = 0.05 )
+   cache.put(c_EP, {}, response(b'{}'))
+   assert cache.get(c_EP, {}) is not None
+   time.sleep(0.1)
+   assert cache.get(c_EP, {}) is None
+   assert cache.stats()['size'] == 0
+
+
+
+
+def test_lru_evicts_least_recently_used():
+   cache = SearchCache( _maxsize = 2 )
+   for n in (1, 2):
+      cache.put(c_EP, { 'n': n }, response(b'{}'))
+   cache.get(c_EP, { 'n': 1 })                # 2 is the oldest now
+   cache.put(c_EP, { 'n': 3 }, response(b'{}'))
+   assert cache.get(c_EP, { 'n': 2 }) is None
+   assert cache.get(c_EP, { 'n': 1 }) is not None
+   assert cache.get(c_EP, { 'n': 3 }) is not None
+
+
+
+
+def test_disk_tier_is_shared(tmp_path):
+   path = str(tmp_path / 'cache')
+   SearchCache( _path = path ).put(c_EP, { 'n': 1 }, response(b'{"a": 1}'))
+
+   other = SearchCache( _path = path )         # e.g. the next invocation
+   resp  = other.get(c_EP, { 'n': 1 })
+   assert resp.json() == { 'a': 1 }
+   assert other.stats()['disk_hits'] == 1
+   other.get(c_EP, { 'n': 1 })
+   assert other.stats()['hits'] == 1          # Promoted to the memory tier
+
+
+
+
+def test_disk_tier_expires(tmp_path):
+   path = str(tmp_path / 'cache')
+   SearchCache( _path = path ).put(c_EP, {}, response(b'{}'))
+   time.sleep(0.1)
+   assert SearchCache( _ttl = 0.05, _path = path ).get(c_EP, {}) is None
+   assert os.listdir(path) == []              # Expired file is removed
+
+
+
+
+def test_disk_writes_of_one_key_dont_mix(tmp_path):
+   path  = str(tmp_path / 'cache')
+   cache = SearchCache( _path = path )
+   bodies = [ b'{"n": "' + (b'%d' % n) * (1 << 20) + b'"}' for n in range(8) ]
+   threads = [ threading.Thread( target = cache.put,
+                                 args = (c_EP, {}, response(body)) )
+               for body in bodies ]
+   for thread in threads:
+      thread.start()
+   for thread in threads:
+      thread.join()
+
+   assert len(os.listdir(path)) == 1             # No temporary files left
+   resp = SearchCache( _path = path ).get(c_EP, {})
+   assert resp.content in bodies
+
+
+
+
+def test_search_flight_uses_cache(kiwi, booking, transport):
+   cache = SearchCache()
+   first = booking(kiwi.url)
+   first.search_cache = cache
+   token = first.search_flight()
+   sent  = sum( host['requests'] for host in transport.stats().values() )
+
+   second = booking(kiwi.url)
+   second.search_cache = cache
+   assert second.search_flight() == token
+   assert not second.error
+   assert cache.stats()['hits'] == 1
+   assert sum( host['requests'] for host in transport.stats().values() ) \
+          == sent
+
+
+
+
+# End of file
@@ -0,0 +1,118 @@
+
+'''
+    Tests of the traffic capture: recorded exchanges, redacted passengers
+    and failed downloads.
+
+    File name: test_capture.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import copy
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import pytest
+from bookflight import Transport, CircuitBreakers
+from bookflight import CaptureWriter, CaptureArchive, BookingRequest
+from conftest import c_PASSENGER
+
+# ==============================================================================
+# Classes
+# ==============================================================================
+
+class TornHandler(BaseHTTPRequestHandler):
+   """ Sends the headers and the first chunk of the body, then closes """
+
+   protocol_version = 'HTTP/1.1'
+
+   def do_GET(self):
+      self.send_response(200)
+      self.send_header('Transfer-Encoding', 'chunked')
+      self.end_headers()
+      self.wfile.write(b'100\r\n{"data": [')
+      self.close_connection = True
+
+   def log_message(self, *_args):
+      pass
+
+
+
+
+# ==============================================================================
+# Fixtures
+# ==============================================================================
+
+@pytest.fixture
+def torn_server():
+   """ Server whose responses are cut off in the body """
+   server = HTTPServer(('127.0.0.1', 0), TornHandler)
+   thread = threading.Thread( target = server.serve_forever,
+                              kwargs = { 'poll_interval': 0.05 } )
+   thread.daemon = True
+   thread.start()
+   yield 'http://127.0.0.1:%d' % server.server_address[1]
+   server.shutdown()
+   server.server_close()
+
+
+
+
+# ==============================================================================
+# Tests
+# ==============================================================================
+
+def test_booking_is_recorded_without_passengers(kiwi, booking, tmp_path):
+   path = str(tmp_path / 'traffic.bfc')
+   bf = booking(kiwi.url)
+   bf.transport.capture = CaptureWriter(path)
+   token = bf.search_flight()
+   bf.check_flight(token)
+   assert bf.book_flight(token, 'EUR', c_PASSENGER) == 'PNR000001'
+   bf.transport.capture.close()
+
+   with open(path, 'rb') as f:
+      assert b'Kryton' not in f.read()
+   archive = CaptureArchive(path)
+   assert len(archive) == 4                        # Search, 2 checks, book
+   booked = archive.read(3)
+   assert booked.method == 'POST' and booked.status == 200
+   passengers = json.loads(booked.body.decode('utf-8'))['passengers']
+   assert set(passengers[0].values()) == { 'REDACTED' }
+
+   # The booking of another passenger is the recorded one
+   other = copy.copy(c_PASSENGER)
+   other.first_name = 'Arnold'
+   body = json.dumps({ 'currency': 'EUR', 'booking_token': token, 'bags': 0,
+                       'passengers': [ other.to_dict() ] })
+   exchange = archive.lookup('POST', booked.path, None, body,
+                             _fallback = False)
+   assert exchange is not None and exchange.status == 200
+   archive.close()
+
+
+
+
+def test_failed_download_is_a_failure(torn_server, tmp_path):
+   transport = Transport( _breakers = CircuitBreakers( _failures = 1 ) )
+   transport.capture = CaptureWriter(str(tmp_path / 'traffic.bfc'))
+   with pytest.raises(Exception):
+      transport.get(torn_server + '/flights', _stream = True,
+                    _phase = 'search')
+
+   assert transport.metrics.value('bookflight_requests_total',
+                                  { 'phase': 'search',
+                                    'status': 'error' }) == 1
+   stats = transport.breakers.stats()
+   assert [ s['state'] for s in stats.values() ] == ['open']
+   assert transport.capture.count == 0
+   transport.capture.close()
+   transport.close()
+
+
+
+
+# End of file
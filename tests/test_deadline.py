@@ -0,0 +1,107 @@
+
+'''
+    Tests of the time budget (--deadline) of the booking and of the
+    requests.
+
+    File name: test_deadline.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import threading
+from time import monotonic, sleep
+import pytest
+import fake_kiwi                       # Local stand-in of the Kiwi API
+from bookflight import DeadlineExceeded
+from conftest import c_PASSENGER
+
+# ==============================================================================
+# Fixtures
+# ==============================================================================
+
+@pytest.fixture
+def slow_kiwi():
+   """ Fake Kiwi API answering after 0.2 seconds, never flights_checked """
+   server = fake_kiwi.start_server(
+      fake_kiwi.FakeKiwiConfig( _latency = 0.2, _polls = 1000 ))
+   yield server
+   server.shutdown()
+   server.server_close()
+
+
+
+
+# ==============================================================================
+# Tests
+# ==============================================================================
+
+def test_deadline_in_the_search_phase(slow_kiwi, booking):
+   bf = booking(slow_kiwi.url, _deadline = 0.1)
+   started = monotonic()
+   assert bf.search_flight() == 0
+   assert monotonic() - started < 0.2              # Read timeout cut
+   assert bf.deadline_exceeded
+   assert bf.error_msg == 'Deadline exceeded in the search phase: 0.1 seconds'
+   assert bf.metrics.value('bookflight_deadline_exceeded_total',
+                           { 'phase': 'search' }) == 1
+
+
+
+
+def test_deadline_in_the_check_phase(slow_kiwi, booking):
+   bf = booking(slow_kiwi.url, _deadline = 0.8)
+   token = bf.search_flight()
+   assert token and not bf.error
+   started = monotonic()
+   bf.check_flight(token)
+   assert monotonic() - started < 0.8
+   assert bf.deadline_exceeded
+   assert bf.error_msg.startswith('Deadline exceeded in the check phase')
+
+   bf.book_flight(token, 'EUR', c_PASSENGER)      # Nothing is sent
+   assert slow_kiwi.pnr == 0
+
+
+
+
+def test_deadline_error_without_budget(kiwi, booking, monkeypatch):
+   bf = booking(kiwi.url)
+
+   def get(*_args, **_kwargs):
+      raise DeadlineExceeded('Deadline of another booking')
+   monkeypatch.setattr(bf.transport, 'get', get)
+   assert bf.search_flight() == 0
+   assert bf.deadline_exceeded
+   assert bf.error_msg == 'Deadline exceeded in the search phase'
+
+
+
+
+def test_waiting_caller_keeps_its_own_budget(slow_kiwi, transport):
+   url    = slow_kiwi.url + '/flights'
+   result = {}
+
+   def leader():
+      try:
+         transport.get(url, { 'limit': 1 }, _deadline = monotonic() + 0.1)
+      except DeadlineExceeded as e:
+         result['leader'] = e
+
+   thread = threading.Thread( target = leader )
+   thread.start()
+   sleep(0.05)                                     # Waits for the leader
+   resp = transport.get(url, { 'limit': 1 })
+   thread.join()
+
+   assert isinstance(result['leader'], DeadlineExceeded)
+   assert resp.status_code == 200 and len(resp.json()['data']) == 1
+   assert transport.metrics.value('bookflight_coalesced_total',
+                                  { 'phase': 'other' }) == 0
+
+
+
+
+# End of file
@@ -0,0 +1,160 @@
+
+'''
+    Tests of the crash-safe journal and of the resumed bookings.
+
+    File name: test_journal.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import copy
+import fake_kiwi                       # Local stand-in of the Kiwi API
+from bookflight import BookFlight, BookingRequest, Journal, Backoff
+from bookflight import journal
+from conftest import c_DEAD_URL, c_PASSENGER
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def booking_service(_url, _journal, _transport):
+   """ BookFlight serving the requests, journaled into _journal """
+   bf = BookFlight( _transport = _transport )
+   fake_kiwi.configure(bf, _url)
+   bf.check_backoff = Backoff( _base = 0.01, _jitter = 0 )
+   bf.journal = _journal
+   return bf
+# End of booking_service
+
+
+
+
+def request(_passenger=c_PASSENGER):
+   """ Booking request of one passenger """
+   return BookingRequest('2018-04-13', 'BCN', 'DUB', _currency = 'EUR',
+                         _passengers = [_passenger])
+# End of request
+
+
+
+
+# ==============================================================================
+# Tests
+# ==============================================================================
+
+def test_state_is_replayed(tmp_path):
+   path = str(tmp_path / 'journal')
+   log  = Journal(path)
+   log.append('1', journal.c_SEARCHED, token = 'T', price = 100)
+   log.append('1', journal.c_CHECKED, check_price = 120)
+   log.append('2', journal.c_SEARCHED, token = 'U')
+   log.append('2', journal.c_BOOKED, _sync = True, pnr = 'ABC')
+   log.close()
+
+   log = Journal(path)
+   state = log.state('1')
+   assert (state['step'], state['token'], state['price'],
+           state['check_price']) == ('checked', 'T', 100, 120)
+   assert log.state('2')['pnr'] == 'ABC'
+   assert log.pending() == ['1']
+   assert log.state('3') is None
+   log.close()
+
+
+
+
+def test_new_search_resets_the_state(tmp_path):
+   log = Journal(str(tmp_path / 'journal'))
+   log.append('1', journal.c_SEARCHED, token = 'T')
+   log.append('1', journal.c_CHECKED, check_price = 120)
+   log.append('1', journal.c_SEARCHED, token = 'U')
+   assert log.state('1') == dict(log.state('1'), step = 'searched',
+                                 token = 'U')
+   assert 'check_price' not in log.state('1')
+   log.close()
+
+
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+   path = str(tmp_path / 'journal')
+   log  = Journal(path)
+   log.append('1', journal.c_SEARCHED, _sync = True, token = 'T')
+   log.close()
+   with open(path, 'ab') as f:
+      f.write(b'{"id": "1", "step": "chec')        # Killed while writing
+
+   log = Journal(path)
+   assert log.state('1')['step'] == 'searched'
+   log.append('1', journal.c_CHECKED)              # Appends after the tear
+   log.close()
+   assert Journal(path).state('1')['step'] == 'checked'
+
+
+
+
+def test_resume_after_check(kiwi, tmp_path, transport):
+   path = str(tmp_path / 'journal')
+   bf   = booking_service(kiwi.url, Journal(path), transport)
+   check = bf.check(request(), bf.search(request()))
+   assert check.checked and check.error is None
+   bf.journal.close()                              # Killed before booking
+
+   bf = booking_service(kiwi.url, Journal(path), transport)
+   bf.c_EP_FLIGHTS = c_DEAD_URL + '/flights?'     # No search again
+   bf.c_EP_CHECK   = c_DEAD_URL + '/check_flights?'
+   result = bf.run(request())
+   assert result.error is None
+   assert result.token == check.token
+   assert result.pnr == 'PNR000001'
+   bf.journal.close()
+
+   state = Journal(path).state(bf._session(request()).journal_id)
+   assert (state['step'], state['pnr']) == ('booked', 'PNR000001')
+
+
+
+
+def test_interrupted_booking_is_not_repeated(kiwi, tmp_path, transport):
+   path = str(tmp_path / 'journal')
+   bf   = booking_service(kiwi.url, Journal(path), transport)
+   check = bf.check(request(), bf.search(request()))
+   pipeline = bf._session(request()).journal_id
+   bf.journal.append(pipeline, journal.c_BOOKING, _sync = True)
+   bf.journal.close()                              # Killed while booking
+
+   bf = booking_service(kiwi.url, Journal(path), transport)
+   result = bf.run(request())
+   assert result.pnr == '0'
+   assert 'interrupted' in result.error and check.token in result.error
+   assert kiwi.pnr == 0                            # Nothing was booked
+   bf.journal.close()
+
+
+
+
+def test_other_passengers_are_other_pipelines(kiwi, tmp_path, transport):
+   other = copy.copy(c_PASSENGER)
+   other.id, other.first_name = '002', 'Arnold'
+   path = str(tmp_path / 'journal')
+   bf   = booking_service(kiwi.url, Journal(path), transport)
+   assert bf._session(request()).journal_id != \
+          bf._session(request(other)).journal_id
+   assert 'Kryton' not in bf._session(request()).journal_id
+
+   bf.check(request(), bf.search(request()))
+   bf.journal.append(bf._session(request()).journal_id, journal.c_BOOKING,
+                     _sync = True)                 # Interrupted booking
+
+   result = bf.run(request(other))                 # Same route
+   assert result.error is None and result.pnr == 'PNR000001'
+   assert bf.run(request()).error.startswith('Booking of the token was')
+   bf.journal.close()
+
+
+
+
+# End of file
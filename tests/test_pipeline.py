@@ -0,0 +1,109 @@
+
+'''
+    Tests of the library API: search(), check(), book() and run() of the
+    booking requests.
+
+    File name: test_pipeline.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import fake_kiwi                       # Local stand-in of the Kiwi API
+from bookflight import BookFlight, BookingRequest, Backoff
+from bookflight import SearchResult, CheckResult
+from conftest import c_DEAD_URL, c_PASSENGER
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def booking_service(_url, _transport):
+   """ BookFlight serving the requests of the URL """
+   bf = BookFlight( _transport = _transport )
+   fake_kiwi.configure(bf, _url)
+   bf.check_backoff = Backoff( _base = 0.01, _jitter = 0 )
+   return bf
+# End of booking_service
+
+
+
+
+def request():
+   """ Booking request of one passenger """
+   return BookingRequest('2018-04-13', 'BCN', 'DUB', _currency = 'EUR',
+                         _passengers = [c_PASSENGER])
+# End of request
+
+
+
+
+# ==============================================================================
+# Tests
+# ==============================================================================
+
+def test_steps_book_the_flight(kiwi, transport):
+   bf = booking_service(kiwi.url, transport)
+   search = bf.search(request())
+   check  = bf.check(request(), search)
+   booked = bf.book(request(), check)
+   assert (search.error, check.error, booked.error) == (None, None, None)
+   assert check.checked == True and check.invalid == False
+   assert booked.token == search.token and booked.pnr == 'PNR000001'
+
+
+
+
+def test_failed_search_is_not_checked(kiwi, transport):
+   bf = booking_service(kiwi.url, transport)
+   search = SearchResult('T', 0, 0, 0, (), 'No flights found')
+   check  = bf.check(request(), search)
+   assert check.error == 'No flights found'
+   assert check.checked is None
+   assert kiwi.polls == {}                         # Nothing was sent
+
+
+
+
+def test_failed_check_is_not_booked(kiwi, transport):
+   bf = booking_service(kiwi.url, transport)
+   search = bf.search(request())
+   bf.c_EP_CHECK = c_DEAD_URL + '/check_flights?'
+   check = bf.check(request(), search)
+   assert check.error is not None
+
+   bf = booking_service(kiwi.url, transport)
+   booked = bf.book(request(), check)
+   assert (booked.pnr, booked.error) == ('0', check.error)
+   assert kiwi.pnr == 0                            # Nothing was booked
+
+
+
+
+def test_unchecked_flight_is_not_booked(kiwi, transport):
+   bf = booking_service(kiwi.url, transport)
+   token = bf.search(request()).token
+   for checked, invalid in ((False, False), (True, True), (None, None)):
+      check  = CheckResult(token, checked, invalid, 0, 0, 0, None)
+      booked = bf.book(request(), check)
+      assert booked.pnr == '0'
+      assert booked.error.startswith('The flight was not checked')
+   assert kiwi.pnr == 0
+
+   assert bf.book(request(), token).pnr == 'PNR000001'   # Checked elsewhere
+
+
+
+
+def test_missing_token_is_an_error(kiwi, transport):
+   bf = booking_service(kiwi.url, transport)
+   assert bf.check(request(), None).error == 'No booking_token to check'
+   assert bf.book(request(), '').error == 'No booking_token to book'
+   assert kiwi.polls == {} and kiwi.pnr == 0
+
+
+
+
+# End of file
@@ -0,0 +1,115 @@
+
+'''
+    Tests of the local ranking: total price with the bags, ranked and
+    fan-out searches.
+
+    File name: test_ranking.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import copy
+import json
+from bookflight import ResultSet, SearchCache, ranking
+from conftest import c_DEAD_URL, c_PASSENGER
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def record(_price, _bags_price, _duration=7200):
+   """ Flight record of the search response """
+   return { 'booking_token': 'T%d' % _price, 'price': _price,
+            'duration': { 'total': _duration }, 'route': [],
+            'bags_price': _bags_price }
+# End of record
+
+
+
+
+def bags_body(_query):
+   """ Search response sorted by the price without bags: the flights 15-19
+       have the cheapest bags, the flights 1 and 2 offer no bags
+   """
+   limit = int(_query.get('limit', 1))
+   data  = []
+   for i in range(min(limit, 20)):
+      bags_price = { '1': 5 if i >= 15 else 50 }
+      data.append(dict(record(100 + i, {} if i in (1, 2) else bags_price),
+                       booking_token = 'FLIGHT-%02d' % i))
+   return json.dumps({ 'data': data, 'currency': 'EUR' }).encode('utf-8')
+# End of bags_body
+
+
+
+
+# ==============================================================================
+# Tests
+# ==============================================================================
+
+def test_rank_by_total_price_with_bags():
+   rs = ResultSet.from_records([ record(100, { '1': 50 }),
+                                 record(110, {}),
+                                 record(120, { '1': 10 }),
+                                 record(130, { '1': 20 }) ])
+   assert ranking.rank(rs) == [0, 1, 2, 3]
+   assert ranking.rank(rs, _bags = 1) == [2, 0, 3]       # 130, 150, 150
+   assert ranking.rank(rs, _bags = 1, _pnum = 3) == [2, 3, 0]
+   assert ranking.rank(rs, _bags = 2) == []
+
+
+
+
+def test_ranked_bags_search(kiwi, booking):
+   kiwi.search_body = bags_body
+   bf = booking(kiwi.url, _bags = 1)
+   assert bf.search_flight() == 'FLIGHT-15'
+   assert bf.search_price == 120
+
+
+
+
+def test_ranked_bags_search_is_cached(kiwi, booking):
+   cache = SearchCache()
+   for i in range(2):
+      bf = booking(kiwi.url, _bags = 1)
+      bf.search_cache = cache
+      assert bf.search_flight()
+   assert cache.stats()['hits'] == 1
+   assert bf.search_flight() == bf.token and not bf.error
+
+
+
+
+def test_failed_ranked_search(booking):
+   for cache in (None, SearchCache()):
+      bf = booking(c_DEAD_URL, _bags = 1)
+      bf.search_cache = cache
+      assert bf.search_flight() == 0
+      assert bf.error and bf.search_set is not None
+
+
+
+
+def test_fan_out_ranks_by_total_price(kiwi, booking):
+   kiwi.search_body = bags_body
+   bf = booking(kiwi.url, _bags = 1, _date_to = '2018-04-13')
+   assert bf.search_flight() == 'FLIGHT-15'
+   assert bf.search_price == 120
+   tokens = bf.search_set.token
+   assert 'FLIGHT-01' not in tokens and 'FLIGHT-02' not in tokens
+
+   second = copy.copy(c_PASSENGER)
+   second.id = '002'
+   bf = booking(kiwi.url, _bags = 1, _date_to = '2018-04-13')
+   assert bf.set_passengers([c_PASSENGER, second])
+   assert bf.search_flight() == 'FLIGHT-15'
+   assert bf.search_price == 125                   # Bags of both passengers
+
+
+
+
+# End of file
@@ -0,0 +1,90 @@
+
+'''
+    Tests of the per-phase rate limits of the transport.
+
+    File name: test_ratelimit.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+from time import monotonic
+import pytest
+from bookflight import Transport, RateLimiter, TokenBucket, DeadlineExceeded
+from bookflight.ratelimit import parse_rates
+
+# ==============================================================================
+# Tests
+# ==============================================================================
+
+def test_bucket_waits_for_the_deficit():
+   bucket = TokenBucket(10, _burst = 1)
+   assert bucket.acquire() == 0.0
+   started = monotonic()
+   assert 0.05 < bucket.acquire() <= 0.1
+   assert monotonic() - started >= 0.05
+
+
+
+
+def test_bucket_timeout_takes_no_token():
+   bucket = TokenBucket(1, _burst = 1)
+   assert bucket.acquire() == 0.0
+   assert bucket.acquire(0.1) is None          # Would wait about 1 s
+   assert bucket.acquire(0.1) is None          # Nothing was reserved
+   assert 0.5 < bucket.acquire(2.0) <= 1.0
+
+
+
+
+def test_throttling_decreases_the_rate():
+   bucket = TokenBucket(10)
+   assert bucket.feedback(429, '0.2')
+   assert bucket.stats()['rate'] == 5.0
+   assert not bucket.feedback(200)
+   assert bucket.acquire() >= 0.15             # Paused by Retry-After
+
+
+
+
+def test_parse_rates():
+   assert parse_rates(['search=5', 'check=0.5']) == { 'search': 5.0,
+                                                      'check': 0.5 }
+   for spec in ('search', 'pay=1', 'book=0'):
+      with pytest.raises(ValueError):
+         parse_rates([spec])
+
+
+
+
+def test_rate_limit_wait_respects_the_deadline(kiwi):
+   transport = Transport( _rate_limiter = RateLimiter({ 'search': 1 }) )
+   url = kiwi.url + '/flights'
+   transport.get(url, { 'limit': 1 }, _phase = 'search')
+
+   started = monotonic()
+   with pytest.raises(DeadlineExceeded):
+      transport.get(url, { 'limit': 2 }, _phase = 'search',
+                    _deadline = monotonic() + 0.2)
+   assert monotonic() - started < 0.1          # No sleep into the budget
+   transport.close()
+
+
+
+
+def test_deadline_during_throttled_search(kiwi, booking, transport):
+   transport.rate_limiter = RateLimiter({ 'search': 1 })
+   booking(kiwi.url).search_flight()
+   bf = booking(kiwi.url, _to = 'LIS', _deadline = 0.3)
+   started = monotonic()
+   assert bf.search_flight() == 0
+   assert monotonic() - started < 0.3
+   assert bf.deadline_exceeded
+   assert bf.error_msg.startswith('Deadline exceeded in the search phase')
+
+
+
+
+# End of file
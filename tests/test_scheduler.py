@@ -0,0 +1,111 @@
+
+'''
+    Tests of the check_flights polling: Backoff and CheckScheduler.
+
+    File name: test_scheduler.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import pytest
+from time import monotonic
+import fake_kiwi                       # Local stand-in of the Kiwi API
+from bookflight import Backoff, CheckScheduler
+
+# ==============================================================================
+# Fixtures
+# ==============================================================================
+
+@pytest.fixture
+def slow_kiwi():
+   """ Fake Kiwi API, flights_checked with the fourth check_flights """
+   server = fake_kiwi.start_server(fake_kiwi.FakeKiwiConfig( _polls = 3 ))
+   yield server
+   server.shutdown()
+   server.server_close()
+
+
+
+
+# ==============================================================================
+# Tests
+# ==============================================================================
+
+def test_backoff_grows_to_cap():
+   backoff = Backoff( _base = 1.0, _factor = 2.0, _cap = 5.0, _jitter = 0 )
+   assert [ backoff.delay(i) for i in range(5) ] == [1.0, 2.0, 4.0, 5.0, 5.0]
+   assert backoff.delay(10 ** 6) == 5.0
+
+
+
+
+def test_backoff_jitter_shortens_only():
+   backoff = Backoff( _base = 1.0, _cap = 10.0, _jitter = 0.5 )
+   delays = [ backoff.delay(3) for i in range(200) ]
+   assert all( 4.0 <= delay <= 8.0 for delay in delays )
+   assert len(set(delays)) > 1
+
+
+
+
+def test_backoff_cap_argument():
+   backoff = Backoff( _base = 1.0, _cap = 10.0, _jitter = 0 )
+   assert backoff.delay(5, 3.0) == 3.0
+   assert backoff.delay(5, 60.0) == 32.0
+
+
+
+
+def test_check_wait_set_later_caps_the_delays(slow_kiwi, booking):
+   bf = booking(slow_kiwi.url)
+   bf.check_backoff = Backoff( _base = 0.01, _factor = 100, _jitter = 0 )
+   bf.check_wait = 0.05               # After the backoff was created
+   token = bf.search_flight()
+   started = monotonic()
+   assert bf.check_flight(token) == (True, False)
+   assert monotonic() - started < 1.0     # 0.01 + 0.05 + 0.05 s of waits
+
+
+
+
+def test_scheduler_polls_until_checked(kiwi, booking):
+   scheduler = CheckScheduler( _workers = 2,
+                               _backoff = Backoff( _base = 0.01,
+                                                   _jitter = 0 ) )
+   try:
+      bfs = [ booking(kiwi.url, _to = to) for to in ('DUB', 'LIS', 'VIE') ]
+      tickets = []
+      for bf in bfs:
+         token = bf.search_flight( _limit = 3 )
+         tickets.append(scheduler.submit(bf, token))
+      for ticket in tickets:
+         assert ticket.wait(10)
+         assert ticket.checked()
+         assert ticket.polls == 2       # Unchecked, then checked
+   finally:
+      scheduler.stop()
+
+
+
+
+def test_scheduler_gives_up_after_attempts(slow_kiwi, booking):
+   scheduler = CheckScheduler( _backoff = Backoff( _base = 0.001,
+                                                   _jitter = 0 ) )
+   try:
+      bf = booking(slow_kiwi.url)
+      bf.check_attempts = 2
+      ticket = scheduler.submit(bf, bf.search_flight())
+      assert ticket.wait(10)
+      assert not ticket.checked()
+      assert ticket.polls == 3
+      assert bf.error and 'Unsuccessful' in bf.error_msg
+   finally:
+      scheduler.stop()
+
+
+
+
+# End of file
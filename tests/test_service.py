@@ -0,0 +1,130 @@
+
+'''
+    Tests of the booking service HTTP API (book_service.py).
+
+    File name: test_service.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import json
+import threading
+import pytest
+import requests
+import fake_kiwi                       # Local stand-in of the Kiwi API
+from bookflight import Backoff
+from bookflight.service import BookingService, ServiceHandler, \
+                               ThreadingHTTPServer
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+c_PASSENGER = { 'id': '001', 'last_name': '2X4C', 'first_name': 'Kryton',
+                'birthday': '2980-04-06', 'title': 'Mr',
+                'email': 'kryton@reddwarf.space' }
+c_JOB = { 'date': '2018-04-13', 'from': 'BCN', 'to': 'DUB',
+          'currency': 'EUR', 'passenger': c_PASSENGER }
+
+# ==============================================================================
+# Fixtures
+# ==============================================================================
+
+@pytest.fixture
+def service(kiwi, monkeypatch):
+   """ Running service of the fake Kiwi API, its URL is service.url """
+   new_booking = BookingService.new_booking
+
+   def fake_booking(_service, _job, _passenger=True):
+      bf, passenger, currency = new_booking(_service, _job, _passenger)
+      fake_kiwi.configure(bf, kiwi.url)
+      bf.check_backoff = Backoff( _base = 0.01, _jitter = 0 )
+      return bf, passenger, currency
+
+   monkeypatch.setattr(BookingService, 'new_booking', fake_booking)
+   service = BookingService()
+   server  = ThreadingHTTPServer(('127.0.0.1', 0), ServiceHandler)
+   server.service = service
+   service.url = 'http://127.0.0.1:%d' % server.server_address[1]
+   thread = threading.Thread( target = server.serve_forever, args = (0.05,) )
+   thread.daemon = True
+   thread.start()
+   yield service
+   server.shutdown()
+   server.server_close()
+   service.close()
+
+
+
+
+# ==============================================================================
+# Tests
+# ==============================================================================
+
+def test_book(service):
+   resp = requests.post(service.url + '/book', data = json.dumps(c_JOB))
+   assert resp.status_code == 200
+   assert resp.json()['pnr'].startswith('PNR')
+   assert resp.json()['error'] is None
+
+
+
+
+@pytest.mark.parametrize('path, job, problem', [
+   ('/book',   dict(c_JOB, passenger = None), '"passenger" is not an object'),
+   ('/book',   dict((k, v) for k, v in c_JOB.items() if k != 'passenger'),
+               'missing "passenger"'),
+   ('/search', dict(c_JOB, date = 20180413), '"date" is not a string'),
+   ('/search', dict(c_JOB, bags = 'one'), '"bags" is not a number'),
+   ('/check',  c_JOB, 'missing "booking_token"'),
+   ('/search', [c_JOB], 'not a JSON object'),
+])
+def test_invalid_job(service, path, job, problem):
+   resp = requests.post(service.url + path, data = json.dumps(job))
+   assert resp.status_code == 400
+   assert problem in resp.json()['error']
+
+
+
+
+def test_internal_error(service, monkeypatch):
+   def broken(_job):
+      raise AttributeError('broken search')
+   monkeypatch.setattr(service, 'search', broken)
+   resp = requests.post(service.url + '/search', data = json.dumps(c_JOB))
+   assert resp.status_code == 500
+   assert 'broken search' in resp.json()['error']
+
+
+
+
+def test_drain_waits_for_the_response(service, monkeypatch):
+   events = []
+   reply  = ServiceHandler._reply
+   end    = service.end
+
+   def recorded_reply(_handler, *_args):
+      reply(_handler, *_args)
+      events.append('reply')
+
+   def recorded_end():
+      events.append('end')
+      end()
+
+   monkeypatch.setattr(ServiceHandler, '_reply', recorded_reply)
+   monkeypatch.setattr(service, 'end', recorded_end)
+   resp = requests.post(service.url + '/search', data = json.dumps(c_JOB))
+   assert resp.status_code == 200
+   assert service.drain(5)
+   assert events == ['reply', 'end']
+
+   resp = requests.post(service.url + '/search', data = json.dumps(c_JOB))
+   assert resp.status_code == 503
+
+
+
+
+# End of file
@@ -0,0 +1,135 @@
+
+'''
+    Tests of the streaming decoder of the search responses.
+
+    File name: test_stream.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import io
+import json
+import pytest
+import requests
+from bookflight import iter_flights, ResultSet
+from conftest import c_DEAD_URL
+
+# ==============================================================================
+# Constants
+# ==============================================================================
+
+c_BODY = json.dumps({
+   'search_id': 'x',
+   'data': [ { 'booking_token': 'T%d' % i, 'price': 100.5 + i,
+               'route': [ { 'flyFrom': 'BCN', 'flyTo': 'DUB' } ],
+               'note': 'déjà vu' }
+             for i in range(20) ],
+   'currency': 'EUR',
+   '_results': 20,
+}).encode('utf-8')
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def response(_body):
+   """ Streamed response of the body """
+   resp = requests.Response()
+   resp.status_code = 200
+   resp.raw = io.BytesIO(_body)
+   return resp
+# End of response
+
+
+
+
+# ==============================================================================
+# Tests
+# ==============================================================================
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 65536])
+def test_decodes_all_records(chunk_size):
+   meta    = {}
+   flights = list(iter_flights(response(c_BODY), meta, chunk_size))
+   assert flights == json.loads(c_BODY.decode('utf-8'))['data']
+   assert meta == { 'search_id': 'x', 'currency': 'EUR', '_results': 20 }
+
+
+
+
+def test_empty_data():
+   assert list(iter_flights(response(b'{"data": [], "_results": 0}'))) == []
+   assert list(iter_flights(response(b'{}'))) == []
+
+
+
+
+def test_stops_reading_early():
+   raw  = io.BytesIO(c_BODY)
+   resp = requests.Response()
+   resp.status_code, resp.raw = 200, raw
+   flights = iter_flights(resp, _chunk_size = 64)
+   assert next(flights)['booking_token'] == 'T0'
+   flights.close()
+   assert raw.closed                        # The rest is not downloaded
+
+
+
+
+@pytest.mark.parametrize('cut', [1, 20, len(c_BODY) // 2, len(c_BODY) - 1])
+def test_truncated_body_raises(cut):
+   with pytest.raises(ValueError):
+      list(iter_flights(response(c_BODY[:cut]), _chunk_size = 16))
+
+
+
+
+def test_invalid_separator_raises():
+   with pytest.raises(ValueError):
+      list(iter_flights(response(b'{"data": [{"a": 1} {"a": 2}]}')))
+
+
+
+
+def test_result_set_from_stream():
+   rs = ResultSet.from_records(iter_flights(response(c_BODY), _chunk_size = 5))
+   assert len(rs) == 20
+   assert rs.price[3] == 103.5
+   assert rs.route[0] == 'BCN-DUB'
+
+
+
+
+def test_stream_search_failed_request(booking):
+   bf = booking(c_DEAD_URL)
+   assert bf.search_flight( _stream = True ) == 0
+   assert bf.error
+   assert 'EXCEPTION' in bf.error_msg or 'booking_token' in bf.error_msg
+
+
+
+
+def test_iter_search_failed_request_is_closable(booking):
+   bf = booking(c_DEAD_URL)
+   flights = bf.iter_search()
+   assert list(flights) == []
+   flights.close()
+   assert bf.error
+
+
+
+
+def test_stream_search(kiwi, booking):
+   bf = booking(kiwi.url)
+   token = bf.search_flight( _limit = 5, _stream = True )
+   assert token.startswith('13/04/2018BCNDUB-000000')
+   assert bf.search_price == 100
+   assert not bf.error
+
+
+
+
+# End of file
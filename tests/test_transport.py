@@ -0,0 +1,128 @@
+
+'''
+    Tests of the pooled HTTP transport: coalescing of identical requests.
+
+    File name: test_transport.py
+    Date created: 17/10/2026
+    Python Version: 3.5.2
+'''
+
+# ==============================================================================
+# Libraries
+# ==============================================================================
+import threading
+import pytest
+import fake_kiwi                       # Local stand-in of the Kiwi API
+from bookflight import Transport
+
+# ==============================================================================
+# Fixtures
+# ==============================================================================
+
+@pytest.fixture
+def slow_kiwi():
+   """ Fake Kiwi API answering after 0.2 seconds """
+   server = fake_kiwi.start_server(fake_kiwi.FakeKiwiConfig( _latency = 0.2 ))
+   yield server
+   server.shutdown()
+   server.server_close()
+
+
+
+
+# ==============================================================================
+# Functions
+# ==============================================================================
+
+def at_once(_n, _func):
+   """ Call _func(i) in _n threads started together
+
+       Return:
+         (list): Results (or exceptions) in the order of i
+   """
+   barrier = threading.Barrier(_n)
+   results = [None] * _n
+
+   def run(_i):
+      barrier.wait()
+      try:
+         results[_i] = _func(_i)
+      except Exception as e:
+         results[_i] = e
+
+   threads = [ threading.Thread( target = run, args = (i,) )
+               for i in range(_n) ]
+   for thread in threads:
+      thread.start()
+   for thread in threads:
+      thread.join()
+   return results
+# End of at_once
+
+
+
+
+def sent(_transport):
+   """ Return: (int): Requests sent by the transport """
+   return sum( host['requests'] for host in _transport.stats().values() )
+# End of sent
+
+
+
+
+# ==============================================================================
+# Tests
+# ==============================================================================
+
+def test_identical_gets_are_coalesced(slow_kiwi, transport):
+   url = slow_kiwi.url + '/flights'
+   responses = at_once(5, lambda i: transport.get(url, { 'limit': 3 },
+                                                  _phase = 'search'))
+   assert all( resp is responses[0] for resp in responses )
+   assert len(responses[0].json()['data']) == 3
+   assert sent(transport) == 1
+   assert transport.metrics.value('bookflight_coalesced_total',
+                                  { 'phase': 'search' }) == 4
+
+
+
+
+def test_different_gets_are_not_coalesced(slow_kiwi, transport):
+   url = slow_kiwi.url + '/flights'
+   responses = at_once(3, lambda i: transport.get(url, { 'limit': i + 1 }))
+   assert [ len(resp.json()['data']) for resp in responses ] == [1, 2, 3]
+   assert sent(transport) == 3
+
+
+
+
+def test_streamed_gets_are_not_coalesced(slow_kiwi, transport):
+   url = slow_kiwi.url + '/flights'
+   responses = at_once(3, lambda i: transport.get(url, { 'limit': 1 },
+                                                  _stream = True))
+   assert len(set( id(resp) for resp in responses )) == 3
+   assert sent(transport) == 3
+
+
+
+
+def test_coalescing_can_be_disabled(slow_kiwi):
+   transport = Transport( _coalesce = False )
+   url = slow_kiwi.url + '/flights'
+   at_once(3, lambda i: transport.get(url, { 'limit': 1 }))
+   assert sent(transport) == 3
+   transport.close()
+
+
+
+
+def test_connections_are_reused(kiwi, transport):
+   for i in range(5):
+      transport.get(kiwi.url + '/flights', { 'limit': i + 1 })
+   stats = transport.stats()['127.0.0.1:%d' % kiwi.server_address[1]]
+   assert stats == { 'requests': 5, 'connections': 1, 'reused': 4 }
+
+
+
+
+# End of file